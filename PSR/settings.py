@@ -122,6 +122,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: dashboard reads keep seeing the last committed snapshot while a
+            # regeneration publishes. IMMEDIATE: writers take the write lock when
+            # the transaction starts instead of failing to upgrade mid-way.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -166,3 +174,41 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Snapshot regeneration queue: requests for the same project/date arriving within
+# this many seconds of each other are merged into one rebuild (core/jobs.py)
+PSR_SNAPSHOT_COALESCE_SECONDS = 10
+PSR_SNAPSHOT_COALESCE_MAX_SECONDS = 60
+# A job still RUNNING this long after it was claimed is taken to belong to a worker that died:
+# it is queued again, or failed once it has been claimed MAX_ATTEMPTS times
+PSR_SNAPSHOT_JOB_TIMEOUT_SECONDS = 1800
+PSR_SNAPSHOT_JOB_MAX_ATTEMPTS = 3
+
+# What-if snapshot preview: how long cached project inputs are kept (core/preview.py).
+# Uses the default cache; configure CACHES with a shared backend when running several workers.
+PSR_PREVIEW_CACHE_SECONDS = 300
+
+# Snapshot math backend used by generate_psr_snapshot / the job worker:
+# 'decimal' (exact, per cell) or 'numpy' (vectorized float64, see core/psr_engine/vectorized.py)
+PSR_SNAPSHOT_BACKEND = 'decimal'
+
+# Storage of PSRSnapshot.data for newly written snapshots: '' (plain JSON) or
+# 'columnar-zlib' (compact, see core/snapshot_codec.py). Existing rows are
+# converted with `python manage.py encode_psr_snapshots`.
+PSR_SNAPSHOT_ENCODING = ''
+
+# Snapshots flagged stale by back-dated imports are repaired when read:
+# 'queue' (SnapshotJob, serve the stale copy), 'sync' (rebuild in the request unless another
+# run holds the project's lock; then queue) or 'off'
+PSR_STALE_SNAPSHOT_REPAIR = 'queue'
+
+# Per-project regeneration lock (core/psr_engine/locking.py): how long a run waits
+# for another run on the same project, and after how long a held lock is considered abandoned
+PSR_SNAPSHOT_LOCK_TIMEOUT_SECONDS = 120
+PSR_SNAPSHOT_LOCK_TTL_SECONDS = 600
+
+# Parse cache of cleaned import rows, keyed by the dump file's SHA-256 (core/importers/cache.py).
+# Files unused for MAX_AGE_DAYS are removed, then the least recently used beyond MAX_BYTES.
+PSR_IMPORT_CACHE_DIR = BASE_DIR / '.import_cache'
+PSR_IMPORT_CACHE_MAX_AGE_DAYS = 30
+PSR_IMPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
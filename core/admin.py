@@ -337,10 +337,12 @@ class SubDepartmentAdmin(admin.ModelAdmin):
 
 @admin.register(TimesheetEntry)
 class TimesheetEntryAdmin(admin.ModelAdmin):
-    list_display = ('date', 'project_link', 'emp_cd', 'emp_name', 'role_description', 'hours', 'co_no')
+    list_display = ('date', 'project_link', 'emp_cd', 'emp_name', 'role_description', 'sub_department', 'hours', 'co_no')
     list_filter = ('date', 'co_no', 'role_description')
     search_fields = ('emp_cd', 'emp_name', 'role_description', 'co_no')
     readonly_fields = ('imported_at', 'updated_at')
+    raw_id_fields = ('sub_department',)
+    list_select_related = ('sub_department__department__project',)
     date_hierarchy = 'date'
     list_per_page = 50
 
@@ -356,8 +358,8 @@ class TimesheetEntryAdmin(admin.ModelAdmin):
 
 @admin.register(POData)
 class PODataAdmin(ImportExportModelAdmin, admin.ModelAdmin):
-    list_display = ('co_no', 'project_link', 'mat_code', 'formatted_value', 'project_name')
-    list_filter = ('mat_code',)
+    list_display = ('co_no', 'project_link', 'mat_code', 'cost_category', 'formatted_value', 'project_name')
+    list_filter = ('mat_code', 'cost_category')
     search_fields = ('co_no', 'mat_code', 'project_name')
     readonly_fields = ('imported_at', 'updated_at')
     list_per_page = 50
@@ -610,12 +612,15 @@ class PSRSnapshotAdmin(admin.ModelAdmin):
         'total_prognosis_cost_display',
         'total_budget_cost_display',
         'generated_at_display',
+        'generation_seconds_display',
+        'is_stale',
     )
-    list_filter = ('frequency', 'snapshot_date', 'project__co_no', 'project__currency')
+    list_filter = ('frequency', 'is_stale', 'snapshot_date', 'project__co_no', 'project__currency')
     search_fields = ('project__co_no', 'project__project_name')
     date_hierarchy = 'snapshot_date'
     readonly_fields = (
-        'generated_at', 'generated_by', 'data',
+        'generated_at', 'generated_by', 'data', 'data_encoding', 'payload', 'is_stale', 'stale_since',
+        'generation_seconds', 'generation_stats',
         'total_actual_cost', 'total_forecast_cost',
         'total_prognosis_cost', 'total_budget_cost',
         'eff_value', 'ter_value', 'sum_prognosis',
@@ -641,8 +646,9 @@ class PSRSnapshotAdmin(admin.ModelAdmin):
                 'factor',
             )
         }),
-        ('Data (JSON)', {'fields': ('data',), 'classes': ('collapse',)}),
-        ('Metadata', {'fields': ('generated_at', 'generated_by'), 'classes': ('collapse',)}),
+        ('Data (JSON)', {'fields': ('data_encoding', 'payload'), 'classes': ('collapse',)}),
+        ('Metadata', {'fields': ('generated_at', 'generated_by', 'is_stale', 'stale_since'), 'classes': ('collapse',)}),
+        ('Generation', {'fields': ('generation_seconds', 'generation_stats'), 'classes': ('collapse',)}),
     )
 
     def project_link(self, obj):
@@ -672,6 +678,29 @@ class PSRSnapshotAdmin(admin.ModelAdmin):
         return obj.generated_at.strftime("%Y-%m-%d %H:%M")
     generated_at_display.short_description = "Generated At"
 
+    def generation_seconds_display(self, obj):
+        if obj.generation_seconds is None:
+            return "-"
+        return f"{obj.generation_seconds * 1000:,.1f} ms"
+    generation_seconds_display.short_description = "Generation Time"
+    generation_seconds_display.admin_order_field = 'generation_seconds'
+
+
+@admin.register(PSRSnapshotLine)
+class PSRSnapshotLineAdmin(admin.ModelAdmin):
+    list_display = ('project', 'snapshot_date', 'section', 'department', 'code',
+                    'actuals', 'budget', 'forecast', 'prognosis', 'balance', 'balance_percentage')
+    list_filter = ('section', 'snapshot_date', 'project__co_no')
+    search_fields = ('project__co_no', 'code', 'department')
+    list_select_related = ('project',)
+    date_hierarchy = 'snapshot_date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 
 
@@ -997,3 +1026,76 @@ class MaterialForecastAdjustmentLineAdmin(admin.ModelAdmin):
     # Show lines inline in the adjustment admin (recommended)
     class Meta:
         verbose_name_plural = "Material Forecast Adjustment Lines"
+
+
+@admin.register(SnapshotJob)
+class SnapshotJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'project', 'snapshot_date', 'status', 'source', 'requested_by', 'merged_count',
+                    'created_at', 'queued_seconds_display', 'lock_wait_display', 'run_seconds_display')
+    list_filter = ('status', 'source', 'project__co_no')
+    search_fields = ('project__co_no', 'project__project_name')
+    list_select_related = ('project', 'requested_by')
+    readonly_fields = ('project', 'snapshot_date', 'status', 'source', 'requested_by', 'merged_count', 'attempts',
+                       'created_at', 'run_after', 'started_at', 'finished_at', 'lock_wait_seconds', 'error')
+
+    def queued_seconds_display(self, obj):
+        return f"{obj.queued_seconds:.2f}s" if obj.queued_seconds is not None else "-"
+    queued_seconds_display.short_description = "Queued"
+
+    def lock_wait_display(self, obj):
+        return f"{obj.lock_wait_seconds:.2f}s" if obj.lock_wait_seconds is not None else "-"
+    lock_wait_display.short_description = "Lock Wait"
+
+    def run_seconds_display(self, obj):
+        return f"{obj.run_seconds:.2f}s" if obj.run_seconds is not None else "-"
+    run_seconds_display.short_description = "Run Time"
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SnapshotLock)
+class SnapshotLockAdmin(admin.ModelAdmin):
+    list_display = ('project', 'holder', 'acquired_at', 'expires_at', 'acquisitions', 'contended',
+                    'reused_runs', 'average_wait_display', 'max_wait_display')
+    search_fields = ('project__co_no', 'holder')
+    list_select_related = ('project',)
+    readonly_fields = ('project', 'holder', 'acquired_at', 'expires_at', 'acquisitions', 'contended',
+                       'reused_runs', 'total_wait_seconds', 'max_wait_seconds')
+
+    def average_wait_display(self, obj):
+        return f"{obj.average_wait_seconds:.2f}s"
+    average_wait_display.short_description = "Avg Wait"
+
+    def max_wait_display(self, obj):
+        return f"{obj.max_wait_seconds:.2f}s"
+    max_wait_display.short_description = "Max Wait"
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'file_name', 'status', 'started_at', 'duration_display', 'rows_read',
+                    'rows_valid', 'rows_written', 'rows_unchanged', 'stale_snapshots', 'projects_display')
+    list_filter = ('kind', 'status', 'affected_projects__co_no')
+    search_fields = ('file_name', 'checksum')
+    date_hierarchy = 'started_at'
+    readonly_fields = ('kind', 'file_name', 'file_size', 'checksum', 'status', 'options', 'rows_read',
+                       'rows_valid', 'rows_written', 'rows_unchanged', 'stale_snapshots', 'affected_projects',
+                       'error', 'started_at', 'finished_at')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('affected_projects')
+
+    def duration_display(self, obj):
+        return f"{obj.duration_seconds:.2f}s" if obj.duration_seconds is not None else "-"
+    duration_display.short_description = "Duration"
+
+    def projects_display(self, obj):
+        return ", ".join(project.co_no for project in obj.affected_projects.all()) or "-"
+    projects_display.short_description = "Affected Projects"
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,29 @@
+# core/importers/__init__.py
+
+"""
+Excel dump importers (timesheet and PO data).
+
+``read_sheet`` / ``iter_sheet_chunks`` read the ``Data`` sheet whole or in
+bounded chunks; ``clean_*`` drops rows that cannot be imported, ``*_entries``
+turns a cleaned DataFrame into unsaved model objects and ``save_*_entries``
+writes them. ``cleaned_frames`` chains reading and cleaning, going through
+the parse cache (cache.py), and the management commands save its frames,
+all of them or, with ``RowDiff``, only the rows whose content changed.
+"""
+
+from core.importers.cache import file_digest, load_cached, store_cached, evict_cache
+from core.importers.diff import RowDiff
+from core.importers.excel import (
+    SheetReadError, read_sheet, iter_sheet_chunks, peak_rss, format_bytes,
+)
+from core.importers.frames import MissingColumnsError, cleaned_frames
+from core.importers.podata import clean_podata, podata_entries, save_podata_entries
+from core.importers.timesheet import clean_timesheet, timesheet_entries, save_timesheet_entries
+
+__all__ = [
+    'file_digest', 'load_cached', 'store_cached', 'evict_cache',
+    'SheetReadError', 'read_sheet', 'iter_sheet_chunks', 'peak_rss', 'format_bytes',
+    'MissingColumnsError', 'cleaned_frames', 'RowDiff',
+    'clean_podata', 'podata_entries', 'save_podata_entries',
+    'clean_timesheet', 'timesheet_entries', 'save_timesheet_entries',
+]
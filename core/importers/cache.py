@@ -0,0 +1,160 @@
+# core/importers/cache.py
+
+"""
+Parse cache for repeated imports of the same dump.
+
+The cleaned DataFrame of a file is stored as a NumPy archive named after the
+SHA-256 of the file's content, in PSR_IMPORT_CACHE_DIR. Re-importing an
+unchanged file (e.g. after fixing a role mapping) loads it from there
+instead of parsing the workbook again; resolution to sub-departments and
+cost categories still runs on every import.
+
+Columns are stored compactly: float columns as float64 arrays, all others
+factorized into int32 codes plus their distinct values (text as one UTF-8
+blob with offsets, dates as datetime64[D], integers as int64), so no
+pickling is involved. Files unused for PSR_IMPORT_CACHE_MAX_AGE_DAYS are
+removed, then the least recently used ones until the directory fits in
+PSR_IMPORT_CACHE_MAX_BYTES.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from pandas.api.types import is_float_dtype
+
+# Bump when the cleaning steps change so older cache files are not reused
+CACHE_VERSION = 1
+
+META_KEY = '__meta__'
+
+
+def file_digest(file_path, block_size=1 << 20):
+    """SHA-256 hex digest of the file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_dir():
+    return str(getattr(settings, 'PSR_IMPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, '.import_cache')))
+
+
+def cache_path(kind, digest):
+    return os.path.join(cache_dir(), f"{kind}-v{CACHE_VERSION}-{digest}.npz")
+
+
+def load_cached(kind, digest):
+    """(cleaned DataFrame, rows read from the sheet) or None if not cached."""
+    path = cache_path(kind, digest)
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(str(archive[META_KEY]))
+            columns = {name: _decode_column(archive, i, kind) for i, (name, kind) in enumerate(meta['columns'])}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # Truncated or foreign file: drop it and parse the workbook
+        _remove(path)
+        return None
+    os.utime(path)  # Least recently used is evicted first
+    return pd.DataFrame(columns, columns=[name for name, _ in meta['columns']]), meta['total_rows']
+
+
+def store_cached(kind, digest, df, total_rows):
+    """Write the cleaned DataFrame for the file with ``digest``, then evict."""
+    os.makedirs(cache_dir(), exist_ok=True)
+    arrays, columns = {}, []
+    for i, name in enumerate(df.columns):
+        column_kind, column_arrays = _encode_column(df[name])
+        columns.append((name, column_kind))
+        arrays.update({f"{i}:{key}": value for key, value in column_arrays.items()})
+    arrays[META_KEY] = np.array(json.dumps({'total_rows': total_rows, 'columns': columns}))
+
+    path = cache_path(kind, digest)
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(partial, path)
+    evict_cache()
+    return path
+
+
+def evict_cache(max_age_days=None, max_bytes=None):
+    """Remove expired files, then least recently used ones over the size cap. Returns files removed."""
+    if max_age_days is None:
+        max_age_days = getattr(settings, 'PSR_IMPORT_CACHE_MAX_AGE_DAYS', 30)
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PSR_IMPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    directory = cache_dir()
+    if not os.path.isdir(directory):
+        return 0
+
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith('.npz'):
+            stat = os.stat(os.path.join(directory, name))
+            files.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+    files.sort()  # Oldest first
+
+    removed = 0
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _encode_column(series):
+    if is_float_dtype(series):
+        return 'float', {'values': series.to_numpy(dtype='float64')}
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = list(uniques)
+    if all(isinstance(value, str) for value in uniques):
+        encoded = [value.encode('utf-8') for value in uniques]
+        offsets = np.cumsum([0] + [len(value) for value in encoded], dtype='int64')
+        return 'text', {'codes': codes.astype('int32'), 'blob': np.frombuffer(b''.join(encoded), dtype='uint8'),
+                        'offsets': offsets}
+    if all(isinstance(value, datetime.date) for value in uniques):
+        return 'date', {'codes': codes.astype('int32'), 'uniques': np.array(uniques, dtype='datetime64[D]')}
+    if all(isinstance(value, (int, np.integer)) for value in uniques):
+        return 'int', {'codes': codes.astype('int32'), 'uniques': np.array(uniques, dtype='int64')}
+    raise ValueError(f"Column {series.name!r} cannot be cached (mixed value types)")
+
+
+def _decode_column(archive, i, kind):
+    if kind == 'float':
+        return archive[f"{i}:values"]
+
+    if kind == 'text':
+        blob, offsets = archive[f"{i}:blob"].tobytes(), archive[f"{i}:offsets"]
+        uniques = [blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+    elif kind == 'date':
+        uniques = archive[f"{i}:uniques"].astype(object).tolist()
+    else:
+        uniques = archive[f"{i}:uniques"].tolist()
+    # Code -1 (missing) picks the trailing None
+    values = np.empty(len(uniques) + 1, dtype=object)
+    values[:len(uniques)] = uniques
+    values[-1] = None
+    return values[archive[f"{i}:codes"]]
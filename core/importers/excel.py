@@ -0,0 +1,185 @@
+# core/importers/excel.py
+
+"""
+Reading the ``Data`` sheet of the timesheet / PO dumps.
+
+``read_sheet`` loads the whole sheet with ``pd.read_excel``. ``iter_sheet_chunks``
+streams it as DataFrames of at most ``chunk_size`` rows: .xlsx files are read
+row by row with openpyxl in read-only mode, .xls files with xlrd (whose BIFF
+reader has to load the sheet's cells, but no DataFrame or model instances
+are built for more than one chunk at a time).
+
+Both produce the same columns and cell values as ``pd.read_excel`` so the
+cleaning steps do not depend on how the sheet was read.
+"""
+
+import os
+import sys
+
+import pandas as pd
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype, is_float_dtype, is_integer_dtype
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SHEET_NAME = "Data"
+HEADER_ROW = 3  # Headers are in row 3 of both dumps
+
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+class SheetReadError(Exception):
+    """The dump could not be read with any engine."""
+
+
+def read_sheet(file_path, engines=('xlrd', 'openpyxl'), log=None):
+    """The whole ``Data`` sheet as one DataFrame, trying ``engines`` in order."""
+    errors = []
+    for engine in engines:
+        try:
+            df = pd.read_excel(file_path, sheet_name=SHEET_NAME, skiprows=HEADER_ROW - 1, engine=engine)
+        except Exception as e:
+            errors.append(f"Engine {engine} failed: {e}")
+            if log:
+                log(errors[-1])
+            continue
+        if log:
+            log(f"Successfully read file with engine: {engine}")
+        return df
+    raise SheetReadError("; ".join(errors))
+
+
+def iter_sheet_chunks(file_path, chunk_size=10000):
+    """Yield the ``Data`` sheet as DataFrames of at most ``chunk_size`` rows."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if os.path.splitext(file_path)[1].lower() in XLSX_EXTENSIONS:
+        rows = _openpyxl_rows(file_path)
+    else:
+        rows = _xlrd_rows(file_path)
+
+    header = None
+    chunk = []
+    for values in rows:
+        if header is None:
+            header = _column_names(values)
+            continue
+        chunk.append(values[:len(header)])
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=header)
+
+
+def _column_names(values):
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or value == "" else value
+        if name in seen:  # read_excel's de-duplication: "X", "X.1", ...
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _openpyxl_rows(file_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[SHEET_NAME]
+        for values in sheet.iter_rows(min_row=HEADER_ROW, values_only=True):
+            yield tuple(_openpyxl_value(value) for value in values)
+    finally:
+        workbook.close()
+
+
+def _openpyxl_value(value):
+    if isinstance(value, str) and value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _xlrd_rows(file_path):
+    import xlrd
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = book.sheet_by_name(SHEET_NAME)
+        for i in range(HEADER_ROW - 1, sheet.nrows):
+            yield tuple(
+                _xlrd_value(cell_type, value, book.datemode)
+                for cell_type, value in zip(sheet.row_types(i), sheet.row_values(i))
+            )
+    finally:
+        book.release_resources()
+
+
+def _xlrd_value(cell_type, value, datemode):
+    import xlrd
+
+    if cell_type in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell_type == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(value, datemode)
+    if cell_type == xlrd.XL_CELL_BOOLEAN:
+        return bool(value)
+    if cell_type == xlrd.XL_CELL_NUMBER and float(value).is_integer():
+        return int(value)
+    if cell_type == xlrd.XL_CELL_TEXT and value == "":
+        return None
+    return value
+
+
+def as_text(series):
+    """
+    Cell values as stripped strings, blanks as "". Integral numbers lose the
+    ".0" that ``pd.read_excel`` gives number columns with blank cells (CO
+    numbers would otherwise come out as "30778.0").
+    """
+    missing = series.isna()
+    if is_float_dtype(series):
+        integral = ~missing & (series % 1 == 0)
+        text = series.astype(str)
+        text[integral] = series[integral].astype('int64').astype(str)
+    elif is_integer_dtype(series) or infer_dtype(series, skipna=True) in ('string', 'empty'):
+        text = series.astype(str)
+    else:
+        # Mixed column (streamed chunks keep cell types as they are)
+        text = series.map(lambda value: str(int(value)) if isinstance(value, float) and value.is_integer()
+                          else str(value))
+    return text.str.strip().where(~missing, "")
+
+
+def as_date(series):
+    """Cell values as ``datetime.date`` (None for blanks)."""
+    if not is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, format='mixed')
+    return series.dt.date.astype(object).where(series.notna(), None)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_bytes(size):
+    if size is None:
+        return "n/a"
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:,.1f} {unit}" if unit != 'B' else f"{size:,} B"
+        size /= 1024
+    return f"{size:,.1f} GB"
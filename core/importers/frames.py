@@ -0,0 +1,71 @@
+# core/importers/frames.py
+
+from core.importers.cache import file_digest, load_cached, store_cached
+from core.importers.excel import read_sheet, iter_sheet_chunks
+from core.importers.podata import REQUIRED_COLUMNS as PO_COLUMNS, clean_podata
+from core.importers.timesheet import REQUIRED_COLUMNS as TIMESHEET_COLUMNS, clean_timesheet
+
+
+# kind -> (required columns, cleaning step, engines tried for a full read)
+IMPORTERS = {
+    'timesheet': (TIMESHEET_COLUMNS, clean_timesheet, ('xlrd', 'openpyxl')),
+    'podata': (PO_COLUMNS, clean_podata, ('openpyxl', 'xlrd')),
+}
+
+
+class MissingColumnsError(Exception):
+    """The ``Data`` sheet lacks columns the importer needs."""
+
+    def __init__(self, missing, available):
+        super().__init__(f"Missing required columns: {missing}")
+        self.missing = missing
+        self.available = available
+
+
+def cleaned_frames(file_path, kind, stream=False, chunk_size=10000, use_cache=True, digest=None, log=None):
+    """
+    Yield (rows read from the sheet, cleaned DataFrame) for a dump of ``kind``.
+
+    A file already in the parse cache is not parsed again. Otherwise the sheet
+    is read whole (and its cleaned rows cached) or, with ``stream``, in chunks
+    of ``chunk_size`` rows; streamed reads are not cached, since that would
+    mean holding every chunk. ``digest`` is the file's SHA-256 when the caller
+    already has it. Raises ``SheetReadError`` / ``MissingColumnsError``.
+    """
+    log = log or (lambda message: None)
+    required, clean, engines = IMPORTERS[kind]
+
+    if not use_cache:
+        digest = None
+    elif digest is None:
+        digest = file_digest(file_path)
+    cached = load_cached(kind, digest) if digest else None
+    if cached is not None:
+        df, total_rows = cached
+        log(f"Loaded {len(df)} cleaned rows from the parse cache")
+        if not stream:
+            yield total_rows, df
+            return
+        for start in range(0, len(df), chunk_size):
+            yield (total_rows if start == 0 else 0), df.iloc[start:start + chunk_size]
+        return
+
+    if stream:
+        for i, df in enumerate(iter_sheet_chunks(file_path, chunk_size=chunk_size)):
+            if i == 0:
+                _check_columns(df, required)
+            yield len(df), clean(df)
+        return
+
+    df = read_sheet(file_path, engines=engines, log=log)
+    _check_columns(df, required)
+    cleaned = clean(df)
+    if digest:
+        store_cached(kind, digest, cleaned, len(df))
+    yield len(df), cleaned
+
+
+def _check_columns(df, required):
+    missing = [col for col in required if col not in df.columns]
+    if missing:
+        raise MissingColumnsError(missing, list(df.columns))
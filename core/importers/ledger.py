@@ -0,0 +1,68 @@
+# core/importers/ledger.py
+
+"""
+``ImportRun`` ledger of imported dump files.
+
+Imports commit each chunk in its own transaction, so the database is not
+locked for the length of a file; the ledger gives the file as a whole its
+outcome. Runs are written in autocommit, outside the chunks' transactions,
+so an import that fails partway leaves a FAILED row (with the rows written
+so far) behind, and the file is not taken as imported until a run is DONE.
+"""
+
+import os
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from core.models import ImportRun
+
+
+def find_imported(kind, checksum):
+    """Latest DONE run of ``kind`` for a file with this checksum, or None."""
+    return (
+        ImportRun.objects
+        .filter(kind=kind, checksum=checksum, status=ImportRun.DONE)
+        .order_by('-finished_at')
+        .first()
+    )
+
+
+def record_skip(kind, file_path, checksum, previous):
+    now = timezone.now()
+    return ImportRun.objects.create(
+        kind=kind, file_name=os.path.basename(file_path), file_size=os.path.getsize(file_path),
+        checksum=checksum, status=ImportRun.SKIPPED, started_at=now, finished_at=now,
+        error=f"Already imported by run #{previous.pk}",
+    )
+
+
+def mark_failed(run, message):
+    """Record a handled failure on ``run`` (None for dry runs, which are not recorded)."""
+    if run is not None:
+        run.status = ImportRun.FAILED
+        run.error = message
+
+
+@contextmanager
+def import_run(kind, file_path, checksum, options):
+    """
+    RUNNING ledger row for the block; DONE when it completes (unless the
+    block set FAILED itself), FAILED with the exception text if it raises.
+    """
+    run = ImportRun.objects.create(
+        kind=kind, file_name=os.path.basename(file_path), file_size=os.path.getsize(file_path),
+        checksum=checksum, options=options,
+    )
+    try:
+        yield run
+    except BaseException as e:
+        run.status = ImportRun.FAILED
+        run.error = str(e) or e.__class__.__name__
+        raise
+    else:
+        if run.status == ImportRun.RUNNING:
+            run.status = ImportRun.DONE
+    finally:
+        run.finished_at = timezone.now()
+        run.save()
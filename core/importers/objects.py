@@ -0,0 +1,41 @@
+# core/importers/objects.py
+
+import hashlib
+from decimal import Decimal
+
+from django.db import models
+
+
+def build_objects(model, columns):
+    """
+    Unsaved ``model`` instances from ``columns`` ({attname: list of values},
+    all of the same length). Fields without a column are None.
+
+    Arguments are passed positionally in concrete field order, the path
+    ``Model.from_db`` takes, which skips the per-field default lookups of
+    keyword construction. Fields such as ``auto_now_add`` are still filled
+    on insert by their ``pre_save``.
+    """
+    fields = model._meta.concrete_fields
+    length = len(next(iter(columns.values()))) if columns else 0
+    blank = [None] * length
+    return [model(*values) for values in zip(*(columns.get(field.attname, blank) for field in fields))]
+
+
+def row_hashes(model, columns, attnames):
+    """
+    SHA-1 per row of the ``attnames`` columns, as the values will be stored:
+    decimals at the field's scale, dates in ISO format, blanks as "". Used as
+    ``row_hash`` to find unchanged rows without comparing field by field.
+    """
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    canonical = [_canonical_column(fields[attname], columns[attname]) for attname in attnames]
+    return [hashlib.sha1("\x1f".join(values).encode('utf-8')).hexdigest() for values in zip(*canonical)]
+
+
+def _canonical_column(field, values):
+    if isinstance(field, models.DecimalField):
+        # The conversion DecimalField applies to floats before saving
+        scale = Decimal(1).scaleb(-field.decimal_places)
+        return ["" if value is None else str(field.to_python(value).quantize(scale)) for value in values]
+    return ["" if value is None else str(value) for value in values]
@@ -0,0 +1,104 @@
+# core/importers/podata.py
+
+import pandas as pd
+
+from core.importers.excel import as_date, as_text
+from core.importers.objects import build_objects, row_hashes
+from core.models import POData
+
+
+REQUIRED_COLUMNS = ['PoNo', 'Po.Date', 'SrNo', 'CONo', 'ProjName', 'MatCode', 'POValue in Local Curr']
+TEXT_COLUMNS = ['ItemCode', 'Description', 'SupplierName']
+
+# Identity of a line (the unique constraint) and the file content hashed into row_hash
+KEY_FIELDS = ['co_no', 'po_no', 'sr_no']
+HASHED_FIELDS = ['po_no', 'po_date', 'sr_no', 'co_no', 'project_name', 'mat_code', 'po_value_inr',
+                 'item_code', 'description', 'supplier_name']
+UPDATED_FIELDS = [field for field in HASHED_FIELDS if field not in KEY_FIELDS] + [
+    'cost_category', 'row_hash', 'updated_at',
+]
+
+
+def clean_podata(df):
+    """
+    Columns of the PO dump that are imported, typed column-wise, minus lines
+    without a CO number or value.
+    """
+    df = df[REQUIRED_COLUMNS + TEXT_COLUMNS].copy()
+    df.dropna(subset=['CONo', 'POValue in Local Curr'], inplace=True)
+    df['CONo'] = as_text(df['CONo'])
+    df['POValue in Local Curr'] = pd.to_numeric(df['POValue in Local Curr'], errors='coerce')
+    df.dropna(subset=['POValue in Local Curr'], inplace=True)
+
+    df = df.copy()
+    df['Po.Date'] = as_date(df['Po.Date'])
+    sr_no = as_text(df['SrNo'])
+    digits = sr_no.str.isdigit()
+    df['SrNo'] = (
+        pd.to_numeric(sr_no.where(digits), errors='coerce').astype('Int64').astype(object).where(digits, None)
+    )
+    df['MatCode'] = as_text(df['MatCode']).astype(object).where(df['MatCode'].notna(), None)
+    for column in ['PoNo', 'ProjName'] + TEXT_COLUMNS:
+        df[column] = as_text(df[column])
+    return df
+
+
+def podata_entries(df, material_index):
+    """Unsaved ``POData`` objects for a cleaned DataFrame, material codes resolved."""
+    mat_codes = df['MatCode'].tolist()
+    cost_categories = {code: material_index.resolve(code) for code in set(mat_codes) if code is not None}
+    cost_categories[None] = None
+    columns = {
+        'po_no': df['PoNo'].tolist(),
+        'po_date': df['Po.Date'].tolist(),
+        'sr_no': df['SrNo'].tolist(),
+        'co_no': df['CONo'].tolist(),
+        'project_name': df['ProjName'].tolist(),
+        'mat_code': ["UNKNOWN" if code is None else code for code in mat_codes],
+        'cost_category_id': [cost_categories[code] for code in mat_codes],
+        'po_value_inr': df['POValue in Local Curr'].tolist(),
+        'item_code': df['ItemCode'].tolist(),
+        'description': df['Description'].tolist(),
+        'supplier_name': df['SupplierName'].tolist(),
+    }
+    columns['row_hash'] = row_hashes(POData, columns, HASHED_FIELDS)
+    return build_objects(POData, columns)
+
+
+def changed_podata_entries(entries, batch_size=500):
+    """
+    Lines of ``entries`` that the upsert will change: not stored yet, stored
+    with another ``row_hash``, or without a SrNo (NULLs never conflict, so
+    those are inserted again). Looks up only these lines' keys.
+    """
+    co_nos = list({entry.co_no for entry in entries})
+    po_nos = sorted({entry.po_no for entry in entries})
+    stored = {}
+    for i in range(0, len(po_nos), batch_size):
+        rows = (
+            POData.objects
+            .filter(co_no__in=co_nos, po_no__in=po_nos[i:i + batch_size])
+            .values_list(*KEY_FIELDS, 'row_hash')
+        )
+        stored.update((tuple(row[:-1]), row[-1]) for row in rows)
+    return [
+        entry for entry in entries
+        if entry.sr_no is None or stored.get(tuple(getattr(entry, field) for field in KEY_FIELDS)) != entry.row_hash
+    ]
+
+
+def save_podata_entries(entries, batch_size=5000):
+    """
+    Upsert on (co_no, po_no, sr_no). Lines seen before take the file's
+    content, so that their row_hash describes what is stored.
+    """
+    imported = 0
+    for i in range(0, len(entries), batch_size):
+        created = POData.objects.bulk_create(
+            entries[i:i + batch_size],
+            update_conflicts=True,
+            update_fields=UPDATED_FIELDS,
+            unique_fields=KEY_FIELDS,
+        )
+        imported += len(created)
+    return imported
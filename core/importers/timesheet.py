@@ -0,0 +1,65 @@
+# core/importers/timesheet.py
+
+import pandas as pd
+
+from core.importers.excel import as_date, as_text
+from core.importers.objects import build_objects, row_hashes
+from core.models import TimesheetEntry
+
+
+REQUIRED_COLUMNS = ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours']
+
+# Identity of a row (the unique constraint) and the file content hashed into row_hash
+KEY_FIELDS = ['date', 'emp_cd', 'co_no', 'role_description']
+HASHED_FIELDS = ['date', 'emp_cd', 'emp_name', 'role_description', 'co_no', 'hours']
+UPDATED_FIELDS = ['emp_name', 'hours', 'sub_department', 'row_hash', 'updated_at']
+
+
+def clean_timesheet(df):
+    """
+    Required columns of the timesheet dump, typed column-wise, minus rows
+    that cannot be imported.
+    """
+    # Keep only required columns
+    df = df[REQUIRED_COLUMNS].copy()
+
+    # Drop rows missing any critical field
+    df.dropna(subset=['Date', 'EmpCd', 'CoNo', 'Hours'], how='any', inplace=True)
+
+    # Clean and convert
+    for column in ('CoNo', 'EmpCd', 'EmpName', 'RoleDescrptn'):
+        df[column] = as_text(df[column])
+
+    # Convert Hours to numeric (invalid become NaN)
+    df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce')
+
+    # Drop rows with invalid Hours or empty CoNo
+    df.dropna(subset=['Hours'], inplace=True)
+    df = df[(df['CoNo'] != 'nan') & (df['CoNo'] != '')].copy()
+    df['Date'] = as_date(df['Date'])
+    return df
+
+
+def timesheet_entries(df, role_index):
+    """Unsaved ``TimesheetEntry`` objects for a cleaned DataFrame, roles resolved."""
+    co_nos = df['CoNo'].tolist()
+    roles = df['RoleDescrptn'].tolist()
+    # Dumps repeat the same few hundred (project, role) pairs; resolve each once
+    sub_departments = {pair: role_index.resolve(*pair) for pair in set(zip(co_nos, roles))}
+    columns = {
+        'date': df['Date'].tolist(),
+        'emp_cd': df['EmpCd'].tolist(),
+        'emp_name': df['EmpName'].tolist(),
+        'role_description': roles,
+        'co_no': co_nos,
+        'hours': df['Hours'].tolist(),
+        'sub_department_id': [sub_departments[pair] for pair in zip(co_nos, roles)],
+    }
+    columns['row_hash'] = row_hashes(TimesheetEntry, columns, HASHED_FIELDS)
+    return build_objects(TimesheetEntry, columns)
+
+
+def save_timesheet_entries(entries, batch_size=5000):
+    # Skip duplicates based on the unique constraint
+    TimesheetEntry.objects.bulk_create(entries, ignore_conflicts=True, batch_size=batch_size)
+    return len(entries)
@@ -0,0 +1,138 @@
+# core/jobs.py
+
+"""
+DB-backed queue for snapshot regeneration.
+
+Edit endpoints enqueue a SnapshotJob and return immediately; the
+`run_snapshot_jobs` worker command picks jobs up and regenerates the snapshot.
+
+Requests for a project/date that already has a queued job are merged into it
+and push its start back by PSR_SNAPSHOT_COALESCE_SECONDS (debounce), so a burst
+of PATCHes costs one rebuild. PSR_SNAPSHOT_COALESCE_MAX_SECONDS caps how long a
+job can be pushed back after it was first queued.
+
+A job whose worker died stays RUNNING; ``recover_abandoned_jobs`` (run before
+each claim) queues it again once it has been running for
+PSR_SNAPSHOT_JOB_TIMEOUT_SECONDS, or fails it after
+PSR_SNAPSHOT_JOB_MAX_ATTEMPTS claims.
+"""
+
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import SnapshotJob
+from core.psr_engine import regenerate_snapshot
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'PSR_SNAPSHOT_COALESCE_SECONDS', 10))
+
+
+def coalesce_max_delay():
+    return timedelta(seconds=getattr(settings, 'PSR_SNAPSHOT_COALESCE_MAX_SECONDS', 60))
+
+
+def job_timeout():
+    return timedelta(seconds=getattr(settings, 'PSR_SNAPSHOT_JOB_TIMEOUT_SECONDS', 1800))
+
+
+def enqueue_snapshot_regeneration(project, snapshot_date, requested_by=None, source=""):
+    """
+    Queue a regeneration of ``project``'s snapshot for ``snapshot_date``.
+
+    If a job for the same project/date is still queued the request is merged
+    into it and that job is returned; otherwise a new job is created.
+    """
+    if requested_by is not None and not requested_by.is_authenticated:
+        requested_by = None
+
+    now = timezone.now()
+    run_after = now + coalesce_window()
+
+    pending = (
+        SnapshotJob.objects
+        .filter(project=project, snapshot_date=snapshot_date, status=SnapshotJob.QUEUED)
+        .order_by('created_at', 'id')
+        .first()
+    )
+    if pending is not None:
+        latest_start = pending.created_at + coalesce_max_delay()
+        # Conditional update: if a worker claimed the job meanwhile, queue a fresh one
+        merged = SnapshotJob.objects.filter(pk=pending.pk, status=SnapshotJob.QUEUED).update(
+            merged_count=F('merged_count') + 1,
+            run_after=max(min(run_after, latest_start), pending.run_after),
+        )
+        if merged:
+            pending.refresh_from_db()
+            return pending
+
+    return SnapshotJob.objects.create(
+        project=project,
+        snapshot_date=snapshot_date,
+        requested_by=requested_by,
+        source=source,
+        run_after=run_after,
+    )
+
+
+def recover_abandoned_jobs():
+    """
+    Requeue RUNNING jobs claimed more than PSR_SNAPSHOT_JOB_TIMEOUT_SECONDS
+    ago (their worker died), or fail them once they have used up
+    PSR_SNAPSHOT_JOB_MAX_ATTEMPTS. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, 'PSR_SNAPSHOT_JOB_MAX_ATTEMPTS', 3)
+    abandoned = SnapshotJob.objects.filter(status=SnapshotJob.RUNNING, started_at__lt=now - job_timeout())
+    message = f"No result {job_timeout().total_seconds():.0f}s after the worker claimed the job"
+    failed = abandoned.filter(attempts__gte=max_attempts).update(
+        status=SnapshotJob.FAILED, finished_at=now, error=f"{message}; gave up after {max_attempts} attempts",
+    )
+    requeued = abandoned.update(
+        status=SnapshotJob.QUEUED, started_at=None, run_after=now, error=f"{message}; queued again",
+    )
+    return requeued, failed
+
+
+def claim_next_job():
+    """Atomically move the oldest due queued job to RUNNING; None when nothing is due."""
+    recover_abandoned_jobs()
+    while True:
+        job = (
+            SnapshotJob.objects
+            .filter(status=SnapshotJob.QUEUED, run_after__lte=timezone.now())
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        started_at = timezone.now()
+        claimed = SnapshotJob.objects.filter(pk=job.pk, status=SnapshotJob.QUEUED).update(
+            status=SnapshotJob.RUNNING, started_at=started_at, attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.status = SnapshotJob.RUNNING
+            job.started_at = started_at
+            job.attempts += 1
+            return job
+        # Another worker took it first — try the next one
+
+
+def run_job(job):
+    """Regenerate the job's snapshot and record the outcome on the job."""
+    try:
+        report = regenerate_snapshot(job.project, job.snapshot_date, incremental=True)
+        job.lock_wait_seconds = report.lock_wait_seconds
+    except Exception:
+        job.status = SnapshotJob.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.status = SnapshotJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'lock_wait_seconds'])
+    return job
@@ -0,0 +1,176 @@
+# core/management/commands/benchmark_import.py
+
+import random
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from core.importers import clean_podata, clean_timesheet, podata_entries, timesheet_entries
+from core.importers.podata import REQUIRED_COLUMNS as PO_COLUMNS, TEXT_COLUMNS as PO_TEXT_COLUMNS
+from core.importers.timesheet import REQUIRED_COLUMNS as TIMESHEET_COLUMNS
+from core.models import POData, Project, TimesheetEntry
+from core.resolution import MaterialIndex, RoleIndex
+
+
+def rowwise_timesheet_entries(df, role_index):
+    """The importer before column-wise conversion: per-row ``iterrows`` and parsing."""
+    df = df[TIMESHEET_COLUMNS].copy()
+    df.dropna(subset=['Date', 'EmpCd', 'CoNo', 'Hours'], how='any', inplace=True)
+    for column in ('CoNo', 'EmpCd', 'EmpName', 'RoleDescrptn'):
+        df[column] = df[column].astype(str).str.strip()
+    df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce')
+    df.dropna(subset=['Hours'], inplace=True)
+    df = df[df['CoNo'] != 'nan']
+    df = df[df['CoNo'] != '']
+
+    entries = []
+    for _, row in df.iterrows():
+        entries.append(TimesheetEntry(
+            date=pd.to_datetime(row['Date']).date(),
+            emp_cd=row['EmpCd'],
+            emp_name=row['EmpName'],
+            role_description=row['RoleDescrptn'],
+            co_no=row['CoNo'],
+            hours=row['Hours'],
+            sub_department_id=role_index.resolve(row['CoNo'], row['RoleDescrptn']),
+        ))
+    return entries
+
+
+def rowwise_podata_entries(df, material_index):
+    df = df[PO_COLUMNS + PO_TEXT_COLUMNS].copy()
+    df.dropna(subset=['CONo', 'POValue in Local Curr'], inplace=True)
+    df['CONo'] = df['CONo'].astype(str).str.strip()
+    df['POValue in Local Curr'] = pd.to_numeric(df['POValue in Local Curr'], errors='coerce')
+    df.dropna(subset=['POValue in Local Curr'], inplace=True)
+
+    entries = []
+    for _, row in df.iterrows():
+        entries.append(POData(
+            po_no=str(row['PoNo']).strip() if pd.notna(row['PoNo']) else "",
+            po_date=row['Po.Date'] if pd.notna(row['Po.Date']) else None,
+            sr_no=int(row['SrNo']) if pd.notna(row['SrNo']) and str(row['SrNo']).strip().isdigit() else None,
+            co_no=row['CONo'],
+            project_name=str(row['ProjName']).strip() if pd.notna(row['ProjName']) else "",
+            mat_code=str(row['MatCode']).strip() if pd.notna(row['MatCode']) else "UNKNOWN",
+            cost_category_id=material_index.resolve(row['MatCode']) if pd.notna(row['MatCode']) else None,
+            po_value_inr=row['POValue in Local Curr'],
+            item_code=str(row.get('ItemCode', '')).strip(),
+            description=str(row.get('Description', '')).strip(),
+            supplier_name=str(row.get('SupplierName', '')).strip(),
+        ))
+    return entries
+
+
+def columnwise_timesheet_entries(df, role_index):
+    return timesheet_entries(clean_timesheet(df), role_index)
+
+
+def columnwise_podata_entries(df, material_index):
+    return podata_entries(clean_podata(df), material_index)
+
+
+def stored_values(entries):
+    """What would be written for each object, as the model fields convert it."""
+    if not entries:
+        return []
+    fields = [field for field in entries[0]._meta.concrete_fields if not field.primary_key
+              and field.attname not in ('imported_at', 'updated_at', 'row_hash')]
+    return [tuple(field.to_python(getattr(entry, field.attname)) for field in fields) for entry in entries]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: clean a synthetic timesheet / PO sheet and build the model objects row by row "
+        "(iterrows) vs column-wise (core.importers). Reads master data for resolution; writes nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000, help="Synthetic rows per sheet (default: 500,000)")
+        parser.add_argument('--repeat', type=int, default=1, help="Best of N runs (default: 1)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_rows = options['rows']
+        co_nos = list(Project.objects.values_list('co_no', flat=True)) or ["30778", "30812", "31005"]
+
+        sheets = (
+            ("Timesheet", self.timesheet_sheet(rng, n_rows, co_nos), RoleIndex(),
+             rowwise_timesheet_entries, columnwise_timesheet_entries),
+            ("PO data", self.podata_sheet(rng, n_rows, co_nos), MaterialIndex(),
+             rowwise_podata_entries, columnwise_podata_entries),
+        )
+
+        self.stdout.write(f"Cleaning and converting {n_rows:,} synthetic rows (best of {options['repeat']})")
+        self.stdout.write("")
+        self.stdout.write(f"{'Sheet':<12}{'Rows':>10}{'Row-wise (s)':>14}{'Column-wise (s)':>17}{'Speedup':>10}")
+        for label, df, index, rowwise, columnwise in sheets:
+            rowwise_seconds, expected = self.best_of(rowwise, df, index, options['repeat'])
+            columnwise_seconds, entries = self.best_of(columnwise, df, index, options['repeat'])
+            if stored_values(expected) != stored_values(entries):
+                self.stderr.write(self.style.ERROR(f"{label}: rows differ between the two methods"))
+                return
+            speedup = rowwise_seconds / columnwise_seconds if columnwise_seconds > 0 else 0
+            self.stdout.write(
+                f"{label:<12}{len(entries):>10,}{rowwise_seconds:>14.3f}{columnwise_seconds:>17.3f}{speedup:>9.1f}x"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("Resulting rows identical for both methods"))
+
+    @staticmethod
+    def timesheet_sheet(rng, n_rows, co_nos):
+        """Columns as ``pd.read_excel`` returns them for a timesheet dump."""
+        roles = [" Project Management PRO", "engineering mechanical & pneumatic design kma_khp ",
+                 "Commissioning SITE", "Electrical design KEA"]
+        employees = rng.integers(0, 2000, n_rows)
+        hours = rng.integers(1, 49, n_rows) / 4
+        df = pd.DataFrame({
+            'Date': pd.Timestamp(2023, 1, 1) + pd.to_timedelta(rng.integers(0, 1000, n_rows), unit='D'),
+            'EmpCd': [f"E{i:05d}" for i in employees],
+            'EmpName': [f"Employee {i} " for i in employees],
+            'RoleDescrptn': np.array(roles, dtype=object)[rng.integers(0, len(roles), n_rows)],
+            'CoNo': np.array(co_nos, dtype=object)[rng.integers(0, len(co_nos), n_rows)],
+            'Hours': hours.astype(object),
+        })
+        # A few unusable rows, as in the real dumps
+        df.loc[rng.integers(0, n_rows, n_rows // 200), 'Hours'] = "n/a"
+        df.loc[rng.integers(0, n_rows, n_rows // 200), 'CoNo'] = None
+        return df
+
+    @staticmethod
+    def podata_sheet(rng, n_rows, co_nos):
+        """Columns as ``pd.read_excel`` returns them for a PO dump."""
+        random.seed(int(rng.integers(0, 2**31)))
+        mat_codes = [" ktma ", "KEMA", "ktmb", "KPUR "]
+        dates = pd.Series(pd.Timestamp(2023, 1, 1) + pd.to_timedelta(rng.integers(0, 1000, n_rows), unit='D'))
+        dates[rng.integers(0, n_rows, n_rows // 100)] = pd.NaT
+        values = rng.integers(100, 10_000_000, n_rows) / 100
+        values[rng.integers(0, n_rows, n_rows // 200)] = np.nan
+        mat = np.array(mat_codes, dtype=object)[rng.integers(0, len(mat_codes), n_rows)]
+        mat[rng.integers(0, n_rows, n_rows // 100)] = np.nan
+        return pd.DataFrame({
+            'PoNo': [f"45{i:08d}" for i in rng.integers(0, 10**8, n_rows)],
+            'Po.Date': dates,
+            'SrNo': rng.integers(1, 200, n_rows),
+            'CONo': np.array(co_nos, dtype=object)[rng.integers(0, len(co_nos), n_rows)],
+            'ProjName': "Test Line ",
+            'MatCode': mat,
+            'POValue in Local Curr': values,
+            'ItemCode': [f"IC{i}" for i in rng.integers(0, 5000, n_rows)],
+            'Description': random.choices(["Valve", "Cable tray ", "Pump"], k=n_rows),
+            'SupplierName': random.choices(["ACME", " Northwind"], k=n_rows),
+        })
+
+    @staticmethod
+    def best_of(func, df, index, repeat):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = func(df, index)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, result
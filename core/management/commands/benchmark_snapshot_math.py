@@ -0,0 +1,80 @@
+# core/management/commands/benchmark_snapshot_math.py
+
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+
+from core.psr_engine.fixedpoint import to_fixed, fixed_totals_to_decimal
+
+
+def accumulate_decimal(rows):
+    totals = {}
+    for key, value in rows:
+        totals[key] = totals.get(key, Decimal('0')) + Decimal(str(value))
+    return totals
+
+
+def accumulate_fixed(rows):
+    totals = {}
+    for key, value in rows:
+        totals[key] = totals.get(key, 0) + to_fixed(value)
+    return fixed_totals_to_decimal(totals)
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark: accumulate synthetic timesheet hours per sub-department with Decimal "
+        "vs integer centi-hours (core.psr_engine.fixedpoint), one Python row at a time. No database "
+        "access. The engine sums rows in SQL, so this does not time snapshot generation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic rows (default: 1,000,000)")
+        parser.add_argument('--keys', type=int, default=50, help="Distinct sub-departments (default: 50)")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of N runs (default: 3)")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        n_rows, n_keys = options['rows'], options['keys']
+
+        keys = [rng.randrange(n_keys) for _ in range(n_rows)]
+        # Hours as the importer sees them (pandas floats) and as the ORM returns them (Decimal)
+        float_hours = [rng.randrange(25, 1201, 25) / 100 for _ in range(n_rows)]
+        decimal_hours = [Decimal(str(value)) for value in float_hours]
+
+        self.stdout.write(
+            f"Micro-benchmark: accumulating {n_rows:,} synthetic rows into {n_keys} totals in Python "
+            f"(best of {options['repeat']})"
+        )
+        self.stdout.write(
+            "The engine sums hours in SQL and only converts the grouped totals; for snapshot "
+            "generation times see generate_psr_snapshot's Load/Compute/Save line."
+        )
+        self.stdout.write("")
+        self.stdout.write(f"{'Input':<10}{'Decimal (s)':>13}{'Fixed (s)':>12}{'Speedup':>10}")
+
+        for label, values in (("float", float_hours), ("Decimal", decimal_hours)):
+            rows = list(zip(keys, values))
+            decimal_seconds, decimal_totals = self.best_of(accumulate_decimal, rows, options['repeat'])
+            fixed_seconds, fixed_totals = self.best_of(accumulate_fixed, rows, options['repeat'])
+
+            if decimal_totals != fixed_totals:
+                self.stderr.write(self.style.ERROR(f"{label}: totals differ between the two methods"))
+                return
+            speedup = decimal_seconds / fixed_seconds if fixed_seconds > 0 else 0
+            self.stdout.write(f"{label:<10}{decimal_seconds:>13.3f}{fixed_seconds:>12.3f}{speedup:>9.1f}x")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("Totals identical for both methods"))
+
+    @staticmethod
+    def best_of(func, rows, repeat):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = func(rows)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, result
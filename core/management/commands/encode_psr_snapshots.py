@@ -0,0 +1,98 @@
+# core/management/commands/encode_psr_snapshots.py
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import PSRSnapshot
+from core.snapshot_codec import (
+    ENCODING_JSON, ENCODING_COLUMNAR, encode_data, load_payload, stored_size,
+)
+
+
+ENCODINGS = {'json': ENCODING_JSON, 'columnar': ENCODING_COLUMNAR}
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encode stored PSRSnapshot.data (plain JSON <-> compact columnar/zlib) "
+        "and report payload sizes before and after"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--encoding', choices=sorted(ENCODINGS), default='columnar',
+                            help="Target encoding (default: columnar)")
+        parser.add_argument('--project', help="Only snapshots of this CO number")
+        parser.add_argument('--batch-size', type=int, default=200, help="Snapshots per transaction (default: 200)")
+        parser.add_argument('--dry-run', action='store_true', help="Report sizes without writing")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="Run VACUUM afterwards (SQLite) and report the database file size")
+
+    def handle(self, *args, **options):
+        target = ENCODINGS[options['encoding']]
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['vacuum'] and connection.vendor != 'sqlite':
+            raise CommandError("--vacuum is only supported on SQLite")
+
+        snapshots = PSRSnapshot.objects.order_by('pk')
+        if options['project']:
+            snapshots = snapshots.filter(project__co_no=options['project'])
+        pks = list(snapshots.values_list('pk', flat=True))
+
+        file_before = self.database_size() if options['vacuum'] else None
+        converted = size_before = size_after = 0
+        for i in range(0, len(pks), batch_size):
+            pending = []
+            for pk, data, blob, encoding in (
+                PSRSnapshot.objects
+                .filter(pk__in=pks[i:i + batch_size])
+                .values_list('pk', 'data', 'data_blob', 'data_encoding')
+            ):
+                before = stored_size(data, blob, encoding)
+                size_before += before
+                if encoding == target:
+                    size_after += before
+                    continue
+
+                payload = load_payload(data, blob, encoding)
+                if target == ENCODING_COLUMNAR:
+                    snapshot = PSRSnapshot(pk=pk, data={}, data_blob=encode_data(payload), data_encoding=target)
+                else:
+                    snapshot = PSRSnapshot(pk=pk, data=payload, data_blob=None, data_encoding=target)
+                size_after += stored_size(snapshot.data, snapshot.data_blob, target)
+                pending.append(snapshot)
+
+            converted += len(pending)
+            if pending and not options['dry_run']:
+                with transaction.atomic():
+                    PSRSnapshot.objects.bulk_update(pending, ['data', 'data_blob', 'data_encoding'])
+
+        self.stdout.write(f"Snapshots: {len(pks)} ({converted} {'to re-encode' if options['dry_run'] else 're-encoded'})")
+        self.stdout.write(f"Payload size before: {self.human(size_before)}")
+        self.stdout.write(f"Payload size after:  {self.human(size_after)}")
+        if size_before:
+            self.stdout.write(f"Ratio: {size_after / size_before:.1%} of the original")
+
+        if options['vacuum'] and not options['dry_run']:
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write(
+                f"Database file: {self.human(file_before)} -> {self.human(self.database_size())}"
+            )
+        self.stdout.write(self.style.SUCCESS("Done" if not options['dry_run'] else "Dry run, nothing written"))
+
+    @staticmethod
+    def database_size():
+        return os.path.getsize(settings.DATABASES['default']['NAME'])
+
+    @staticmethod
+    def human(size):
+        for unit in ('B', 'KB', 'MB'):
+            if size < 1024:
+                return f"{size:,.1f} {unit}" if unit != 'B' else f"{size:,} B"
+            size /= 1024
+        return f"{size:,.1f} GB"
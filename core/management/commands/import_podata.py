@@ -1,13 +1,22 @@
 # core/management/commands/import_podata.py
 
 import os
-import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 
-from core.models import POData
+from core.importers import (
+    MissingColumnsError, SheetReadError, cleaned_frames, peak_rss, format_bytes,
+    podata_entries, save_podata_entries,
+)
+from core.importers.diff import RowDiff
+from core.importers.cache import file_digest
+from core.importers.ledger import find_imported, import_run, mark_failed, record_skip
+from core.importers.podata import KEY_FIELDS, UPDATED_FIELDS, changed_podata_entries
+from core.models import ImportRun, POData
+from core.staleness import mark_stale, merge_changes, po_changes
+from core.resolution import MaterialIndex
 
 
 class Command(BaseCommand):
@@ -20,6 +29,16 @@ class Command(BaseCommand):
             help="Filename (e.g., '20251031 PO Data.xls') or full path"
         )
         parser.add_argument('--dry-run', action='store_true', help="Show what would be imported without saving")
+        parser.add_argument('--stream', action='store_true',
+                            help="Read, clean and upsert the sheet in chunks to bound memory use")
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="Rows per chunk with --stream (default: 10000)")
+        parser.add_argument('--diff', action='store_true',
+                            help="Write only new and changed lines (by content hash) and report what changed")
+        parser.add_argument('--force', action='store_true',
+                            help="Import the file even if the import ledger shows it was imported already")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Parse the workbook even if its cleaned rows are in the parse cache")
 
     def handle(self, *args, **options):
         filename_or_path = options['file']
@@ -38,91 +57,113 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Importing PO data: {os.path.basename(file_path)}")
 
-        # Read Excel
-        df = None
-        for engine in ['openpyxl', 'xlrd']:
-            try:
-                df = pd.read_excel(
-                    file_path,
-                    sheet_name="Data",
-                    skiprows=2,
-                    engine=engine
-                )
-                self.stdout.write(f"Successfully read with engine: {engine}")
-                break
-            except Exception as e:
-                self.stdout.write(f"Engine {engine} failed: {e}")
-
-        if df is None:
-            self.stderr.write(self.style.ERROR("Could not read the Excel file with any engine."))
-            return
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
 
-        if df.empty:
-            self.stdout.write(self.style.WARNING("No data found in the 'Data' sheet."))
+        checksum = file_digest(file_path)
+        if dry_run:
+            self.import_file(file_path, checksum, options, run=None)
             return
-
-        # Required columns from your file
-        required_cols = ['PoNo', 'Po.Date', 'SrNo', 'CONo', 'ProjName', 'MatCode', 'POValue in Local Curr']
-        missing = [col for col in required_cols if col not in df.columns]
-        if missing:
-            self.stderr.write(self.style.ERROR(f"Missing required columns: {missing}"))
+        previous = find_imported(ImportRun.PODATA, checksum)
+        if previous and not options['force']:
+            record_skip(ImportRun.PODATA, file_path, checksum, previous)
+            self.stdout.write(self.style.WARNING(
+                f"Already imported by run #{previous.pk} on {previous.finished_at:%Y-%m-%d %H:%M}; "
+                f"use --force to import it again."
+            ))
             return
+        run_options = {key: options[key] for key in ('stream', 'chunk_size', 'diff', 'no_cache', 'force')}
+        with import_run(ImportRun.PODATA, file_path, checksum, run_options) as run:
+            self.import_file(file_path, checksum, options, run)
 
-        total_rows = len(df)
-        self.stdout.write(f"Found {total_rows} rows in file.")
+    def import_file(self, file_path, checksum, options, run):
+        dry_run = options['dry_run']
+        if options['stream']:
+            # Bounded memory: each chunk is cleaned and upserted before the next is read
+            self.stdout.write(f"Streaming the 'Data' sheet in chunks of {options['chunk_size']} rows")
+        frames = cleaned_frames(
+            file_path, 'podata', stream=options['stream'], chunk_size=options['chunk_size'],
+            use_cache=not options['no_cache'], digest=checksum, log=self.stdout.write,
+        )
 
-        # Clean and filter
-        df = df[required_cols + ['ItemCode', 'Description', 'SupplierName']].copy()
-        df.dropna(subset=['CONo', 'POValue in Local Curr'], inplace=True)
-        df['CONo'] = df['CONo'].astype(str).str.strip()
-        df['POValue in Local Curr'] = pd.to_numeric(df['POValue in Local Curr'], errors='coerce')
-        df.dropna(subset=['POValue in Local Curr'], inplace=True)
+        # Resolve each line's material code to a cost category once, here
+        material_index = MaterialIndex()
 
-        valid_count = len(df)
-        self.stdout.write(f"{valid_count} valid rows after cleaning.")
+        start_time = timezone.now()
+        total_rows = valid_count = imported_count = chunks = 0
+        changes = {}
+        # Compare with the stored rows' hashes and write only new / changed lines
+        diff = RowDiff(POData, KEY_FIELDS, 'co_no', UPDATED_FIELDS) if options['diff'] else None
+        stale_count = 0
+        try:
+            for raw_rows, df in frames:
+                chunks += 1
+                total_rows += raw_rows
+                valid_count += len(df)
+                entries = podata_entries(df, material_index)
+                new, changed = diff.split(entries) if diff else (entries, [])
+                if not dry_run and entries:
+                    # One short transaction per chunk: the database write lock is not held
+                    # while the next chunk is read and cleaned. A file that fails partway
+                    # is left FAILED in the ledger and can be imported again.
+                    with transaction.atomic():
+                        if diff:
+                            written = new + changed
+                            imported_count += save_podata_entries(new)
+                            diff.save_changed(changed)
+                            imported_count += len(changed)
+                        else:
+                            # The upsert rewrites unchanged lines too; only this chunk's new and
+                            # changed lines (looked up before writing) change anything
+                            written = changed_podata_entries(entries)
+                            imported_count += save_podata_entries(entries)
+                        # Back-dated lines change already generated snapshots
+                        chunk_changes = po_changes(written) if written else {}
+                        stale_count += mark_stale(chunk_changes)
+                    merge_changes(changes, chunk_changes)
+                if options['stream'] and options['verbosity'] > 1:
+                    self.stdout.write(f"  chunk {chunks}: {total_rows} rows read, {valid_count} valid")
+        except SheetReadError:
+            self.stderr.write(self.style.ERROR("Could not read the Excel file with any engine."))
+            mark_failed(run, "Could not read the Excel file with any engine.")
+            return
+        except MissingColumnsError as e:
+            self.stderr.write(self.style.ERROR(f"Missing required columns: {e.missing}"))
+            mark_failed(run, str(e))
+            return
+        finally:
+            # Also for a file that failed partway: its earlier chunks are committed
+            if run is not None:
+                run.rows_read, run.rows_valid, run.rows_written = total_rows, valid_count, imported_count
+                run.rows_unchanged = diff.counts['unchanged'] if diff else None
+                run.stale_snapshots = stale_count
+                run.affected_projects.set(changes)
+
+        if total_rows == 0:
+            self.stdout.write(self.style.WARNING("No data found in the 'Data' sheet."))
+            return
 
+        self.stdout.write(f"Found {total_rows} rows in file, {valid_count} valid rows after cleaning.")
         if valid_count == 0:
             self.stdout.write(self.style.WARNING("No valid data to import."))
             return
 
-        # Prepare objects
-        entries = []
-        for _, row in df.iterrows():
-            entries.append(POData(
-                po_no=str(row['PoNo']).strip() if pd.notna(row['PoNo']) else "",
-                po_date=row['Po.Date'] if pd.notna(row['Po.Date']) else None,
-                sr_no=int(row['SrNo']) if pd.notna(row['SrNo']) and str(row['SrNo']).strip().isdigit() else None,
-                co_no=row['CONo'],
-                project_name=str(row['ProjName']).strip() if pd.notna(row['ProjName']) else "",
-                mat_code=str(row['MatCode']).strip() if pd.notna(row['MatCode']) else "UNKNOWN",
-                po_value_inr=row['POValue in Local Curr'],
-                item_code=str(row.get('ItemCode', '')).strip(),
-                description=str(row.get('Description', '')).strip(),
-                supplier_name=str(row.get('SupplierName', '')).strip(),
-            ))
+        if diff:
+            self.stdout.write(
+                f"Inserted: {diff.counts['inserted']}, updated: {diff.counts['updated']}, "
+                f"unchanged: {diff.counts['unchanged']}, vanished: {diff.vanished}"
+                + (f" ({diff.counts['duplicate']} repeated keys skipped)" if diff.counts['duplicate'] else "")
+            )
 
         if dry_run:
-            self.stdout.write(self.style.SUCCESS(f"[DRY RUN] Would import {len(entries)} records."))
-            return
-
-        # Bulk import with conflict handling
-        start_time = timezone.now()
-        with transaction.atomic():
-            imported_count = 0
-            batch_size = 5000
-            for i in range(0, len(entries), batch_size):
-                batch = entries[i:i + batch_size]
-                created = POData.objects.bulk_create(
-                    batch,
-                    update_conflicts=True,
-                    update_fields=['po_value_inr', 'updated_at'],  # Update value if duplicate
-                    unique_fields=['co_no', 'po_no', 'sr_no']
+            self.stdout.write(self.style.SUCCESS(f"[DRY RUN] Would import {valid_count} records."))
+        else:
+            duration = (timezone.now() - start_time).total_seconds()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully imported/updated {imported_count} POData records in {duration:.2f}s"
                 )
-                imported_count += len(created)
-
-        duration = (timezone.now() - start_time).total_seconds()
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Successfully imported/updated {imported_count} POData records in {duration:.2f}s"
             )
-    )
\ No newline at end of file
+            if stale_count:
+                self.stdout.write(f"Flagged {stale_count} existing snapshots as stale")
+        self.stdout.write(f"Peak RSS: {format_bytes(peak_rss())}")
@@ -1,13 +1,22 @@
 # core/management/commands/import_timesheet.py
 
 import os
-import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 
-from core.models import TimesheetEntry
+from core.importers import (
+    MissingColumnsError, SheetReadError, cleaned_frames, peak_rss, format_bytes,
+    timesheet_entries, save_timesheet_entries,
+)
+from core.importers.diff import RowDiff
+from core.importers.cache import file_digest
+from core.importers.ledger import find_imported, import_run, mark_failed, record_skip
+from core.importers.timesheet import KEY_FIELDS, UPDATED_FIELDS
+from core.models import ImportRun, TimesheetEntry
+from core.staleness import mark_stale, merge_changes, timesheet_changes, timesheet_changes_since
+from core.resolution import RoleIndex
 
 
 class Command(BaseCommand):
@@ -20,6 +29,16 @@ class Command(BaseCommand):
             help="Filename (e.g., '20251031 Timesheet Report.xls') or full path"
         )
         parser.add_argument('--dry-run', action='store_true', help="Show what would be imported without saving")
+        parser.add_argument('--stream', action='store_true',
+                            help="Read, clean and insert the sheet in chunks to bound memory use")
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="Rows per chunk with --stream (default: 10000)")
+        parser.add_argument('--diff', action='store_true',
+                            help="Write only new and changed rows (by content hash) and report what changed")
+        parser.add_argument('--force', action='store_true',
+                            help="Import the file even if the import ledger shows it was imported already")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Parse the workbook even if its cleaned rows are in the parse cache")
 
     def handle(self, *args, **options):
         filename_or_path = options['file']
@@ -38,99 +57,120 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Importing timesheet: {os.path.basename(file_path)}")
 
-        # Try different engines (xlrd for .xls, openpyxl for .xlsx)
-        df = None
-        for engine in ['xlrd', 'openpyxl']:
-            try:
-                df = pd.read_excel(
-                    file_path,
-                    sheet_name="Data",
-                    skiprows=2,  # Headers are in row 3
-                    engine=engine
-                )
-                self.stdout.write(f"Successfully read file with engine: {engine}")
-                break
-            except Exception as e:
-                self.stdout.write(f"Engine {engine} failed: {e}")
-
-        if df is None:
-            self.stderr.write(self.style.ERROR("Failed to read the Excel file with any engine."))
-            return
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
 
-        if df.empty:
-            self.stdout.write(self.style.WARNING("No data found in the 'Data' sheet."))
+        checksum = file_digest(file_path)
+        if dry_run:
+            self.import_file(file_path, checksum, options, run=None)
             return
-
-        # Expected column names (adjust if your file uses different spelling/casing)
-        required_columns = ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours']
-        missing = [col for col in required_columns if col not in df.columns]
-        if missing:
-            self.stderr.write(self.style.ERROR(f"Missing required columns: {missing}"))
-            self.stderr.write(f"Available columns: {list(df.columns)}")
+        previous = find_imported(ImportRun.TIMESHEET, checksum)
+        if previous and not options['force']:
+            record_skip(ImportRun.TIMESHEET, file_path, checksum, previous)
+            self.stdout.write(self.style.WARNING(
+                f"Already imported by run #{previous.pk} on {previous.finished_at:%Y-%m-%d %H:%M}; "
+                f"use --force to import it again."
+            ))
             return
+        run_options = {key: options[key] for key in ('stream', 'chunk_size', 'diff', 'no_cache', 'force')}
+        with import_run(ImportRun.TIMESHEET, file_path, checksum, run_options) as run:
+            self.import_file(file_path, checksum, options, run)
 
-        total_rows = len(df)
-        self.stdout.write(f"Found {total_rows} rows in file → processing...")
-
-        # Keep only required columns
-        df = df[required_columns].copy()
-
-        # Drop rows missing any critical field
-        df.dropna(subset=['Date', 'EmpCd', 'CoNo', 'Hours'], how='any', inplace=True)
-
-        # Clean and convert
-        df['CoNo'] = df['CoNo'].astype(str).str.strip()
-        df['EmpCd'] = df['EmpCd'].astype(str).str.strip()
-        df['EmpName'] = df['EmpName'].astype(str).str.strip()
-        df['RoleDescrptn'] = df['RoleDescrptn'].astype(str).str.strip()
-
-        # Convert Hours to numeric (invalid become NaN)
-        df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce')
-
-        # Drop rows with invalid Hours or empty CoNo
-        df.dropna(subset=['Hours'], inplace=True)
-        df = df[df['CoNo'] != 'nan']
-        df = df[df['CoNo'] != '']
+    def import_file(self, file_path, checksum, options, run):
+        dry_run = options['dry_run']
+        if options['stream']:
+            # Bounded memory: each chunk is cleaned and inserted before the next is read
+            self.stdout.write(f"Streaming the 'Data' sheet in chunks of {options['chunk_size']} rows")
+        frames = cleaned_frames(
+            file_path, 'timesheet', stream=options['stream'], chunk_size=options['chunk_size'],
+            use_cache=not options['no_cache'], digest=checksum, log=self.stdout.write,
+        )
 
-        # Optional: Keep only valid project codes (length >= 5)
-        # Remove this line if you want to import everything
-        # df = df[df['CoNo'].str.len() >= 5]
+        # Resolve each row's role to a sub-department once, here
+        role_index = RoleIndex()
 
-        valid_count = len(df)
-        self.stdout.write(f"{valid_count} valid rows after cleaning.")
+        start_time = timezone.now()
+        total_rows = valid_count = imported = unresolved = chunks = 0
+        changes = {}
+        # Compare with the stored rows' hashes and write only new / changed rows
+        diff = RowDiff(TimesheetEntry, KEY_FIELDS, 'date', UPDATED_FIELDS) if options['diff'] else None
+        stale_count = 0
+        try:
+            for raw_rows, df in frames:
+                chunks += 1
+                total_rows += raw_rows
+                valid_count += len(df)
+                entries = timesheet_entries(df, role_index)
+                unresolved += sum(1 for entry in entries if entry.sub_department_id is None)
+                new, changed = diff.split(entries) if diff else (entries, [])
+                if not dry_run and entries:
+                    # One short transaction per chunk: the database write lock is not held
+                    # while the next chunk is read and cleaned. A file that fails partway
+                    # is left FAILED in the ledger and can be imported again.
+                    with transaction.atomic():
+                        written_at = timezone.now()
+                        imported += save_timesheet_entries(new)
+                        if diff:
+                            diff.save_changed(changed)
+                            imported += len(changed)
+                            chunk_changes = timesheet_changes(new + changed)
+                        else:
+                            # ignore_conflicts leaves stored rows as they are: only the rows
+                            # inserted now (with a fresh updated_at) change anything
+                            chunk_changes = timesheet_changes_since(written_at)
+                        # Back-dated rows change already generated snapshots
+                        stale_count += mark_stale(chunk_changes)
+                    merge_changes(changes, chunk_changes)
+                if options['stream'] and options['verbosity'] > 1:
+                    self.stdout.write(f"  chunk {chunks}: {total_rows} rows read, {valid_count} valid")
+        except SheetReadError:
+            self.stderr.write(self.style.ERROR("Failed to read the Excel file with any engine."))
+            mark_failed(run, "Failed to read the Excel file with any engine.")
+            return
+        except MissingColumnsError as e:
+            self.stderr.write(self.style.ERROR(f"Missing required columns: {e.missing}"))
+            mark_failed(run, str(e))
+            self.stderr.write(f"Available columns: {e.available}")
+            return
+        finally:
+            # Also for a file that failed partway: its earlier chunks are committed
+            if run is not None:
+                run.rows_read, run.rows_valid, run.rows_written = total_rows, valid_count, imported
+                run.rows_unchanged = diff.counts['unchanged'] if diff else None
+                run.stale_snapshots = stale_count
+                run.affected_projects.set(changes)
+
+        if total_rows == 0:
+            self.stdout.write(self.style.WARNING("No data found in the 'Data' sheet."))
+            return
 
+        self.stdout.write(f"Found {total_rows} rows in file, {valid_count} valid rows after cleaning.")
         if valid_count == 0:
             self.stdout.write(self.style.WARNING("No valid data to import."))
             return
 
-        # Prepare TimesheetEntry objects
-        entries = []
-        for _, row in df.iterrows():
-            entries.append(TimesheetEntry(
-                date=pd.to_datetime(row['Date']).date(),
-                emp_cd=row['EmpCd'],
-                emp_name=row['EmpName'],
-                role_description=row['RoleDescrptn'],
-                co_no=row['CoNo'],
-                hours=row['Hours']
+        if unresolved:
+            self.stdout.write(self.style.WARNING(
+                f"{unresolved} rows could not be matched to a project sub-department "
+                f"(run `resolve_mappings` after adding projects or fixing role descriptions)."
             ))
 
-        if dry_run:
-            self.stdout.write(self.style.SUCCESS(f"[DRY RUN] Would import {len(entries)} TimesheetEntry records."))
-            return
-
-        # Bulk import with conflict handling
-        start_time = timezone.now()
-        with transaction.atomic():
-            TimesheetEntry.objects.bulk_create(
-                entries,
-                ignore_conflicts=True,  # Skip duplicates based on unique constraint
-                batch_size=5000
+        if diff:
+            self.stdout.write(
+                f"Inserted: {diff.counts['inserted']}, updated: {diff.counts['updated']}, "
+                f"unchanged: {diff.counts['unchanged']}, vanished: {diff.vanished}"
+                + (f" ({diff.counts['duplicate']} repeated keys skipped)" if diff.counts['duplicate'] else "")
             )
 
-        duration = (timezone.now() - start_time).total_seconds()
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Successfully imported {len(entries)} TimesheetEntry records in {duration:.2f} seconds"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"[DRY RUN] Would import {valid_count} TimesheetEntry records."))
+        else:
+            duration = (timezone.now() - start_time).total_seconds()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully imported {imported} TimesheetEntry records in {duration:.2f} seconds"
+                )
             )
-        )
\ No newline at end of file
+            if stale_count:
+                self.stdout.write(f"Flagged {stale_count} existing snapshots as stale")
+        self.stdout.write(f"Peak RSS: {format_bytes(peak_rss())}")
@@ -0,0 +1,53 @@
+# core/management/commands/resolve_mappings.py
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Project, TimesheetEntry, POData
+from core.resolution import RoleIndex, MaterialIndex, resolve_timesheet_entries, resolve_po_entries
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-resolve imported timesheet rows to sub-departments and PO lines to cost categories. "
+        "Run after changing SubDepartment.role_descrptn / CostCategory.mat_code, "
+        "or after creating projects for already-imported data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=str, help="Only re-resolve rows for this project co_no")
+        parser.add_argument(
+            '--only', type=str, choices=['timesheet', 'podata'],
+            help="Only re-resolve one of the dump tables"
+        )
+
+    def handle(self, *args, **options):
+        co_no = options.get('project')
+        only = options.get('only')
+
+        timesheet_entries = TimesheetEntry.objects.all()
+        po_entries = POData.objects.all()
+        if co_no:
+            if not Project.objects.filter(co_no=co_no).exists():
+                self.stderr.write(self.style.ERROR(f"Project {co_no} not found"))
+                return
+            timesheet_entries = timesheet_entries.filter(co_no__startswith=co_no)
+            po_entries = po_entries.filter(co_no__startswith=co_no)
+
+        if only in (None, 'timesheet'):
+            start_time = timezone.now()
+            changed = resolve_timesheet_entries(timesheet_entries, RoleIndex())
+            unresolved = timesheet_entries.filter(sub_department__isnull=True).count()
+            duration = (timezone.now() - start_time).total_seconds()
+            self.stdout.write(self.style.SUCCESS(
+                f"Re-resolved timesheet roles: {changed} rows changed, {unresolved} unresolved ({duration:.2f}s)"
+            ))
+
+        if only in (None, 'podata'):
+            start_time = timezone.now()
+            changed = resolve_po_entries(po_entries, MaterialIndex())
+            unresolved = po_entries.filter(cost_category__isnull=True).count()
+            duration = (timezone.now() - start_time).total_seconds()
+            self.stdout.write(self.style.SUCCESS(
+                f"Re-resolved PO material codes: {changed} rows changed, {unresolved} unresolved ({duration:.2f}s)"
+            ))
@@ -0,0 +1,53 @@
+# core/management/commands/run_snapshot_jobs.py
+
+import time
+from django.core.management.base import BaseCommand
+
+from core.jobs import claim_next_job, recover_abandoned_jobs, run_job
+from core.models import SnapshotJob
+
+
+class Command(BaseCommand):
+    help = "Worker that processes queued snapshot regeneration jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the jobs that are currently due, then exit")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        once = options['once']
+        poll_interval = options['poll_interval']
+
+        self.stdout.write(self.style.SUCCESS("Snapshot job worker started"))
+        requeued, failed = recover_abandoned_jobs()
+        if requeued or failed:
+            self.stdout.write(self.style.WARNING(
+                f"Recovered jobs left RUNNING by a stopped worker: {requeued} queued again, {failed} failed"
+            ))
+        processed = 0
+        merged = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            job = run_job(job)
+            processed += 1
+            merged += job.merged_count
+            if job.status == SnapshotJob.DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Job #{job.pk} {job.project.co_no} {job.snapshot_date}: done in {job.run_seconds:.2f}s "
+                    f"(queued {job.queued_seconds:.2f}s, lock wait {job.lock_wait_seconds or 0:.2f}s, "
+                    f"{job.merged_count} merged requests)"
+                ))
+            else:
+                self.stderr.write(self.style.ERROR(
+                    f"Job #{job.pk} {job.project.co_no} {job.snapshot_date}: failed\n{job.error}"
+                ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} jobs ({merged} regeneration requests merged into them)"
+        ))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:30
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def resolve_existing_entries(apps, schema_editor):
+    # Frozen copy of the matching in core.resolution at the time of this migration:
+    # the longest project co_no the row's CoNo starts with, then the first
+    # sub-department (by id) whose role description matches, case-insensitively
+    TimesheetEntry = apps.get_model('core', 'TimesheetEntry')
+    SubDepartment = apps.get_model('core', 'SubDepartment')
+
+    by_project = defaultdict(dict)
+    for sub_dept_id, role_descrptn, co_no in (
+        SubDepartment.objects.order_by('id').values_list('id', 'role_descrptn', 'department__project__co_no')
+    ):
+        if role_descrptn is not None:
+            by_project[co_no].setdefault(role_descrptn.strip().lower(), sub_dept_id)
+    prefix_lengths = sorted({len(co_no) for co_no in by_project}, reverse=True)
+
+    def resolve(co_no, role_description):
+        co_no = co_no or ""
+        for length in prefix_lengths:
+            prefix = co_no[:length]
+            if len(prefix) == length and prefix in by_project:
+                return by_project[prefix].get((role_description or "").strip().lower())
+        return None
+
+    targets = defaultdict(list)
+    for entry_id, co_no, role_description in (
+        TimesheetEntry.objects.values_list('id', 'co_no', 'role_description').iterator(chunk_size=5000)
+    ):
+        target = resolve(co_no, role_description)
+        if target is not None:
+            targets[target].append(entry_id)
+    now = timezone.now()
+    for target, ids in targets.items():
+        for i in range(0, len(ids), 5000):
+            TimesheetEntry.objects.filter(id__in=ids[i:i + 5000]).update(sub_department_id=target, updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_project_sales_value_foreign_curr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheetentry',
+            name='sub_department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timesheet_entries', to='core.subdepartment'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheetentry',
+            index=models.Index(fields=['sub_department', 'date'], name='core_timesh_sub_dep_1fac42_idx'),
+        ),
+        migrations.RunPython(resolve_existing_entries, migrations.RunPython.noop),
+    ]
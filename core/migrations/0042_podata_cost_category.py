@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:31
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def resolve_existing_entries(apps, schema_editor):
+    # Frozen copy of the matching in core.resolution at the time of this migration:
+    # the first cost category (by id) whose mat_code matches, case-insensitively
+    POData = apps.get_model('core', 'POData')
+    CostCategory = apps.get_model('core', 'CostCategory')
+
+    by_mat_code = {}
+    for cat_id, mat_code in CostCategory.objects.order_by('id').values_list('id', 'mat_code'):
+        if mat_code is not None:
+            by_mat_code.setdefault(mat_code.strip().lower(), cat_id)
+
+    targets = defaultdict(list)
+    for entry_id, mat_code in POData.objects.values_list('id', 'mat_code').iterator(chunk_size=5000):
+        target = by_mat_code.get((mat_code or "").strip().lower())
+        if target is not None:
+            targets[target].append(entry_id)
+    now = timezone.now()
+    for target, ids in targets.items():
+        for i in range(0, len(ids), 5000):
+            POData.objects.filter(id__in=ids[i:i + 5000]).update(cost_category_id=target, updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_timesheetentry_sub_department'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podata',
+            name='cost_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='po_lines', to='core.costcategory'),
+        ),
+        migrations.AddIndex(
+            model_name='podata',
+            index=models.Index(fields=['co_no', 'cost_category'], name='core_podata_co_no_743bb1_idx'),
+        ),
+        migrations.RunPython(resolve_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_podata_cost_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='actuals_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='podata',
+            index=models.Index(fields=['updated_at'], name='core_podata_updated_e20d3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheetentry',
+            index=models.Index(fields=['updated_at'], name='core_timesh_updated_fe86ad_idx'),
+        ),
+    ]
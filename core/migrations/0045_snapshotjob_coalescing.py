@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:36
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_snapshotjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotjob',
+            name='merged_count',
+            field=models.PositiveIntegerField(default=0, help_text='Requests merged into this job after it was queued'),
+        ),
+        migrations.AddField(
+            model_name='snapshotjob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Worker will not start the job before this time'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotjob',
+            index=models.Index(fields=['status', 'run_after'], name='core_snapsh_status_1bb18c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotjob',
+            index=models.Index(fields=['project', 'snapshot_date', 'status'], name='core_snapsh_project_4ab1c9_idx'),
+        ),
+    ]
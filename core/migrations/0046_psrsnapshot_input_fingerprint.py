@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_snapshotjob_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
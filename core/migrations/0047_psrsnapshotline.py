@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_lines(apps, schema_editor):
+    from core.psr_engine.lines import LINE_VALUE_FIELDS, iter_data_cells, _quantize
+
+    PSRSnapshot = apps.get_model('core', 'PSRSnapshot')
+    PSRSnapshotLine = apps.get_model('core', 'PSRSnapshotLine')
+    lines = []
+    for snapshot_id, project_id, snapshot_date, data in (
+        PSRSnapshot.objects.values_list('id', 'project_id', 'snapshot_date', 'data').iterator()
+    ):
+        for section, department, code, cell in iter_data_cells(data):
+            lines.append(PSRSnapshotLine(
+                snapshot_id=snapshot_id,
+                project_id=project_id,
+                snapshot_date=snapshot_date,
+                section=section,
+                department=department,
+                code=code,
+                ref_id=cell.get("id"),
+                inkrement=cell.get("inkrement") or "",
+                **{field: _quantize(cell.get(field)) for field in LINE_VALUE_FIELDS},
+            ))
+        if len(lines) >= 1000:
+            PSRSnapshotLine.objects.bulk_create(lines)
+            lines = []
+    PSRSnapshotLine.objects.bulk_create(lines)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_psrsnapshot_input_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PSRSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('section', models.CharField(choices=[('TIMESHEET_HOURS', 'Timesheet Hours'), ('TIMESHEET_COST', 'Timesheet Cost'), ('COST_TO_GO', 'Cost To Go')], max_length=20)),
+                ('department', models.CharField(blank=True, help_text='Department name (timesheet sections only)', max_length=100)),
+                ('code', models.CharField(max_length=50)),
+                ('ref_id', models.IntegerField(blank=True, help_text='SubDepartment / ProjectCostCategory id', null=True)),
+                ('inkrement', models.CharField(blank=True, max_length=100)),
+                ('baseline_budget', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('last_month_actuals', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('actuals', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('budget', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('forecast', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('prognosis', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('balance_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rest', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('rest_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='psr_snapshot_lines', to='core.project')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.psrsnapshot')),
+            ],
+            options={
+                'verbose_name': 'PSR Snapshot Line',
+                'verbose_name_plural': 'PSR Snapshot Lines',
+                'ordering': ['snapshot_date', 'section', 'department', 'code'],
+                'indexes': [models.Index(fields=['project', 'code', 'snapshot_date'], name='core_psrsna_project_aa9c17_idx'), models.Index(fields=['section', 'snapshot_date'], name='core_psrsna_section_995ea2_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_psrsnapshotline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='data_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='data_encoding',
+            field=models.CharField(blank=True, choices=[('', 'JSON'), ('columnar-zlib', 'Columnar + zlib')], default='', max_length=20),
+        ),
+    ]
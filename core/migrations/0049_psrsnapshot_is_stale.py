@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_psrsnapshot_data_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='is_stale',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='stale_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
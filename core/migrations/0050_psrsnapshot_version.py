@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_psrsnapshot_is_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
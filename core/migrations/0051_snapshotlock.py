@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_psrsnapshot_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotLock',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot_lock', serialize=False, to='core.project')),
+                ('holder', models.CharField(blank=True, max_length=100)),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Held locks past this time are taken over', null=True)),
+                ('acquisitions', models.PositiveIntegerField(default=0)),
+                ('contended', models.PositiveIntegerField(default=0, help_text='Acquisitions that had to wait for another run')),
+                ('reused_runs', models.PositiveIntegerField(default=0, help_text="Waiters that reused the other run's snapshot")),
+                ('total_wait_seconds', models.FloatField(default=0)),
+                ('max_wait_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Lock',
+                'verbose_name_plural': 'Snapshot Locks',
+            },
+        ),
+        migrations.AddField(
+            model_name='snapshotjob',
+            name='lock_wait_seconds',
+            field=models.FloatField(blank=True, help_text="Time spent waiting for the project's regeneration lock", null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0051_snapshotlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='generation_seconds',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='psrsnapshot',
+            name='generation_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
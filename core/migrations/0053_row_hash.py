@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:14
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Frozen copies of the importers' hashed fields and ``row_hashes`` as of this
+# migration, so the backfill does not change when the importers do.
+HASHED_FIELDS = {
+    'TimesheetEntry': ['date', 'emp_cd', 'emp_name', 'role_description', 'co_no', 'hours'],
+    'POData': ['po_no', 'po_date', 'sr_no', 'co_no', 'project_name', 'mat_code', 'po_value_inr',
+               'item_code', 'description', 'supplier_name'],
+}
+
+
+def row_hashes(model, columns, attnames):
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    canonical = [_canonical_column(fields[attname], columns[attname]) for attname in attnames]
+    return [hashlib.sha1("\x1f".join(values).encode('utf-8')).hexdigest() for values in zip(*canonical)]
+
+
+def _canonical_column(field, values):
+    if isinstance(field, models.DecimalField):
+        scale = Decimal(1).scaleb(-field.decimal_places)
+        return ["" if value is None else str(field.to_python(value).quantize(scale)) for value in values]
+    return ["" if value is None else str(value) for value in values]
+
+
+def backfill_row_hashes(apps, schema_editor):
+    for model_name, attnames in HASHED_FIELDS.items():
+        model = apps.get_model('core', model_name)
+        rows = model.objects.order_by('pk').values_list('pk', *attnames)
+        batch = []
+        for row in rows.iterator(chunk_size=5000):
+            batch.append(row)
+            if len(batch) >= 5000:
+                _save_hashes(model, batch, attnames)
+                batch = []
+        _save_hashes(model, batch, attnames)
+
+
+def _save_hashes(model, batch, attnames):
+    if not batch:
+        return
+    columns = dict(zip(attnames, (list(values) for values in list(zip(*batch))[1:])))
+    objects = [model(pk=row[0], row_hash=row_hash) for row, row_hash in zip(batch, row_hashes(model, columns, attnames))]
+    model.objects.bulk_update(objects, ['row_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0052_psrsnapshot_generation_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='podata',
+            name='row_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='timesheetentry',
+            name='row_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(backfill_row_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0053_row_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TIMESHEET', 'Timesheet'), ('PODATA', 'PO Data')], max_length=10)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_size', models.BigIntegerField(blank=True, null=True)),
+                ('checksum', models.CharField(help_text="SHA-256 of the file's content", max_length=64)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed'), ('SKIPPED', 'Skipped')], db_index=True, default='RUNNING', max_length=10)),
+                ('options', models.JSONField(blank=True, default=dict, help_text='Command options that change what is written')),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('rows_valid', models.PositiveIntegerField(default=0, help_text='Rows left after cleaning')),
+                ('rows_written', models.PositiveIntegerField(default=0, help_text='Rows inserted or updated')),
+                ('rows_unchanged', models.PositiveIntegerField(blank=True, help_text='Rows skipped by --diff', null=True)),
+                ('stale_snapshots', models.PositiveIntegerField(default=0, help_text='Existing snapshots flagged stale')),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('affected_projects', models.ManyToManyField(blank=True, related_name='import_runs', to='core.project')),
+            ],
+            options={
+                'verbose_name': 'Import Run',
+                'verbose_name_plural': 'Import Runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['kind', 'checksum', 'status'], name='core_import_kind_1bc29f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0054_importrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Times a worker has claimed this job'),
+        ),
+    ]
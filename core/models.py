@@ -2,8 +2,11 @@
 
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 from decimal import Decimal
 
+from core.snapshot_codec import ENCODING_CHOICES, ENCODING_JSON, ENCODING_COLUMNAR, LazySnapshotData
+
 # Updated Project model in core/models.py
 
 class Project(models.Model):
@@ -326,9 +329,19 @@ class TimesheetEntry(models.Model):
     co_no = models.CharField(max_length=20, db_index=True)
     hours = models.DecimalField(max_digits=6, decimal_places=2, validators=[MinValueValidator(0)])
 
+    # Resolved from co_no + role_description at import time (core/resolution.py).
+    # Re-run `resolve_mappings` after changing SubDepartment.role_descrptn.
+    sub_department = models.ForeignKey(
+        SubDepartment, null=True, blank=True, on_delete=models.SET_NULL, related_name='timesheet_entries'
+    )
+
     imported_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # SHA-1 of the row's content as imported (core/importers/timesheet.py HASHED_FIELDS);
+    # `import_timesheet --diff` rewrites only rows whose hash changed
+    row_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
+
     class Meta:
         verbose_name = "Timesheet Entry (Raw)"
         verbose_name_plural = "Timesheet Entries (Raw)"
@@ -337,6 +350,8 @@ class TimesheetEntry(models.Model):
             models.Index(fields=['co_no']),
             models.Index(fields=['date', 'co_no']),
             models.Index(fields=['date', 'emp_cd', 'co_no', 'role_description']),  # For performance
+            models.Index(fields=['sub_department', 'date']),
+            models.Index(fields=['updated_at']),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -368,9 +383,19 @@ class POData(models.Model):
     supplier_name = models.CharField(max_length=255, blank=True, help_text="SupplierName")
     project_name = models.CharField(max_length=255, blank=True, help_text="ProjName")
 
+    # Resolved from mat_code at import time (core/resolution.py).
+    # Re-run `resolve_mappings` after changing CostCategory.mat_code.
+    cost_category = models.ForeignKey(
+        CostCategory, null=True, blank=True, on_delete=models.SET_NULL, related_name='po_lines'
+    )
+
     imported_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # SHA-1 of the line's content as imported (core/importers/podata.py HASHED_FIELDS);
+    # `import_podata --diff` rewrites only lines whose hash changed
+    row_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
+
     class Meta:
         verbose_name = "PO Data Entry (Raw)"
         verbose_name_plural = "PO Data Entries (Raw)"
@@ -378,6 +403,8 @@ class POData(models.Model):
             models.Index(fields=['co_no']),
             models.Index(fields=['mat_code']),
             models.Index(fields=['co_no', 'mat_code']),
+            models.Index(fields=['co_no', 'cost_category']),
+            models.Index(fields=['updated_at']),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -415,6 +442,32 @@ class PSRSnapshot(models.Model):
     
     data = models.JSONField(default=dict)
 
+    # Opt-in compact storage (PSR_SNAPSHOT_ENCODING): `data` stays empty and the
+    # payload lives in `data_blob`; read it through `payload` either way
+    data_blob = models.BinaryField(null=True, blank=True, editable=False)
+    data_encoding = models.CharField(max_length=20, choices=ENCODING_CHOICES, default=ENCODING_JSON, blank=True)
+
+    # Exact cumulative actuals + watermark behind `data`, used by
+    # `generate_psr_snapshot --incremental` to add only newer rows
+    actuals_state = models.JSONField(default=dict, blank=True)
+
+    # Hash of everything the snapshot was computed from; a rebuild with the
+    # same fingerprint is skipped by `generate_psr_snapshot` (unless --force)
+    input_fingerprint = models.CharField(max_length=64, blank=True)
+
+    # Set by imports when back-dated rows change inputs of this snapshot;
+    # cleared when it is regenerated (see core/staleness.py)
+    is_stale = models.BooleanField(default=False, db_index=True)
+    stale_since = models.DateTimeField(null=True, blank=True)
+
+    # Bumped each time the engine publishes a new version of this snapshot
+    version = models.PositiveIntegerField(default=1)
+
+    # How this version was produced (core.psr_engine.stats): the project's share of
+    # the run in seconds, plus phase timings, rows scanned and the run's query count
+    generation_seconds = models.FloatField(null=True, blank=True, db_index=True)
+    generation_stats = models.JSONField(default=dict, blank=True)
+
     # === LABOR (TIMESHEET) TOTALS ===
     labor_actual_hours = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     labor_budget_hours = models.DecimalField(max_digits=14, decimal_places=2, default=0)
@@ -457,6 +510,64 @@ class PSRSnapshot(models.Model):
     def __str__(self):
         return f"PSR Snapshot {self.snapshot_date} - {self.project.co_no}"
 
+    @property
+    def payload(self):
+        """The snapshot data as a (read-only) dict, whatever the storage encoding."""
+        if self.data_encoding == ENCODING_COLUMNAR:
+            return LazySnapshotData(self.data_blob)
+        return self.data
+
+
+class PSRSnapshotLine(models.Model):
+    """
+    One cell row of a snapshot's `data` (sub-department or cost category) with
+    numeric columns, so history / portfolio questions can be SQL aggregates.
+    Rewritten together with the snapshot by core.psr_engine.persist.
+    """
+    TIMESHEET_HOURS = 'TIMESHEET_HOURS'
+    TIMESHEET_COST = 'TIMESHEET_COST'
+    COST_TO_GO = 'COST_TO_GO'
+
+    SECTION_CHOICES = [
+        (TIMESHEET_HOURS, 'Timesheet Hours'),
+        (TIMESHEET_COST, 'Timesheet Cost'),
+        (COST_TO_GO, 'Cost To Go'),
+    ]
+
+    snapshot = models.ForeignKey(PSRSnapshot, on_delete=models.CASCADE, related_name='lines')
+    # Denormalized from the snapshot for the (project, code, date) index
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='psr_snapshot_lines')
+    snapshot_date = models.DateField()
+
+    section = models.CharField(max_length=20, choices=SECTION_CHOICES)
+    department = models.CharField(max_length=100, blank=True, help_text="Department name (timesheet sections only)")
+    code = models.CharField(max_length=50)
+    ref_id = models.IntegerField(null=True, blank=True, help_text="SubDepartment / ProjectCostCategory id")
+    inkrement = models.CharField(max_length=100, blank=True)
+
+    baseline_budget = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    last_month_actuals = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    actuals = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    budget = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    forecast = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    prognosis = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    balance_percentage = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rest = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    rest_percentage = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['snapshot_date', 'section', 'department', 'code']
+        verbose_name = "PSR Snapshot Line"
+        verbose_name_plural = "PSR Snapshot Lines"
+        indexes = [
+            models.Index(fields=['project', 'code', 'snapshot_date']),
+            models.Index(fields=['section', 'snapshot_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot_date} {self.project_id} {self.section} {self.department} {self.code}"
+
 
 
 #----------------------#
@@ -613,4 +724,156 @@ class RKActualAdjustmentLine(models.Model):
 
     class Meta:
         verbose_name = "RK Actual Line"
-        verbose_name_plural = "RK Actual Lines"
\ No newline at end of file
+        verbose_name_plural = "RK Actual Lines"
+
+
+
+#-----------------------------------#
+# Snapshot Regeneration Job Section #
+#-----------------------------------#
+
+class SnapshotJob(models.Model):
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='snapshot_jobs')
+    snapshot_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+
+    source = models.CharField(max_length=100, blank=True, help_text="Endpoint / action that requested the regeneration")
+    requested_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    # Coalescing: further requests for the same project/date merge into a queued job
+    merged_count = models.PositiveIntegerField(default=0, help_text="Requests merged into this job after it was queued")
+    lock_wait_seconds = models.FloatField(null=True, blank=True, help_text="Time spent waiting for the project's regeneration lock")
+    run_after = models.DateTimeField(default=timezone.now, help_text="Worker will not start the job before this time")
+    attempts = models.PositiveIntegerField(default=0, help_text="Times a worker has claimed this job")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Snapshot Job"
+        verbose_name_plural = "Snapshot Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['project', 'snapshot_date', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Snapshot job #{self.pk} {self.project.co_no} {self.snapshot_date} [{self.status}]"
+
+    @property
+    def queued_seconds(self):
+        if self.started_at:
+            return (self.started_at - self.created_at).total_seconds()
+        return None
+
+    @property
+    def run_seconds(self):
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+
+class SnapshotLock(models.Model):
+    """
+    Per-project regeneration lock (core.psr_engine.locking) plus running
+    wait metrics. `holder` is empty while the lock is free.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='snapshot_lock')
+    holder = models.CharField(max_length=100, blank=True)
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Held locks past this time are taken over")
+
+    acquisitions = models.PositiveIntegerField(default=0)
+    contended = models.PositiveIntegerField(default=0, help_text="Acquisitions that had to wait for another run")
+    reused_runs = models.PositiveIntegerField(default=0, help_text="Waiters that reused the other run's snapshot")
+    total_wait_seconds = models.FloatField(default=0)
+    max_wait_seconds = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Snapshot Lock"
+        verbose_name_plural = "Snapshot Locks"
+
+    def __str__(self):
+        return f"Snapshot lock {self.project.co_no} [{'held' if self.holder else 'free'}]"
+
+    @property
+    def average_wait_seconds(self):
+        return self.total_wait_seconds / self.contended if self.contended else 0.0
+
+
+class ImportRun(models.Model):
+    """
+    Ledger of dump imports (import_timesheet / import_podata). A file whose
+    checksum already has a DONE run of the same kind is skipped unless the
+    command is given --force.
+    """
+    TIMESHEET = 'TIMESHEET'
+    PODATA = 'PODATA'
+
+    KIND_CHOICES = [
+        (TIMESHEET, 'Timesheet'),
+        (PODATA, 'PO Data'),
+    ]
+
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    SKIPPED = 'SKIPPED'
+
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (SKIPPED, 'Skipped'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    checksum = models.CharField(max_length=64, help_text="SHA-256 of the file's content")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING, db_index=True)
+    options = models.JSONField(default=dict, blank=True, help_text="Command options that change what is written")
+
+    rows_read = models.PositiveIntegerField(default=0)
+    rows_valid = models.PositiveIntegerField(default=0, help_text="Rows left after cleaning")
+    rows_written = models.PositiveIntegerField(default=0, help_text="Rows inserted or updated")
+    rows_unchanged = models.PositiveIntegerField(null=True, blank=True, help_text="Rows skipped by --diff")
+    stale_snapshots = models.PositiveIntegerField(default=0, help_text="Existing snapshots flagged stale")
+    affected_projects = models.ManyToManyField(Project, blank=True, related_name='import_runs')
+    error = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Import Run"
+        verbose_name_plural = "Import Runs"
+        indexes = [
+            models.Index(fields=['kind', 'checksum', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} {self.file_name} [{self.status}]"
+
+    @property
+    def duration_seconds(self):
+        if self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
@@ -0,0 +1,181 @@
+# core/preview.py
+
+"""
+What-if snapshot preview.
+
+Runs the snapshot calculation in memory for a project's latest snapshot with
+proposed budget / forecast / RK changes applied, without writing anything.
+The inputs (prefetched project graph, cumulative actuals, previous month-end
+data) are kept in the Django cache so repeated previews cost a single query.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.models import Project, PSRSnapshot, RKActualAdjustment, RKActualAdjustmentLine
+from core.psr_engine import (
+    load_projects, load_labor_hours, load_material_actuals, load_previous_data,
+    build_snapshot, SnapshotInputs,
+)
+
+
+KPI_FIELDS = [
+    'total_budget_cost', 'ter_value', 'eff_value',
+    'total_actual_cost', 'total_forecast_cost', 'total_prognosis_cost',
+    'sum_prognosis', 'margin', 'factor',
+]
+
+
+class PreviewError(ValueError):
+    """Proposed change that cannot be applied (unknown id, bad value)."""
+
+
+def _cache_key(project_id):
+    return f"psr-preview-inputs:{project_id}"
+
+
+def invalidate_preview_inputs(project):
+    """Drop cached preview inputs, e.g. after a budget or override edit."""
+    cache.delete(_cache_key(project.id))
+
+
+def load_preview_inputs(co_no):
+    """
+    Inputs for previewing the project's latest snapshot.
+
+    Returns (project, snapshot_date, frequency, labor_hours, material_actuals,
+    previous_data), or None when the project has no snapshot yet. The cached
+    copy is reused while the latest snapshot (id + input fingerprint) is the same.
+    """
+    latest = (
+        PSRSnapshot.objects
+        .filter(project__co_no=co_no)
+        .order_by('-snapshot_date')
+        .values_list('id', 'project_id', 'input_fingerprint')
+        .first()
+    )
+    if latest is None:
+        return None
+    snapshot_id, project_id, fingerprint = latest
+
+    cached = cache.get(_cache_key(project_id))
+    if cached is not None and cached[0] == (snapshot_id, fingerprint):
+        return cached[1]
+
+    snapshot = PSRSnapshot.objects.get(pk=snapshot_id)
+    projects = load_projects(Project.objects.filter(pk=project_id))
+    project = projects[0]
+
+    state = snapshot.actuals_state
+    if state:
+        labor_hours = {int(sub_id): Decimal(value) for sub_id, value in state['labor_hours'].items()}
+        material_actuals = {code: Decimal(value) for code, value in state['material'].items()}
+    else:
+        all_hours, _ = load_labor_hours(projects, snapshot.snapshot_date)
+        all_material, _ = load_material_actuals(projects)
+        labor_hours = all_hours.get(project.id, {})
+        material_actuals = all_material.get(project.id, {})
+    previous_data = load_previous_data(projects, snapshot.snapshot_date).get(project.id)
+
+    inputs = (project, snapshot.snapshot_date, snapshot.frequency, labor_hours, material_actuals, previous_data)
+    timeout = getattr(settings, 'PSR_PREVIEW_CACHE_SECONDS', 300)
+    cache.set(_cache_key(project_id), ((snapshot_id, fingerprint), inputs), timeout)
+    return inputs
+
+
+def _decimal(value, field):
+    try:
+        value = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise PreviewError(f"{field} must be a number.")
+    if value < 0:
+        raise PreviewError(f"{field} must be a valid positive number.")
+    return value
+
+
+def _set_rk_actual(pcc, amount):
+    """Replace the prefetched RK adjustment lines with a single in-memory line."""
+    adjustment = RKActualAdjustment(project_cost_category=pcc)
+    lines = RKActualAdjustmentLine.objects.none()
+    lines._result_cache = [RKActualAdjustmentLine(adjustment=adjustment, amount=amount)]
+    adjustment._prefetched_objects_cache = {'lines': lines}
+
+    adjustments = RKActualAdjustment.objects.none()
+    adjustments._result_cache = [adjustment]
+    pcc._prefetched_objects_cache['rk_actual_adjustments'] = adjustments
+    pcc.actual_override = True
+
+
+def apply_changes(project, changes):
+    """
+    Apply proposed changes to the in-memory project, the same way the edit
+    endpoints would:
+
+        {"sub_departments": [{"id": 1, "budget_hours": 120, "forecast_hours": 40}],
+         "cost_categories": [{"id": 2, "budget_cost": 5000, "forecast_cost": 800, "rk_actual": 250}]}
+    """
+    sub_departments = {
+        sub.id: (dept, sub)
+        for dept in project.departments.all()
+        for sub in dept.sub_departments.all()
+    }
+    cost_categories = {pcc.id: pcc for pcc in project.project_cost_categories.all()}
+    exchange_rate = project.exchange_rate
+
+    for change in changes.get('sub_departments') or []:
+        if change.get('id') not in sub_departments:
+            raise PreviewError(f"Sub-department {change.get('id')} does not belong to project {project.co_no}.")
+        dept, sub_dept = sub_departments[change['id']]
+        if change.get('budget_hours') is not None:
+            sub_dept.budget_hours = _decimal(change['budget_hours'], 'budget_hours')
+            sub_dept.budget_cost = sub_dept.budget_hours * dept.hourly_rate * exchange_rate
+        if change.get('forecast_hours') is not None:
+            sub_dept.forecast_override = True
+            sub_dept.forecast_hours = _decimal(change['forecast_hours'], 'forecast_hours')
+            sub_dept.forecast_cost = sub_dept.forecast_hours * dept.hourly_rate * exchange_rate
+
+    for change in changes.get('cost_categories') or []:
+        pcc = cost_categories.get(change.get('id'))
+        if pcc is None:
+            raise PreviewError(f"Cost category {change.get('id')} does not belong to project {project.co_no}.")
+        if change.get('budget_cost') is not None:
+            pcc.budget_cost = _decimal(change['budget_cost'], 'budget_cost')
+        if change.get('forecast_cost') is not None:
+            pcc.forecast_override = True
+            pcc.forecast_cost = _decimal(change['forecast_cost'], 'forecast_cost')
+        if change.get('rk_actual') is not None:
+            if pcc.cost_category.code != 'RK':
+                raise PreviewError("rk_actual can only be set for the RK (Travel Costs) category.")
+            _set_rk_actual(pcc, _decimal(change['rk_actual'], 'rk_actual'))
+
+
+def preview_snapshot(co_no, changes):
+    """
+    KPIs of the latest snapshot as stored inputs give them ("current") and
+    with ``changes`` applied ("preview"). Nothing is written. Returns None when
+    the project has no snapshot.
+    """
+    inputs = load_preview_inputs(co_no)
+    if inputs is None:
+        return None
+    project, snapshot_date, frequency, labor_hours, material_actuals, previous_data = inputs
+
+    inputs = SnapshotInputs(
+        project=project,
+        labor_hours=labor_hours,
+        material_actuals=material_actuals,
+        previous_data=previous_data,
+        frequency=frequency,
+    )
+    current = build_snapshot(inputs)
+    apply_changes(project, changes)
+    preview = build_snapshot(inputs)
+
+    return {
+        'project': project,
+        'snapshot_date': snapshot_date,
+        'current': {field: getattr(current, field) for field in KPI_FIELDS},
+        'preview': {field: getattr(preview, field) for field in KPI_FIELDS},
+    }
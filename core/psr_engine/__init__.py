@@ -0,0 +1,35 @@
+# core/psr_engine/__init__.py
+
+"""
+PSR snapshot engine.
+
+Loaders read projects and dump-table actuals with a fixed number of queries,
+``build_snapshot`` turns one project's ``SnapshotInputs`` into a
+``SnapshotResult`` without touching the database, and ``save_snapshots``
+upserts the results together with their ``PSRSnapshotLine`` rows.
+``generate_snapshots`` runs the whole pipeline for one date and
+``backfill_snapshots`` for every period end of a date range.
+"""
+
+from core.psr_engine.backfill import period_ends, backfill_snapshots
+from core.psr_engine.compute import BACKENDS, build_snapshot, compute_snapshots
+from core.psr_engine.fingerprint import compute_input_fingerprints
+from core.psr_engine.lines import build_lines
+from core.psr_engine.loaders import (
+    previous_month_end, load_projects, load_labor_hours, load_material_actuals,
+    load_incremental_actuals, load_previous_data, build_actuals_state,
+)
+from core.psr_engine.persist import save_snapshots, save_snapshot_rows, save_lines
+from core.psr_engine.runner import generate_snapshots, regenerate_snapshot
+from core.psr_engine.types import (
+    SnapshotInputs, SnapshotResult, GenerationReport, BackfillReport, SNAPSHOT_FIELDS,
+)
+
+__all__ = [
+    'BACKENDS', 'build_snapshot', 'compute_snapshots', 'compute_input_fingerprints',
+    'previous_month_end', 'load_projects', 'load_labor_hours', 'load_material_actuals',
+    'load_incremental_actuals', 'load_previous_data', 'build_actuals_state',
+    'build_lines', 'save_snapshots', 'save_snapshot_rows', 'save_lines', 'generate_snapshots', 'regenerate_snapshot',
+    'period_ends', 'backfill_snapshots',
+    'SnapshotInputs', 'SnapshotResult', 'GenerationReport', 'BackfillReport', 'SNAPSHOT_FIELDS',
+]
@@ -0,0 +1,198 @@
+# core/psr_engine/backfill.py
+
+"""
+Historical backfill: snapshots at every period end of a date range from a
+single date-ordered pass over the timesheet rows.
+"""
+
+import datetime
+import time
+from calendar import monthrange
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from core.models import TimesheetEntry, PSRSnapshot
+from core.psr_engine.compute import compute_snapshots
+from core.psr_engine.fingerprint import load_po_signatures, fingerprint_digest
+from core.psr_engine.fixedpoint import to_fixed, fixed_totals_to_decimal
+from core.psr_engine.locking import project_locks
+from core.psr_engine.loaders import load_material_actuals, previous_month_end, build_actuals_state
+from core.psr_engine.persist import save_snapshot_rows
+from core.psr_engine.types import SnapshotInputs, BackfillReport
+from core.snapshot_codec import load_payload
+
+
+PERIOD_DAYS = {'WEEKLY': 7, 'BIWEEKLY': 14}
+
+
+def month_end(d):
+    return d.replace(day=monthrange(d.year, d.month)[1])
+
+
+def period_ends(start, end, frequency='MONTHLY'):
+    """
+    Snapshot dates between ``start`` and ``end`` (inclusive): every month end
+    for MONTHLY, otherwise every 7 / 14 days counted from ``start``.
+    """
+    dates = []
+    if frequency == 'MONTHLY':
+        d = month_end(start)
+        while d <= end:
+            dates.append(d)
+            d = month_end(d + datetime.timedelta(days=1))
+    else:
+        d = start
+        while d <= end:
+            dates.append(d)
+            d += datetime.timedelta(days=PERIOD_DAYS[frequency])
+    return dates
+
+
+def backfill_snapshots(projects, start, end, frequency='MONTHLY', force=False, batch_size=200, backend=None):
+    """
+    Generate snapshots for ``projects`` (from ``load_projects``) at every
+    period end between ``start`` and ``end``.
+
+    Timesheet hours are read once, grouped per sub-department and day in date
+    order, and accumulated as the sweep passes each period end. Each period's
+    ``last_month_actuals`` come from the snapshot computed earlier in the same
+    run (or the stored one when the previous month end is outside the range).
+    Snapshots whose input fingerprint is unchanged are not rewritten unless
+    ``force``; everything else is upserted in bulk at the end. The projects'
+    regeneration locks are held for the whole run and renewed every period.
+    """
+    with project_locks([project.id for project in projects]) as waits:
+        report = _backfill(projects, start, end, frequency, force, batch_size, backend, waits)
+    report.lock_wait_seconds = sum(waits.values())
+    return report
+
+
+def _backfill(projects, start, end, frequency, force, batch_size, backend, locks):
+    if backend is None:
+        backend = getattr(settings, 'PSR_SNAPSHOT_BACKEND', 'decimal')
+    report = BackfillReport(period_ends=period_ends(start, end, frequency), projects=projects)
+    dates = report.period_ends
+    if not dates or not projects:
+        return report
+
+    load_start = time.perf_counter()
+    as_of = timezone.now()
+    sub_dept_project = {
+        sub.id: project.id
+        for project in projects
+        for dept in project.departments.all()
+        for sub in dept.sub_departments.all()
+    }
+    daily_rows = (
+        TimesheetEntry.objects
+        .filter(sub_department_id__in=list(sub_dept_project), date__lte=dates[-1])
+        .values('sub_department_id', 'date')
+        .annotate(total_hours=Sum('hours'), rows=Count('id'), last_change=Max('updated_at'))
+        .order_by('date')
+    )
+    material_actuals, po_rows = load_material_actuals(projects)
+    po_signatures = load_po_signatures(projects)
+
+    stored = {}
+    stored_data = {}
+    stale = set()
+    previous_dates = {previous_month_end(d) for d in dates}
+    for project_id, snapshot_date, fingerprint, is_stale, data, blob, encoding in (
+        PSRSnapshot.objects
+        .filter(project__in=projects, snapshot_date__in=previous_dates | set(dates))
+        .values_list(
+            'project_id', 'snapshot_date', 'input_fingerprint', 'is_stale', 'data', 'data_blob', 'data_encoding'
+        )
+    ):
+        stored[(project_id, snapshot_date)] = fingerprint
+        if is_stale:
+            stale.add((project_id, snapshot_date))
+        stored_data[(project_id, snapshot_date)] = load_payload(data, blob, encoding)
+    report.load_seconds = time.perf_counter() - load_start
+
+    compute_start = time.perf_counter()
+    labor_hours = defaultdict(dict)       # project_id -> {sub_department_id: centi-hours}
+    labor_rows = defaultdict(int)         # project_id -> rows so far
+    signature = {}                        # sub_department_id -> [rows, latest updated_at]
+    computed = {}                         # (project_id, snapshot_date) -> data
+    to_save = []
+    unchanged_stale = []
+
+    daily_rows = iter(daily_rows)
+    pending = next(daily_rows, None)
+    for snapshot_date in dates:
+        locks.renew()
+        while pending is not None and pending['date'] <= snapshot_date:
+            sub_id = pending['sub_department_id']
+            project_id = sub_dept_project[sub_id]
+            hours = labor_hours[project_id]
+            hours[sub_id] = hours.get(sub_id, 0) + to_fixed(pending['total_hours'])
+            labor_rows[project_id] += pending['rows']
+            rows, last_change = signature.get(sub_id, (0, None))
+            signature[sub_id] = (
+                rows + pending['rows'],
+                pending['last_change'] if last_change is None else max(last_change, pending['last_change']),
+            )
+            pending = next(daily_rows, None)
+
+        previous_date = previous_month_end(snapshot_date)
+        previous = {}
+        hours_to_date = {}
+        for project in projects:
+            key = (project.id, previous_date)
+            previous[project.id] = computed[key] if key in computed else stored_data.get(key)
+            hours_to_date[project.id] = fixed_totals_to_decimal(labor_hours[project.id])
+
+        results, _ = compute_snapshots(
+            [
+                SnapshotInputs(
+                    project=project,
+                    labor_hours=hours_to_date[project.id],
+                    material_actuals=material_actuals.get(project.id, {}),
+                    previous_data=previous[project.id],
+                    frequency=frequency,
+                )
+                for project in projects
+            ],
+            backend=backend,
+        )
+        for project in projects:
+            result = results[project.id]
+            previous_data = previous[project.id]
+            computed[(project.id, snapshot_date)] = result.data
+
+            timesheet_signature = sorted(
+                [sub_id, rows, last_change]
+                for sub_id, (rows, last_change) in signature.items()
+                if sub_dept_project[sub_id] == project.id
+            )
+            result.input_fingerprint = fingerprint_digest(
+                project, snapshot_date, frequency,
+                timesheet_signature, po_signatures.get(project.id, []), previous_data,
+            )
+            if not force and stored.get((project.id, snapshot_date)) == result.input_fingerprint:
+                report.unchanged.setdefault(snapshot_date, []).append(project.id)
+                if (project.id, snapshot_date) in stale:
+                    unchanged_stale.append((project.id, snapshot_date))
+                continue
+
+            result.actuals_state = build_actuals_state(
+                as_of, hours_to_date[project.id], labor_rows[project.id],
+                material_actuals.get(project.id, {}), po_rows.get(project.id, 0),
+            )
+            to_save.append((project.id, snapshot_date, result))
+            report.written.setdefault(snapshot_date, []).append(project.id)
+    report.compute_seconds = time.perf_counter() - compute_start
+
+    locks.renew()
+    save_start = time.perf_counter()
+    report.created = save_snapshot_rows(to_save, batch_size=batch_size)
+    for project_id, snapshot_date in unchanged_stale:
+        PSRSnapshot.objects.filter(project_id=project_id, snapshot_date=snapshot_date).update(
+            is_stale=False, stale_since=None
+        )
+    report.save_seconds = time.perf_counter() - save_start
+    return report
@@ -0,0 +1,363 @@
+# core/psr_engine/compute.py
+
+"""
+Snapshot math. Pure functions over preloaded inputs: no queries, no writes.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+
+from core.psr_engine.types import SnapshotInputs, SnapshotResult
+
+
+BACKENDS = ('decimal', 'numpy')
+
+
+def build_snapshot(inputs: SnapshotInputs) -> SnapshotResult:
+    """
+    Compute one project's snapshot from preloaded inputs (no queries).
+
+    ``inputs.project`` must come from ``load_projects`` (departments,
+    sub-departments, cost categories and RK lines prefetched).
+    """
+    project = inputs.project
+    labor_hours = inputs.labor_hours
+    material_actuals = inputs.material_actuals
+    previous_data = inputs.previous_data
+    frequency = inputs.frequency
+
+    exchange_rate = project.exchange_rate
+
+    data = {"TIMESHEET": {"HOURS": {}, "COST": {}}, "COST TO GO": {"COST": {}}}
+
+    # Separate totals
+    labor_actual_hours = Decimal('0')
+    labor_budget_hours = Decimal('0')
+    labor_forecast_hours = Decimal('0')
+    labor_prognosis_hours = Decimal('0')
+
+    labor_actual_cost = Decimal('0')
+    labor_budget_cost = Decimal('0')
+    labor_forecast_cost = Decimal('0')
+    labor_prognosis_cost = Decimal('0')
+
+    material_actual_cost = Decimal('0')
+    material_budget_cost = Decimal('0')
+    material_forecast_cost = Decimal('0')
+    material_prognosis_cost = Decimal('0')
+
+    # ================================
+    # Labor Processing
+    # ================================
+    labor_start = time.perf_counter()
+    departments = project.departments.all()
+
+    labor_actuals = {}
+    for dept in departments:
+        for sub_dept in dept.sub_departments.all():
+            hours = labor_hours.get(sub_dept.id)
+            if hours is not None:
+                labor_actuals[sub_dept.id] = {
+                    'hours': hours,
+                    'cost_inr': hours * dept.hourly_rate * exchange_rate,
+                }
+
+    for dept in departments:
+        dept_name = dept.name
+        data["TIMESHEET"]["HOURS"][dept_name] = {}
+        data["TIMESHEET"]["COST"][dept_name] = {}
+
+        for sub_dept in dept.sub_departments.all():
+            sub_code = sub_dept.code
+            sub_dept_id = sub_dept.id
+            inkrement = sub_dept.inkrement or ""
+
+            act = labor_actuals.get(sub_dept.id, {'hours': Decimal('0'), 'cost_inr': Decimal('0')})
+            actual_hours = act['hours']
+            actual_cost_inr = act['cost_inr']
+
+            # current_budget_hours = sub_dept.budget_hours
+            # current_budget_cost_inr = current_budget_hours * dept.hourly_rate * exchange_rate
+
+            # === NEW: Use budget_cost as primary, calculate hours from it ===
+            current_budget_cost_inr = sub_dept.budget_cost
+            rate_inr = dept.hourly_rate * exchange_rate
+            current_budget_hours = current_budget_cost_inr / rate_inr if rate_inr > 0 else Decimal('0')
+
+            baseline_budget_hours = sub_dept.baseline_budget_hours
+            baseline_budget_cost_inr = baseline_budget_hours * dept.hourly_rate * exchange_rate
+
+            # Forecast
+            if sub_dept.forecast_override:
+                forecast_hours = sub_dept.forecast_hours
+                forecast_cost_inr = sub_dept.forecast_cost
+            else:
+                forecast_hours = max(current_budget_hours - actual_hours, Decimal('0'))
+                forecast_cost_inr = max(current_budget_cost_inr - actual_cost_inr, Decimal('0'))
+
+            prognosis_hours = actual_hours + forecast_hours
+            prognosis_cost_inr = actual_cost_inr + forecast_cost_inr
+
+            # Last month actuals
+            last_month_actual_hours = Decimal('0')
+            last_month_actual_cost = Decimal('0')
+            if previous_data:
+                prev_cost = previous_data.get("TIMESHEET", {}).get("COST", {}).get(dept_name, {}).get(sub_code, {})
+                last_month_actual_cost = Decimal(str(prev_cost.get("actuals", 0.0)))
+                rate_inr = dept.hourly_rate * exchange_rate
+                last_month_actual_hours = last_month_actual_cost / rate_inr if rate_inr > 0 else Decimal('0')
+
+            # Rounded percentages
+            balance_pct = round(float((current_budget_cost_inr / prognosis_cost_inr * 100) if prognosis_cost_inr else 0), 2)
+            rest_pct = round(float((prognosis_cost_inr / actual_cost_inr * 100) if actual_cost_inr else 0), 2)
+
+            # TIMESHEET HOURS
+            data["TIMESHEET"]["HOURS"][dept_name][sub_code] = {
+                "id": sub_dept_id,
+                "inkrement": inkrement,
+                "baseline_budget": float(baseline_budget_hours),
+                "last_month_actuals": float(last_month_actual_hours),
+                "actuals": float(actual_hours),
+                "budget": float(current_budget_hours),
+                "forecast": float(forecast_hours),
+                "prognosis": float(prognosis_hours),
+                "balance": float(current_budget_hours - prognosis_hours),
+                "balance_percentage": balance_pct,
+                "rest": float(forecast_hours),
+                "rest_percentage": rest_pct,
+            }
+
+            # TIMESHEET COST
+            data["TIMESHEET"]["COST"][dept_name][sub_code] = {
+                "id": sub_dept_id,
+                "inkrement": inkrement,
+                "baseline_budget": float(baseline_budget_cost_inr),
+                "baseline_budget": float(sub_dept.baseline_budget_cost),
+                "last_month_actuals": float(last_month_actual_cost),
+                "actuals": float(actual_cost_inr),
+                "budget": float(current_budget_cost_inr),
+                "forecast": float(forecast_cost_inr),
+                "prognosis": float(prognosis_cost_inr),
+                "balance": float(current_budget_cost_inr - prognosis_cost_inr),
+                "balance_percentage": balance_pct,
+                "rest": float(forecast_cost_inr),
+                "rest_percentage": rest_pct,
+            }
+
+            # Accumulate labor totals
+            labor_actual_hours += actual_hours
+            labor_budget_hours += current_budget_hours
+            labor_forecast_hours += forecast_hours
+            labor_prognosis_hours += prognosis_hours
+
+            labor_actual_cost += actual_cost_inr
+            # labor_budget_cost += current_budget_cost_inr
+            labor_budget_cost += sub_dept.budget_cost
+            labor_forecast_cost += forecast_cost_inr
+            labor_prognosis_cost += prognosis_cost_inr
+
+    # ================================
+    # Material Processing
+    # ================================
+    material_start = time.perf_counter()
+    project_cost_categories = project.project_cost_categories.all()
+    for pcc in project_cost_categories:
+        cat = pcc.cost_category
+        cat_code = cat.code
+
+        pcc_id = pcc.id
+        inkrement = cat.get_code_display()
+
+        current_budget_inr = pcc.budget_cost
+        baseline_budget_inr = pcc.baseline_budget_cost
+
+        # Determine actuals — RK override logic
+        if cat_code == 'RK' and pcc.actual_override:
+            rk_actual = sum(
+                line.amount for adj in pcc.rk_actual_adjustments.all()
+                for line in adj.lines.all()
+            )
+            actual_inr = Decimal(rk_actual)
+        else:
+            actual_inr = material_actuals.get(cat_code, Decimal('0'))
+
+        # Forecast
+        if pcc.forecast_override:
+            forecast_inr = pcc.forecast_cost
+        else:
+            forecast_inr = max(current_budget_inr - actual_inr, Decimal('0'))
+
+        prognosis_inr = actual_inr + forecast_inr
+
+        last_month_actual_inr = Decimal('0')
+        if previous_data:
+            prev = previous_data.get("COST TO GO", {}).get("COST", {}).get(cat_code, {})
+            last_month_actual_inr = Decimal(str(prev.get("actuals", 0.0)))
+
+        balance_pct = round(float((current_budget_inr / prognosis_inr * 100) if prognosis_inr else 0), 2)
+        rest_pct = round(float((prognosis_inr / actual_inr * 100) if actual_inr else 0), 2)
+
+        data["COST TO GO"]["COST"][cat_code] = {
+            "id": pcc_id,
+            "inkrement": inkrement,
+            "baseline_budget": float(baseline_budget_inr),
+            "last_month_actuals": float(last_month_actual_inr),
+            "actuals": float(actual_inr),
+            "budget": float(current_budget_inr),
+            "forecast": float(forecast_inr),
+            "prognosis": float(prognosis_inr),
+            "balance": float(current_budget_inr - prognosis_inr),
+            "balance_percentage": balance_pct,
+            "rest": float(forecast_inr),
+            "rest_percentage": rest_pct,
+        }
+
+        # Accumulate material totals
+        material_actual_cost += actual_inr
+        material_budget_cost += current_budget_inr
+        material_forecast_cost += forecast_inr
+        material_prognosis_cost += prognosis_inr
+
+    material_end = time.perf_counter()
+
+    # ================================
+    # New KPI Calculations (with First Snapshot Support)
+    # ================================
+    # Determine if this is the first snapshot (no actuals yet)
+
+    # Delete this part later
+    # labor_actual_cost = 0 
+    # material_actual_cost = 0
+    # Delete this part later
+
+    is_first_snapshot = (labor_actual_cost == 0 and material_actual_cost == 0)
+
+    if is_first_snapshot:
+        # Use pre-calculated values from Project model (financial plan)
+        total_budget_cost = project.budget  # = Actual Budget (HK - TER - EFF)
+        eff_value = project.eff_value
+        ter_value = project.ter_value
+        sum_prognosis = project.budget + eff_value + ter_value
+        margin = project.sales_value - sum_prognosis
+        factor = project.factor
+        total_actual_cost = Decimal('0')
+        total_forecast_cost = sum_prognosis  # Same as prognosis in initial state
+        total_prognosis_cost = sum_prognosis
+    else:
+        # Normal ongoing snapshot
+        prognosis_hours_po = labor_prognosis_cost + material_prognosis_cost
+
+        eff_value = project.eff_value  # Still from project (percentages fixed)
+        ter_value = project.ter_value
+
+        sum_prognosis = prognosis_hours_po + eff_value + ter_value
+        margin = project.sales_value - sum_prognosis
+        factor = project.sales_value / sum_prognosis if sum_prognosis > 0 else Decimal('0')
+
+        total_actual_cost = labor_actual_cost + material_actual_cost
+        total_budget_cost = labor_budget_cost + material_budget_cost
+        total_forecast_cost = labor_forecast_cost + material_forecast_cost
+        total_prognosis_cost = sum_prognosis
+
+    return SnapshotResult(
+        frequency=frequency,
+        data=data,
+
+        # Labor
+        labor_actual_hours=labor_actual_hours,
+        labor_budget_hours=labor_budget_hours,
+        labor_forecast_hours=labor_forecast_hours,
+        labor_prognosis_hours=labor_prognosis_hours,
+        labor_actual_cost=labor_actual_cost,
+        labor_budget_cost=labor_budget_cost,
+        labor_forecast_cost=labor_forecast_cost,
+        labor_prognosis_cost=labor_prognosis_cost,
+
+        # Material
+        material_actual_cost=material_actual_cost,
+        material_budget_cost=material_budget_cost,
+        material_forecast_cost=material_forecast_cost,
+        material_prognosis_cost=material_prognosis_cost,
+
+        # New KPI fields
+        eff_value=eff_value,
+        ter_value=ter_value,
+        sum_prognosis=sum_prognosis,
+        margin=margin,
+        factor=factor,
+
+        # Combined
+        total_actual_cost=total_actual_cost,
+        total_budget_cost=total_budget_cost,
+        total_forecast_cost=total_forecast_cost,
+        total_prognosis_cost=total_prognosis_cost,
+
+        generation_stats={'phases': {
+            'labor_compute': material_start - labor_start,
+            'material_compute': material_end - material_start,
+        }},
+    )
+
+
+def _build_snapshot_task(inputs):
+    """Process-pool entry point: inputs -> (project_id, result, seconds)."""
+    start = time.perf_counter()
+    result = build_snapshot(inputs)
+    return inputs.project.id, result, time.perf_counter() - start
+
+
+def _vectorized_task(inputs):
+    """Process-pool entry point for the NumPy backend: a chunk of inputs -> (results, seconds)."""
+    from core.psr_engine.vectorized import build_snapshots_vectorized
+
+    start = time.perf_counter()
+    results = build_snapshots_vectorized(inputs)
+    return results, time.perf_counter() - start
+
+
+def compute_snapshots(inputs, workers=1, backend='decimal'):
+    """
+    Run the snapshot math for every ``SnapshotInputs``, optionally across a
+    process pool.
+
+    ``backend`` is 'decimal' (``build_snapshot``, exact) or 'numpy'
+    (``vectorized.build_snapshots_vectorized``, float64, whole chunks of
+    projects per call). Workers only compute; they never touch the database,
+    so the caller stays the single writer.
+    Returns ({project_id: SnapshotResult}, {project_id: seconds}).
+    """
+    inputs = list(inputs)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown snapshot backend {backend!r}; choose from {', '.join(BACKENDS)}")
+
+    if backend == 'numpy':
+        chunks = [inputs[i::workers] for i in range(workers)] if workers > 1 else [inputs]
+        chunks = [chunk for chunk in chunks if chunk]
+        if len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                outputs = list(pool.map(_vectorized_task, chunks))
+        else:
+            outputs = [_vectorized_task(chunk) for chunk in chunks]
+
+        results, timings = {}, {}
+        for chunk_results, seconds in outputs:
+            results.update(chunk_results)
+            # Per-project time is not measured separately; spread the chunk time
+            for project_id in chunk_results:
+                timings[project_id] = seconds / len(chunk_results)
+        return results, timings
+
+    if workers > 1 and len(inputs) > 1:
+        chunksize = max(1, len(inputs) // (workers * 4))
+        # django.setup() makes the pool work with the "spawn" start method too
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            outputs = list(pool.map(_build_snapshot_task, inputs, chunksize=chunksize))
+    else:
+        outputs = [_build_snapshot_task(item) for item in inputs]
+
+    results = {project_id: result for project_id, result, _ in outputs}
+    timings = {project_id: seconds for project_id, _, seconds in outputs}
+    return results, timings
@@ -0,0 +1,123 @@
+# core/psr_engine/fingerprint.py
+
+"""
+Input fingerprints: a cheap hash of everything a snapshot is computed from,
+so rebuilds with unchanged inputs can be skipped.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+from django.db.models import Count, Max
+
+from core.models import TimesheetEntry, POData
+from core.psr_engine.loaders import po_project_resolver
+
+
+# Bump when build_snapshot's output changes for the same inputs, so stored
+# fingerprints stop matching and every snapshot is rebuilt once
+FINGERPRINT_VERSION = 1
+
+
+def project_inputs(project):
+    """Master-data values ``build_snapshot`` reads, from the prefetched project."""
+    return {
+        'project': [
+            project.exchange_rate, project.sales_value, project.budget,
+            project.eff_value, project.ter_value, project.factor,
+        ],
+        'sub_departments': [
+            [
+                dept.name, dept.hourly_rate, sub.id, sub.code, sub.inkrement,
+                sub.budget_cost, sub.baseline_budget_hours, sub.baseline_budget_cost,
+                sub.forecast_override, sub.forecast_hours, sub.forecast_cost,
+            ]
+            for dept in project.departments.all()
+            for sub in dept.sub_departments.all()
+        ],
+        'cost_categories': [
+            [
+                pcc.id, pcc.cost_category.code, pcc.budget_cost, pcc.baseline_budget_cost,
+                pcc.forecast_override, pcc.forecast_cost, pcc.actual_override,
+                [line.amount for adj in pcc.rk_actual_adjustments.all() for line in adj.lines.all()],
+            ]
+            for pcc in project.project_cost_categories.all()
+        ],
+    }
+
+
+def load_po_signatures(projects):
+    """{project_id: [[co_no, rows, latest updated_at], ...]} for resolved PO lines (one query)."""
+    resolve_project = po_project_resolver(projects)
+    po = defaultdict(list)
+    rows = (
+        POData.objects
+        .filter(cost_category__isnull=False)
+        .values('co_no')
+        .annotate(rows=Count('id'), last_change=Max('updated_at'))
+        .order_by('co_no')
+    )
+    if len(projects) == 1:
+        rows = rows.filter(co_no__startswith=projects[0].co_no)
+    for row in rows:
+        project_id = resolve_project(row['co_no'])
+        if project_id is not None:
+            po[project_id].append([row['co_no'], row['rows'], row['last_change']])
+    return po
+
+
+def fingerprint_digest(project, snapshot_date, frequency, timesheet_signature, po_signature, previous_data):
+    """
+    Hash one project's inputs. ``timesheet_signature`` is
+    [[sub_department_id, rows, latest updated_at], ...] ordered by sub-department.
+    """
+    payload = {
+        'version': FINGERPRINT_VERSION,
+        'snapshot_date': snapshot_date,
+        'frequency': frequency,
+        'inputs': project_inputs(project),
+        'timesheet': timesheet_signature,
+        'po': po_signature,
+        'previous': previous_data,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def compute_input_fingerprints(projects, snapshot_date, frequency, previous_data):
+    """
+    Cheap hash of each project's snapshot inputs: row count and latest
+    ``updated_at`` of its timesheet and PO rows, its budget / override / rate
+    fields and the previous month-end data. Two grouped queries in total.
+
+    Returns {project_id: hex digest}.
+    """
+    sub_dept_project = {
+        sub.id: project.id
+        for project in projects
+        for dept in project.departments.all()
+        for sub in dept.sub_departments.all()
+    }
+    timesheet = defaultdict(list)
+    rows = (
+        TimesheetEntry.objects
+        .filter(sub_department_id__in=list(sub_dept_project), date__lte=snapshot_date)
+        .values('sub_department_id')
+        .annotate(rows=Count('id'), last_change=Max('updated_at'))
+        .order_by('sub_department_id')
+    )
+    for row in rows:
+        timesheet[sub_dept_project[row['sub_department_id']]].append(
+            [row['sub_department_id'], row['rows'], row['last_change']]
+        )
+
+    po = load_po_signatures(projects)
+
+    return {
+        project.id: fingerprint_digest(
+            project, snapshot_date, frequency,
+            timesheet.get(project.id, []), po.get(project.id, []), previous_data.get(project.id),
+        )
+        for project in projects
+    }
@@ -0,0 +1,40 @@
+# core/psr_engine/fixedpoint.py
+
+"""
+Fixed-point helpers for the snapshot engine.
+
+Timesheet hours and INR amounts are stored with two decimals
+(``DecimalField(decimal_places=2)``), so running totals are kept as integer
+centi-hours / paise and turned into ``Decimal`` once, at the output boundary.
+Integer addition is exact and avoids a ``Decimal`` allocation per row.
+"""
+
+from decimal import ROUND_HALF_EVEN, Decimal
+
+SCALE = 100
+_SCALE_DECIMAL = Decimal(SCALE)
+
+
+def to_fixed(value):
+    """
+    Hours / INR -> integer hundredths (centi-hours, paise). Values with more
+    than two decimals are rounded half to even, for Decimals as for floats.
+    """
+    kind = type(value)
+    if kind is Decimal:
+        return int((value * _SCALE_DECIMAL).to_integral_value(ROUND_HALF_EVEN))
+    if kind is float:
+        return round(value * SCALE)
+    if kind is int:
+        return value * SCALE
+    return int((Decimal(value) * _SCALE_DECIMAL).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_fixed(units):
+    """Integer hundredths -> ``Decimal`` with two decimals."""
+    return Decimal(units).scaleb(-2)
+
+
+def fixed_totals_to_decimal(totals):
+    """{key: hundredths} -> {key: Decimal}."""
+    return {key: from_fixed(units) for key, units in totals.items()}
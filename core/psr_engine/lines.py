@@ -0,0 +1,46 @@
+# core/psr_engine/lines.py
+
+"""Flattening snapshot ``data`` into ``PSRSnapshotLine`` rows."""
+
+from decimal import Decimal
+
+from core.models import PSRSnapshotLine
+
+
+LINE_VALUE_FIELDS = [
+    'baseline_budget', 'last_month_actuals', 'actuals', 'budget', 'forecast',
+    'prognosis', 'balance', 'balance_percentage', 'rest', 'rest_percentage',
+]
+
+
+def _quantize(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def iter_data_cells(data):
+    """Yield (section, department, code, cell) for every cell of a snapshot's ``data``."""
+    timesheet = (data or {}).get("TIMESHEET", {})
+    for key, section in (("HOURS", PSRSnapshotLine.TIMESHEET_HOURS), ("COST", PSRSnapshotLine.TIMESHEET_COST)):
+        for department, cells in timesheet.get(key, {}).items():
+            for code, cell in cells.items():
+                yield section, department, code, cell
+    for code, cell in (data or {}).get("COST TO GO", {}).get("COST", {}).items():
+        yield PSRSnapshotLine.COST_TO_GO, "", code, cell
+
+
+def build_lines(snapshot_id, project_id, snapshot_date, data):
+    """Unsaved ``PSRSnapshotLine`` objects for one snapshot."""
+    return [
+        PSRSnapshotLine(
+            snapshot_id=snapshot_id,
+            project_id=project_id,
+            snapshot_date=snapshot_date,
+            section=section,
+            department=department,
+            code=code,
+            ref_id=cell.get("id"),
+            inkrement=cell.get("inkrement") or "",
+            **{field: _quantize(cell.get(field)) for field in LINE_VALUE_FIELDS},
+        )
+        for section, department, code, cell in iter_data_cells(data)
+    ]
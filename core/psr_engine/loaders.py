@@ -0,0 +1,267 @@
+# core/psr_engine/loaders.py
+
+"""
+Loading of snapshot inputs: projects with their master data, cumulative
+timesheet / PO actuals (full or incremental) and previous month-end data.
+Every loader issues a fixed number of queries for any number of projects.
+"""
+
+import datetime
+import time
+from calendar import monthrange
+from collections import defaultdict
+
+from django.db.models import Count, Prefetch, Sum
+
+from core.models import (
+    Project, TimesheetEntry, POData, Department, ProjectCostCategory, PSRSnapshot
+)
+from core.psr_engine.fixedpoint import to_fixed, from_fixed, fixed_totals_to_decimal
+from core.resolution import find_project_co_no
+from core.snapshot_codec import load_payload
+
+
+def previous_month_end(snapshot_date):
+    """Last day of the month before ``snapshot_date`` (source of last_month_actuals)."""
+    last_day_prev_month = snapshot_date.replace(day=1) - datetime.timedelta(days=1)
+    return last_day_prev_month.replace(day=monthrange(last_day_prev_month.year, last_day_prev_month.month)[1])
+
+
+def load_projects(projects):
+    """Projects with everything ``build_snapshot`` reads prefetched (fixed query count)."""
+    return list(
+        projects.prefetch_related(
+            Prefetch('departments', queryset=Department.objects.prefetch_related('sub_departments')),
+            Prefetch(
+                'project_cost_categories',
+                queryset=ProjectCostCategory.objects.select_related('cost_category')
+                .prefetch_related('rk_actual_adjustments__lines')
+            ),
+        )
+    )
+
+
+def load_labor_hours(projects, snapshot_date):
+    """
+    Cumulative timesheet hours up to ``snapshot_date`` from one grouped query.
+
+    Returns ({project_id: {sub_department_id: hours}}, {project_id: row_count}).
+    """
+    sub_dept_project = {
+        sub.id: project.id
+        for project in projects
+        for dept in project.departments.all()
+        for sub in dept.sub_departments.all()
+    }
+
+    rows = (
+        TimesheetEntry.objects
+        .filter(sub_department__isnull=False, date__lte=snapshot_date)
+        .values('sub_department_id')
+        .annotate(total_hours=Sum('hours'), rows=Count('id'))
+        .order_by()
+    )
+    if len(projects) == 1:
+        rows = rows.filter(sub_department_id__in=list(sub_dept_project))
+
+    labor_hours = defaultdict(dict)
+    labor_rows = defaultdict(int)
+    for row in rows:
+        project_id = sub_dept_project.get(row['sub_department_id'])
+        if project_id is not None:
+            labor_hours[project_id][row['sub_department_id']] = from_fixed(to_fixed(row['total_hours']))
+            labor_rows[project_id] += row['rows']
+    return labor_hours, labor_rows
+
+
+def po_project_resolver(projects):
+    """
+    Map a PO co_no to one of ``projects`` (id) or None.
+
+    PO lines are assigned to the project with the longest co_no prefix,
+    the same rule used for timesheet rows.
+    """
+    project_co_nos = set(Project.objects.values_list('co_no', flat=True))
+    prefix_lengths = sorted({len(co_no) for co_no in project_co_nos}, reverse=True)
+    project_ids = {project.co_no: project.id for project in projects}
+
+    def resolve(co_no):
+        return project_ids.get(find_project_co_no(co_no, project_co_nos, prefix_lengths))
+    return resolve
+
+
+def load_material_actuals(projects):
+    """
+    Cumulative PO value per cost category code from one grouped query.
+
+    Returns ({project_id: {cost_category_code: value_inr}}, {project_id: row_count}).
+    """
+    resolve_project = po_project_resolver(projects)
+
+    rows = (
+        POData.objects
+        .filter(cost_category__isnull=False)
+        .values('co_no', 'cost_category__code')
+        .annotate(total_value=Sum('po_value_inr'), rows=Count('id'))
+        .order_by()
+    )
+    if len(projects) == 1:
+        rows = rows.filter(co_no__startswith=projects[0].co_no)
+
+    material_paise = defaultdict(dict)
+    po_rows = defaultdict(int)
+    for row in rows:
+        project_id = resolve_project(row['co_no'])
+        if project_id is None:
+            continue
+        by_code = material_paise[project_id]
+        code = row['cost_category__code']
+        by_code[code] = by_code.get(code, 0) + to_fixed(row['total_value'])
+        po_rows[project_id] += row['rows']
+
+    material_actuals = defaultdict(dict)
+    for project_id, by_code in material_paise.items():
+        material_actuals[project_id] = fixed_totals_to_decimal(by_code)
+    return material_actuals, po_rows
+
+
+def build_actuals_state(as_of, labor_hours, labor_rows, material_actuals, po_rows):
+    """
+    Exact cumulative actuals stored on the snapshot (``PSRSnapshot.actuals_state``)
+    so the next ``--incremental`` run only has to add rows that came after it.
+    """
+    return {
+        'as_of': as_of.isoformat(),
+        'timesheet_rows': labor_rows,
+        'po_rows': po_rows,
+        'labor_hours': {str(sub_id): str(hours) for sub_id, hours in labor_hours.items()},
+        'material': {code: str(value) for code, value in material_actuals.items()},
+    }
+
+
+def load_incremental_actuals(projects, snapshot_date, timings=None, scanned=None):
+    """
+    Cumulative actuals built from each project's latest earlier snapshot plus
+    the rows added since, instead of the project's full history.
+
+    A project falls back to a full recompute (listed in the returned
+    ``fallbacks`` as project_id -> reason) when it has no usable base snapshot,
+    or when rows covered by the base were back-dated, edited, re-resolved or
+    deleted after it was generated.
+
+    Returns (labor_hours, labor_rows, material_actuals, po_rows, fallbacks) for
+    the projects that could be handled incrementally. Optionally adds the time
+    spent on timesheet / PO queries to ``timings`` ('labor_load',
+    'material_load') and the rows read per project to ``scanned``.
+    """
+    timings = {} if timings is None else timings
+    scanned = {} if scanned is None else scanned
+    labor_hours, labor_rows = {}, {}
+    material_actuals, po_rows = {}, {}
+    fallbacks = {}
+
+    bases = {}
+    candidates = (
+        PSRSnapshot.objects
+        .filter(project__in=projects, snapshot_date__lte=snapshot_date)
+        .exclude(actuals_state={})
+        .order_by('project_id', '-snapshot_date')
+        .values_list('project_id', 'snapshot_date', 'actuals_state')
+    )
+    for project_id, base_date, state in candidates:
+        bases.setdefault(project_id, (base_date, state))
+
+    resolve_project = po_project_resolver(projects)
+
+    for project in projects:
+        if project.id not in bases:
+            fallbacks[project.id] = "no earlier snapshot with stored actuals"
+            continue
+
+        labor_start = time.perf_counter()
+        base_date, state = bases[project.id]
+        as_of = datetime.datetime.fromisoformat(state['as_of'])
+        sub_dept_ids = [sub.id for dept in project.departments.all() for sub in dept.sub_departments.all()]
+
+        # Timesheet rows the base snapshot already covers
+        covered = TimesheetEntry.objects.filter(sub_department_id__in=sub_dept_ids, date__lte=base_date)
+        if covered.filter(updated_at__gt=as_of).exists():
+            fallbacks[project.id] = "back-dated or changed timesheet rows"
+            continue
+        if covered.count() != state['timesheet_rows']:
+            fallbacks[project.id] = "timesheet rows removed"
+            continue
+
+        material_start = time.perf_counter()
+        timings['labor_load'] = timings.get('labor_load', 0.0) + material_start - labor_start
+
+        # PO lines the base snapshot already covers (PO actuals are not date-bounded)
+        project_po = POData.objects.filter(co_no__startswith=project.co_no, cost_category__isnull=False)
+        covered_po = project_po.filter(imported_at__lte=as_of)
+        if covered_po.filter(updated_at__gt=as_of).exists():
+            fallbacks[project.id] = "changed PO lines"
+            continue
+        covered_po_rows = sum(
+            row['rows']
+            for row in covered_po.values('co_no').annotate(rows=Count('id')).order_by()
+            if resolve_project(row['co_no']) == project.id
+        )
+        if covered_po_rows != state['po_rows']:
+            fallbacks[project.id] = "PO lines removed"
+            continue
+
+        timings['material_load'] = timings.get('material_load', 0.0) + time.perf_counter() - material_start
+
+        labor_start = time.perf_counter()
+        hours = {int(sub_id): to_fixed(value) for sub_id, value in state['labor_hours'].items()}
+        rows = state['timesheet_rows']
+        new_timesheet = (
+            TimesheetEntry.objects
+            .filter(sub_department_id__in=sub_dept_ids, date__gt=base_date, date__lte=snapshot_date)
+            .values('sub_department_id')
+            .annotate(total_hours=Sum('hours'), rows=Count('id'))
+            .order_by()
+        )
+        for row in new_timesheet:
+            sub_id = row['sub_department_id']
+            hours[sub_id] = hours.get(sub_id, 0) + to_fixed(row['total_hours'])
+            rows += row['rows']
+        labor_hours[project.id] = fixed_totals_to_decimal(hours)
+        labor_rows[project.id] = rows
+        new_timesheet_rows = rows - state['timesheet_rows']
+        material_start = time.perf_counter()
+        timings['labor_load'] += material_start - labor_start
+
+        material = {code: to_fixed(value) for code, value in state['material'].items()}
+        rows = state['po_rows']
+        new_po = (
+            project_po
+            .filter(imported_at__gt=as_of)
+            .values('co_no', 'cost_category__code')
+            .annotate(total_value=Sum('po_value_inr'), rows=Count('id'))
+            .order_by()
+        )
+        for row in new_po:
+            if resolve_project(row['co_no']) != project.id:
+                continue
+            code = row['cost_category__code']
+            material[code] = material.get(code, 0) + to_fixed(row['total_value'])
+            rows += row['rows']
+        material_actuals[project.id] = fixed_totals_to_decimal(material)
+        po_rows[project.id] = rows
+        timings['material_load'] += time.perf_counter() - material_start
+        scanned[project.id] = {'timesheet': new_timesheet_rows, 'po': rows - state['po_rows']}
+
+    return labor_hours, labor_rows, material_actuals, po_rows, fallbacks
+
+
+def load_previous_data(projects, snapshot_date):
+    """{project_id: data} of each project's previous month-end snapshot."""
+    return {
+        project_id: load_payload(data, blob, encoding)
+        for project_id, data, blob, encoding in (
+            PSRSnapshot.objects
+            .filter(project__in=projects, snapshot_date=previous_month_end(snapshot_date))
+            .values_list('project_id', 'data', 'data_blob', 'data_encoding')
+        )
+    }
@@ -0,0 +1,139 @@
+# core/psr_engine/locking.py
+
+"""
+Per-project regeneration locks.
+
+A ``SnapshotLock`` row per project is claimed with a conditional UPDATE
+(free or expired -> ours), each in its own short autocommit statement, so
+no database lock is held while a snapshot is computed. A second run for the
+same project polls until the first one releases, then continues; since the
+first run has just written the snapshot, its fingerprint check normally
+finds nothing to do and the result is reused.
+
+A held lock expires PSR_SNAPSHOT_LOCK_TTL_SECONDS after it was last renewed
+(so a crashed run does not block the project for good). Long runs call
+``HeldLocks.renew`` between steps as a heartbeat to keep their locks.
+"""
+
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import SnapshotLock
+
+
+class SnapshotLockTimeout(Exception):
+    """Gave up waiting for another run's regeneration lock."""
+
+
+class SnapshotLockLost(Exception):
+    """A held lock expired and another run took it over."""
+
+
+def _lock_ttl():
+    return timedelta(seconds=getattr(settings, 'PSR_SNAPSHOT_LOCK_TTL_SECONDS', 600))
+
+
+def _free(now):
+    return Q(holder='') | Q(expires_at__lt=now)
+
+
+class HeldLocks(dict):
+    """{project_id: seconds waited} for the locks a run holds."""
+
+    def __init__(self, token):
+        super().__init__()
+        self.token = token
+        self.renewed_at = time.monotonic()
+
+    def renew(self):
+        """
+        Heartbeat: once half the TTL has passed since the last renewal, push
+        the expiry of the held locks a full TTL ahead. Cheap to call often.
+        Raises ``SnapshotLockLost`` if a lock expired and was taken meanwhile.
+        """
+        ttl = _lock_ttl()
+        if not self or time.monotonic() - self.renewed_at < ttl.total_seconds() / 2:
+            return
+        self.renewed_at = time.monotonic()
+        renewed = SnapshotLock.objects.filter(project_id__in=list(self), holder=self.token).update(
+            expires_at=timezone.now() + ttl
+        )
+        if renewed < len(self):
+            raise SnapshotLockLost(
+                f"{len(self) - renewed} regeneration locks expired and were taken by another run"
+            )
+
+
+@contextmanager
+def project_locks(project_ids, timeout=None):
+    """
+    Hold the regeneration locks of ``project_ids`` for the duration of the block.
+
+    Locks are taken in project id order. Yields a ``HeldLocks`` of
+    {project_id: seconds waited} (0 for locks that were free), whose
+    ``renew`` the block calls as it makes progress. Raises
+    ``SnapshotLockTimeout`` after ``timeout`` seconds (default
+    PSR_SNAPSHOT_LOCK_TIMEOUT_SECONDS).
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'PSR_SNAPSHOT_LOCK_TIMEOUT_SECONDS', 120)
+    project_ids = sorted(set(project_ids))
+    token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    SnapshotLock.objects.bulk_create([SnapshotLock(project_id=pid) for pid in project_ids], ignore_conflicts=True)
+
+    # Everything that is free right now in one statement
+    waits = HeldLocks(token)
+    now = timezone.now()
+    SnapshotLock.objects.filter(_free(now), project_id__in=project_ids).update(
+        holder=token, acquired_at=now, expires_at=now + _lock_ttl(), acquisitions=F('acquisitions') + 1,
+    )
+    waits.update((pid, 0.0) for pid in SnapshotLock.objects.filter(project_id__in=project_ids, holder=token)
+                 .values_list('project_id', flat=True))
+    try:
+        for pid in project_ids:
+            if pid not in waits:
+                waits.renew()
+                waits[pid] = _wait_for(pid, token, timeout)
+        yield waits
+    finally:
+        SnapshotLock.objects.filter(project_id__in=list(waits), holder=token).update(
+            holder='', acquired_at=None, expires_at=None,
+        )
+
+
+def _wait_for(project_id, token, timeout):
+    start = time.perf_counter()
+    delay = 0.05
+    while True:
+        waited = time.perf_counter() - start
+        now = timezone.now()
+        claimed = SnapshotLock.objects.filter(_free(now), project_id=project_id).update(
+            holder=token,
+            acquired_at=now,
+            expires_at=now + _lock_ttl(),
+            acquisitions=F('acquisitions') + 1,
+            contended=F('contended') + 1,
+            total_wait_seconds=F('total_wait_seconds') + waited,
+            max_wait_seconds=Greatest(F('max_wait_seconds'), Value(waited)),
+        )
+        if claimed:
+            return waited
+        if waited >= timeout:
+            raise SnapshotLockTimeout(f"Project {project_id}: regeneration lock still held after {waited:.1f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def record_reuse(project_ids):
+    """Count waiters that found the snapshot already rebuilt by the run they waited for."""
+    if project_ids:
+        SnapshotLock.objects.filter(project_id__in=project_ids).update(reused_runs=F('reused_runs') + 1)
@@ -0,0 +1,105 @@
+# core/psr_engine/persist.py
+
+"""Publishing computed snapshots."""
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import PSRSnapshot, PSRSnapshotLine
+from core.snapshot_codec import ENCODING_COLUMNAR, encode_data
+from core.psr_engine.lines import build_lines
+from core.psr_engine.types import SNAPSHOT_FIELDS
+
+
+# Columns replaced when a new version of an existing snapshot is published
+PUBLISHED_FIELDS = SNAPSHOT_FIELDS + ['data_blob', 'data_encoding', 'is_stale', 'stale_since', 'version']
+
+
+def save_snapshots(snapshot_date, results, batch_size=50):
+    """
+    Upsert computed snapshots for one date, ``batch_size`` projects per transaction.
+
+    ``results`` maps project_id -> ``SnapshotResult``.
+    Returns the set of project ids whose snapshot did not exist before.
+    """
+    created = save_snapshot_rows(
+        [(project_id, snapshot_date, result) for project_id, result in results.items()],
+        batch_size=batch_size,
+    )
+    return {project_id for project_id, _ in created}
+
+
+def stored_values(result, encoding=''):
+    """``PSRSnapshot`` field values for ``result`` with ``data`` stored as ``encoding``."""
+    values = result.field_values()
+    values.update(is_stale=False, stale_since=None)
+    if encoding == ENCODING_COLUMNAR:
+        values.update(data={}, data_blob=encode_data(result.data), data_encoding=ENCODING_COLUMNAR)
+    else:
+        values.update(data_blob=None, data_encoding='')
+    return values
+
+
+def save_snapshot_rows(rows, batch_size=50):
+    """
+    Publish (project_id, snapshot_date, SnapshotResult) rows.
+
+    Two phases: first everything is staged outside any transaction (model
+    objects, encoded payloads, line rows, next version numbers); then each
+    batch of ``batch_size`` snapshots is written in one short transaction
+    that only upserts the snapshot rows and swaps their ``PSRSnapshotLine``
+    rows. Readers see either the previous or the new version of a snapshot,
+    never a partial one. Returns the (project_id, snapshot_date) pairs that
+    did not exist before.
+    """
+    keys = {(project_id, snapshot_date) for project_id, snapshot_date, _ in rows}
+    versions = {
+        (project_id, snapshot_date): version
+        for project_id, snapshot_date, version in (
+            PSRSnapshot.objects
+            .filter(
+                project_id__in={project_id for project_id, _ in keys},
+                snapshot_date__in={snapshot_date for _, snapshot_date in keys},
+            )
+            .values_list('project_id', 'snapshot_date', 'version')
+        )
+    }
+
+    encoding = getattr(settings, 'PSR_SNAPSHOT_ENCODING', '')
+    staged = [
+        (
+            PSRSnapshot(
+                project_id=project_id,
+                snapshot_date=snapshot_date,
+                version=versions.get((project_id, snapshot_date), 0) + 1,
+                **stored_values(result, encoding),
+            ),
+            build_lines(None, project_id, snapshot_date, result.data),
+        )
+        for project_id, snapshot_date, result in rows
+    ]
+
+    for i in range(0, len(staged), batch_size):
+        batch = staged[i:i + batch_size]
+        with transaction.atomic():
+            PSRSnapshot.objects.bulk_create(
+                [snapshot for snapshot, _ in batch],
+                update_conflicts=True,
+                unique_fields=['project', 'snapshot_date'],
+                update_fields=PUBLISHED_FIELDS,
+            )
+            save_lines(batch)
+
+    return keys - set(versions)
+
+
+def save_lines(staged):
+    """
+    Replace the line rows of just-upserted snapshots; ``staged`` is a list of
+    (PSRSnapshot, [PSRSnapshotLine]) with the snapshot pks set by the upsert.
+    """
+    PSRSnapshotLine.objects.filter(snapshot_id__in=[snapshot.pk for snapshot, _ in staged]).delete()
+    for snapshot, lines in staged:
+        for line in lines:
+            line.snapshot_id = snapshot.pk
+    PSRSnapshotLine.objects.bulk_create([line for _, lines in staged for line in lines], batch_size=1000)
@@ -0,0 +1,162 @@
+# core/psr_engine/runner.py
+
+"""
+End-to-end snapshot generation: load -> fingerprint check -> compute -> save.
+Used by the `generate_psr_snapshot` command, the job worker and the views.
+"""
+
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Project, PSRSnapshot
+from core.psr_engine.compute import compute_snapshots
+from core.psr_engine.fingerprint import compute_input_fingerprints
+from core.psr_engine.loaders import (
+    load_projects, load_labor_hours, load_material_actuals, load_incremental_actuals,
+    load_previous_data, build_actuals_state,
+)
+from core.psr_engine.locking import project_locks, record_reuse
+from core.psr_engine.persist import save_snapshots
+from core.psr_engine.stats import build_stats, count_queries, record_persist, timed
+from core.psr_engine.types import SnapshotInputs, GenerationReport
+
+
+def generate_snapshots(projects, snapshot_date, frequency='MONTHLY', incremental=False, force=False,
+                       workers=1, batch_size=50, backend=None, lock_timeout=None):
+    """
+    Generate and save snapshots for ``projects`` (a list from ``load_projects``).
+
+    Projects whose input fingerprint matches their stored snapshot are skipped
+    unless ``force``. With ``incremental``, actuals start from each project's
+    latest earlier snapshot where that is safe. ``backend`` selects the math
+    implementation (see ``compute_snapshots``; default PSR_SNAPSHOT_BACKEND).
+
+    The run holds the projects' regeneration locks (see ``locking``). A project
+    whose lock was busy is checked against its fingerprint even with ``force``:
+    the run it waited for has usually just written the same snapshot.
+    Returns a ``GenerationReport``.
+    """
+    with project_locks([project.id for project in projects], timeout=lock_timeout) as waits:
+        waited = {project_id for project_id, seconds in waits.items() if seconds > 0}
+        with count_queries() as queries:
+            report = _generate(projects, snapshot_date, frequency, incremental, force, workers, batch_size,
+                               backend, waited, queries, waits)
+    report.lock_wait_seconds = sum(waits.values())
+    report.reused = [project for project in report.skipped if project.id in waited]
+    record_reuse([project.id for project in report.reused])
+    return report
+
+
+def _generate(projects, snapshot_date, frequency, incremental, force, workers, batch_size, backend, waited,
+              queries, locks):
+    if backend is None:
+        backend = getattr(settings, 'PSR_SNAPSHOT_BACKEND', 'decimal')
+    report = GenerationReport(snapshot_date=snapshot_date, incremental=incremental)
+    timings = {}      # run-level phases shared by all projects
+    scanned = {}      # project_id -> rows read from the dump tables
+
+    load_start = time.perf_counter()
+    previous_data = load_previous_data(projects, snapshot_date)
+
+    # Skip projects whose inputs have not changed since their stored snapshot
+    fingerprints = compute_input_fingerprints(projects, snapshot_date, frequency, previous_data)
+    if not force or waited:
+        stored, stale = {}, set()
+        for project_id, fingerprint, is_stale in (
+            PSRSnapshot.objects
+            .filter(project__in=projects, snapshot_date=snapshot_date)
+            .exclude(input_fingerprint='')
+            .values_list('project_id', 'input_fingerprint', 'is_stale')
+        ):
+            stored[project_id] = fingerprint
+            if is_stale:
+                stale.add(project_id)
+        report.skipped = [
+            project for project in projects
+            if (not force or project.id in waited) and stored.get(project.id) == fingerprints[project.id]
+        ]
+        projects = [project for project in projects if project not in report.skipped]
+        if stale.intersection(project.id for project in report.skipped):
+            # Inputs are unchanged, so a snapshot flagged stale by an import is current after all
+            PSRSnapshot.objects.filter(
+                project__in=report.skipped, snapshot_date=snapshot_date, is_stale=True
+            ).update(is_stale=False, stale_since=None)
+    report.projects = projects
+    timings['prepare'] = time.perf_counter() - load_start
+    if not projects:
+        report.load_seconds = timings['prepare']
+        return report
+
+    # Read the dump tables once for all selected projects
+    locks.renew()
+    as_of = timezone.now()
+    labor_hours, labor_rows = {}, {}
+    material_actuals, po_rows = {}, {}
+    full_projects = projects
+    if incremental:
+        labor_hours, labor_rows, material_actuals, po_rows, report.fallbacks = load_incremental_actuals(
+            projects, snapshot_date, timings=timings, scanned=scanned
+        )
+        full_projects = [project for project in projects if project.id in report.fallbacks]
+    if full_projects:
+        with timed(timings, 'labor_load'):
+            full_hours, full_rows = load_labor_hours(full_projects, snapshot_date)
+        with timed(timings, 'material_load'):
+            full_material, full_po_rows = load_material_actuals(full_projects)
+        for project in full_projects:
+            labor_hours[project.id] = full_hours.get(project.id, {})
+            labor_rows[project.id] = full_rows.get(project.id, 0)
+            material_actuals[project.id] = full_material.get(project.id, {})
+            po_rows[project.id] = full_po_rows.get(project.id, 0)
+            scanned[project.id] = {'timesheet': labor_rows[project.id], 'po': po_rows[project.id]}
+    report.load_seconds = time.perf_counter() - load_start
+
+    locks.renew()
+    compute_start = time.perf_counter()
+    report.results, report.timings = compute_snapshots(
+        [
+            SnapshotInputs(
+                project=project,
+                labor_hours=labor_hours[project.id],
+                material_actuals=material_actuals[project.id],
+                previous_data=previous_data.get(project.id),
+                frequency=frequency,
+            )
+            for project in projects
+        ],
+        workers=workers,
+        backend=backend,
+    )
+    report.compute_seconds = time.perf_counter() - compute_start
+
+    for project in projects:
+        result = report.results[project.id]
+        result.actuals_state = build_actuals_state(
+            as_of, labor_hours[project.id], labor_rows[project.id],
+            material_actuals[project.id], po_rows[project.id],
+        )
+        result.input_fingerprint = fingerprints[project.id]
+        build_stats(
+            result, timings, len(projects), scanned[project.id], queries.count,
+            backend=backend, incremental=incremental and project.id not in report.fallbacks,
+        )
+
+    locks.renew()
+    save_start = time.perf_counter()
+    report.created = save_snapshots(snapshot_date, report.results, batch_size=batch_size)
+    report.save_seconds = time.perf_counter() - save_start
+    record_persist(
+        [(project_id, snapshot_date, result) for project_id, result in report.results.items()],
+        report.save_seconds, queries.count,
+    )
+    return report
+
+
+def regenerate_snapshot(project, snapshot_date, frequency='MONTHLY', incremental=False, force=False,
+                        lock_timeout=None):
+    """Generate one project's snapshot; returns the ``GenerationReport``."""
+    projects = load_projects(Project.objects.filter(pk=project.pk))
+    return generate_snapshots(projects, snapshot_date, frequency=frequency, incremental=incremental, force=force,
+                              lock_timeout=lock_timeout)
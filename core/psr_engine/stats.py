@@ -0,0 +1,102 @@
+# core/psr_engine/stats.py
+
+"""
+Generation metadata stored on each snapshot (``generation_seconds`` /
+``generation_stats``).
+
+Per-project compute phases are measured by the math itself. Loading and
+persisting are done once for all projects of a run; each project is
+charged an even share of them. Queries are not counted per project (the
+loaders read all projects at once): ``run_queries`` is the count of the
+whole run, stored as is on each of its ``run_projects`` snapshots.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+from core.models import PSRSnapshot
+
+
+# 'prepare' is the previous-data / fingerprint check before anything is loaded
+PHASES = ('prepare', 'labor_load', 'labor_compute', 'material_load', 'material_compute', 'persist')
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook counting the statements of a run."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+@contextmanager
+def timed(timings, phase):
+    """Add the block's duration to ``timings[phase]``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def build_stats(result, shared, project_count, rows_scanned, run_queries, **extra):
+    """
+    Fill ``result.generation_seconds`` / ``generation_stats`` from the project's
+    own compute phases and the run's ``shared`` phases (split evenly).
+    """
+    phases = {phase: 0.0 for phase in PHASES}
+    phases.update(result.generation_stats.get('phases', {}))
+    for phase, seconds in shared.items():
+        phases[phase] = phases.get(phase, 0.0) + seconds / project_count
+    result.generation_seconds = sum(phases.values())
+    result.generation_stats = {
+        'phases': {phase: round(seconds, 6) for phase, seconds in phases.items()},
+        'rows_scanned': rows_scanned,
+        'run_queries': run_queries,
+        'run_projects': project_count,
+        **extra,
+    }
+
+
+def record_persist(rows, persist_seconds, run_queries):
+    """
+    Charge the persist phase, known only after the write, to the snapshots
+    just published and store the run's final query count.
+    ``rows`` is [(project_id, snapshot_date, SnapshotResult)].
+    """
+    if not rows:
+        return
+    share = persist_seconds / len(rows)
+    results = {(project_id, snapshot_date): result for project_id, snapshot_date, result in rows}
+    snapshots = list(
+        PSRSnapshot.objects
+        .filter(
+            project_id__in={project_id for project_id, _, _ in rows},
+            snapshot_date__in={snapshot_date for _, snapshot_date, _ in rows},
+        )
+        .only('pk', 'project_id', 'snapshot_date')
+    )
+    updated = []
+    for snapshot in snapshots:
+        result = results.get((snapshot.project_id, snapshot.snapshot_date))
+        if result is None:
+            continue
+        result.generation_stats['phases']['persist'] = round(share, 6)
+        result.generation_stats['run_queries'] = run_queries
+        result.generation_seconds += share
+        snapshot.generation_seconds = result.generation_seconds
+        snapshot.generation_stats = result.generation_stats
+        updated.append(snapshot)
+    PSRSnapshot.objects.bulk_update(updated, ['generation_seconds', 'generation_stats'], batch_size=500)
@@ -0,0 +1,106 @@
+# core/psr_engine/types.py
+
+"""Inputs and results passed between the snapshot engine stages."""
+
+from dataclasses import dataclass, field, fields
+from decimal import Decimal
+from typing import Any, Optional
+
+
+@dataclass
+class SnapshotInputs:
+    """
+    Everything ``build_snapshot`` needs for one project.
+
+    ``project`` comes from ``load_projects`` (related rows prefetched),
+    ``labor_hours`` maps sub_department_id -> cumulative hours,
+    ``material_actuals`` maps cost category code -> cumulative PO value (INR)
+    and ``previous_data`` is the last month-end snapshot's ``data`` (or None).
+    """
+    project: Any
+    labor_hours: dict
+    material_actuals: dict
+    previous_data: Optional[dict] = None
+    frequency: str = 'MONTHLY'
+
+
+@dataclass
+class SnapshotResult:
+    """Computed ``PSRSnapshot`` field values for one project."""
+    frequency: str
+    data: dict
+
+    # Labor
+    labor_actual_hours: Decimal
+    labor_budget_hours: Decimal
+    labor_forecast_hours: Decimal
+    labor_prognosis_hours: Decimal
+    labor_actual_cost: Decimal
+    labor_budget_cost: Decimal
+    labor_forecast_cost: Decimal
+    labor_prognosis_cost: Decimal
+
+    # Material
+    material_actual_cost: Decimal
+    material_budget_cost: Decimal
+    material_forecast_cost: Decimal
+    material_prognosis_cost: Decimal
+
+    # KPIs
+    eff_value: Decimal
+    ter_value: Decimal
+    sum_prognosis: Decimal
+    margin: Decimal
+    factor: Decimal
+
+    # Combined
+    total_actual_cost: Decimal
+    total_budget_cost: Decimal
+    total_forecast_cost: Decimal
+    total_prognosis_cost: Decimal
+
+    # Bookkeeping filled in by the runner before saving
+    actuals_state: dict = field(default_factory=dict)
+    input_fingerprint: str = ''
+    generation_seconds: Optional[float] = None
+    generation_stats: dict = field(default_factory=dict)    # compute phases here, the rest by the runner
+
+    def field_values(self):
+        """Values keyed by ``PSRSnapshot`` field name."""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+# PSRSnapshot fields written by the engine (upsert update_fields)
+SNAPSHOT_FIELDS = [f.name for f in fields(SnapshotResult)]
+
+
+@dataclass
+class GenerationReport:
+    """Outcome of one ``generate_snapshots`` run."""
+    snapshot_date: Any
+    projects: list = field(default_factory=list)          # projects that were (re)generated
+    skipped: list = field(default_factory=list)           # projects with unchanged inputs
+    fallbacks: dict = field(default_factory=dict)         # project_id -> reason (incremental runs)
+    incremental: bool = False
+    results: dict = field(default_factory=dict)           # project_id -> SnapshotResult
+    created: set = field(default_factory=set)             # project ids whose snapshot was new
+    timings: dict = field(default_factory=dict)           # project_id -> compute seconds
+    reused: list = field(default_factory=list)            # skipped after waiting for another run's lock
+    lock_wait_seconds: float = 0.0
+    load_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    save_seconds: float = 0.0
+
+
+@dataclass
+class BackfillReport:
+    """Outcome of one ``backfill_snapshots`` run."""
+    period_ends: list = field(default_factory=list)
+    projects: list = field(default_factory=list)
+    written: dict = field(default_factory=dict)           # snapshot_date -> [project_id, ...]
+    unchanged: dict = field(default_factory=dict)         # snapshot_date -> [project_id, ...]
+    created: set = field(default_factory=set)             # (project_id, snapshot_date) that were new
+    lock_wait_seconds: float = 0.0
+    load_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    save_seconds: float = 0.0
@@ -0,0 +1,132 @@
+# core/resolution.py
+
+"""
+Import-time resolution of raw dump rows to project master data.
+
+Timesheet rows only carry a free-text role description and a CO number, and
+PO lines only a material code. Matching them to a SubDepartment / CostCategory
+is done once here (at import, or when the mapping changes) instead of on every
+snapshot run.
+"""
+
+from collections import defaultdict
+
+from django.utils import timezone
+
+from core.models import SubDepartment, TimesheetEntry, CostCategory, POData
+
+
+def normalize_role(role_description):
+    """Key used to match timesheet roles to SubDepartment.role_descrptn."""
+    return (role_description or "").strip().lower()
+
+
+def normalize_mat_code(mat_code):
+    """Key used to match PO material codes to CostCategory.mat_code."""
+    return (mat_code or "").strip().lower()
+
+
+def find_project_co_no(co_no, project_co_nos, prefix_lengths):
+    """Longest project co_no that the given dump co_no starts with, or None."""
+    for length in prefix_lengths:
+        prefix = co_no[:length]
+        if len(prefix) == length and prefix in project_co_nos:
+            return prefix
+    return None
+
+
+class RoleIndex:
+    """In-memory map of (project co_no, normalized role) -> sub_department_id."""
+
+    def __init__(self, sub_departments=None):
+        if sub_departments is None:
+            sub_departments = SubDepartment.objects.all()
+
+        self.by_project = defaultdict(dict)
+        rows = sub_departments.order_by('id').values_list(
+            'id', 'role_descrptn', 'department__project__co_no'
+        )
+        for sub_dept_id, role_descrptn, co_no in rows:
+            if role_descrptn is None:
+                continue
+            # First sub-department (by id) wins, as in the snapshot engine
+            self.by_project[co_no].setdefault(normalize_role(role_descrptn), sub_dept_id)
+
+        self.prefix_lengths = sorted({len(co_no) for co_no in self.by_project}, reverse=True)
+
+    def resolve(self, co_no, role_description):
+        project_co_no = find_project_co_no(co_no or "", self.by_project, self.prefix_lengths)
+        if project_co_no is None:
+            return None
+        return self.by_project[project_co_no].get(normalize_role(role_description))
+
+
+def resolve_timesheet_entries(entries=None, index=None, batch_size=5000):
+    """
+    Re-resolve TimesheetEntry.sub_department for the given rows.
+
+    Returns the number of rows whose resolution changed. Updates are grouped
+    by target sub-department so the write count stays small; changed rows get
+    a fresh updated_at so incremental snapshots notice them.
+    """
+    if entries is None:
+        entries = TimesheetEntry.objects.all()
+    if index is None:
+        index = RoleIndex()
+
+    changes = defaultdict(list)
+    rows = entries.values_list('id', 'co_no', 'role_description', 'sub_department_id')
+    for entry_id, co_no, role_description, current in rows.iterator(chunk_size=batch_size):
+        target = index.resolve(co_no, role_description)
+        if target != current:
+            changes[target].append(entry_id)
+
+    changed = 0
+    for target, ids in changes.items():
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            changed += entries.model.objects.filter(id__in=batch).update(
+                sub_department_id=target, updated_at=timezone.now()
+            )
+    return changed
+
+
+class MaterialIndex:
+    """In-memory map of normalized mat_code -> cost_category_id."""
+
+    def __init__(self, cost_categories=None):
+        if cost_categories is None:
+            cost_categories = CostCategory.objects.all()
+
+        self.by_mat_code = {}
+        for cat_id, mat_code in cost_categories.order_by('id').values_list('id', 'mat_code'):
+            if mat_code is None:
+                continue
+            self.by_mat_code.setdefault(normalize_mat_code(mat_code), cat_id)
+
+    def resolve(self, mat_code):
+        return self.by_mat_code.get(normalize_mat_code(mat_code))
+
+
+def resolve_po_entries(entries=None, index=None, batch_size=5000):
+    """Re-resolve POData.cost_category for the given rows; returns rows changed."""
+    if entries is None:
+        entries = POData.objects.all()
+    if index is None:
+        index = MaterialIndex()
+
+    changes = defaultdict(list)
+    rows = entries.values_list('id', 'mat_code', 'cost_category_id')
+    for entry_id, mat_code, current in rows.iterator(chunk_size=batch_size):
+        target = index.resolve(mat_code)
+        if target != current:
+            changes[target].append(entry_id)
+
+    changed = 0
+    for target, ids in changes.items():
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            changed += entries.model.objects.filter(id__in=batch).update(
+                cost_category_id=target, updated_at=timezone.now()
+            )
+    return changed
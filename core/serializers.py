@@ -6,6 +6,8 @@ from .models import *
 from django.contrib.auth import get_user_model
 
 class PSRSnapshotSerializer(serializers.ModelSerializer):
+    data = serializers.SerializerMethodField()
+
     class Meta:
         model = PSRSnapshot
         fields = [
@@ -19,8 +21,13 @@ class PSRSnapshotSerializer(serializers.ModelSerializer):
             'overall_balance',
             'overall_balance_percentage',
             'generated_at',
+            'generation_seconds',
+            'generation_stats',
         ]
 
+    def get_data(self, obj):
+        return dict(obj.payload)
+
 
 User = get_user_model()
 
@@ -190,4 +197,30 @@ class RKActualAdjustmentSerializer(serializers.ModelSerializer):
         adjustment = RKActualAdjustment.objects.create(**validated_data)
         for line_data in lines_data:
             RKActualAdjustmentLine.objects.create(adjustment=adjustment, **line_data)
-        return adjustment
\ No newline at end of file
+        return adjustment
+
+
+class SnapshotJobSerializer(serializers.ModelSerializer):
+    project = serializers.CharField(source='project.co_no')
+    queued_seconds = serializers.FloatField(read_only=True)
+    run_seconds = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SnapshotJob
+        fields = [
+            'id',
+            'project',
+            'snapshot_date',
+            'status',
+            'source',
+            'merged_count',
+            'attempts',
+            'lock_wait_seconds',
+            'created_at',
+            'run_after',
+            'started_at',
+            'finished_at',
+            'queued_seconds',
+            'run_seconds',
+            'error',
+        ]
@@ -0,0 +1,101 @@
+# core/snapshot_codec.py
+
+"""
+Compact storage for ``PSRSnapshot.data``.
+
+Every cell of a snapshot repeats the same dozen keys ("baseline_budget",
+"last_month_actuals", ...). The columnar encoding stores each table of cells
+(one department, or the cost-to-go categories) as its key list once, its
+codes, and one value list per key, then zlib-compresses the JSON text.
+``LazySnapshotData`` decodes on first access and otherwise behaves like the
+read-only dict views already use.
+"""
+
+import json
+import zlib
+from collections.abc import Mapping
+
+
+ENCODING_JSON = ''
+ENCODING_COLUMNAR = 'columnar-zlib'
+
+ENCODING_CHOICES = [
+    (ENCODING_JSON, 'JSON'),
+    (ENCODING_COLUMNAR, 'Columnar + zlib'),
+]
+
+_TABLE = "__table__"
+
+
+def _is_cell(value):
+    return isinstance(value, dict) and not any(isinstance(v, (dict, list)) for v in value.values())
+
+
+def _encode_node(node):
+    if not isinstance(node, dict):
+        return node
+    cells = list(node.values())
+    if cells and all(_is_cell(cell) for cell in cells):
+        keys = list(cells[0])
+        if all(list(cell) == keys for cell in cells):
+            return {_TABLE: [keys, list(node), [[cell[key] for cell in cells] for key in keys]]}
+    return {key: _encode_node(value) for key, value in node.items()}
+
+
+def _decode_node(node):
+    if not isinstance(node, dict):
+        return node
+    if _TABLE in node:
+        keys, codes, columns = node[_TABLE]
+        return {code: dict(zip(keys, values)) for code, values in zip(codes, zip(*columns))}
+    return {key: _decode_node(value) for key, value in node.items()}
+
+
+def encode_data(data):
+    """Columnar, zlib-compressed bytes for a snapshot ``data`` dict."""
+    text = json.dumps(_encode_node(data), separators=(',', ':'))
+    return zlib.compress(text.encode('utf-8'), 9)
+
+
+def decode_data(blob):
+    """Inverse of ``encode_data``."""
+    return _decode_node(json.loads(zlib.decompress(bytes(blob)).decode('utf-8')))
+
+
+def stored_size(data, blob, encoding):
+    """Bytes a snapshot's payload takes in the database (JSON text or blob)."""
+    if encoding == ENCODING_COLUMNAR:
+        return len(blob or b'')
+    return len(json.dumps(data).encode('utf-8'))
+
+
+def load_payload(data, blob, encoding):
+    """Plain dict payload from the stored columns (e.g. a ``values_list`` row)."""
+    if encoding == ENCODING_COLUMNAR:
+        return decode_data(blob)
+    return data
+
+
+class LazySnapshotData(Mapping):
+    """Read-only mapping over an encoded payload, decoded on first access."""
+
+    def __init__(self, blob):
+        self._blob = blob
+        self._data = None
+
+    def _decoded(self):
+        if self._data is None:
+            self._data = decode_data(self._blob)
+        return self._data
+
+    def __getitem__(self, key):
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self):
+        return len(self._decoded())
+
+    def __repr__(self):
+        return repr(self._decoded())
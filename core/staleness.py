@@ -0,0 +1,185 @@
+# core/staleness.py
+
+"""
+Staleness of stored snapshots.
+
+Timesheet rows and PO lines are often imported after month-end with dates in
+an already snapshotted period. Imports pass the rows they inserted or
+changed (by ``row_hash``; rows the monthly dumps repeat unchanged are left
+out) to ``mark_stale`` which flags, in bulk, every snapshot of an affected
+project dated on or after the earliest changed date. Nothing is rebuilt up front:
+read endpoints call ``ensure_fresh`` on the snapshot they are about to
+return, which repairs it according to PSR_STALE_SNAPSHOT_REPAIR:
+
+    'queue'  queue a SnapshotJob and serve the stale copy (default)
+    'sync'   regenerate in the request; if another run holds the project's
+             regeneration lock, queue instead of waiting for it
+    'off'    serve the stale copy as is
+
+A read never waits on a rebuild that is already running.
+"""
+
+import datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from core.jobs import enqueue_snapshot_regeneration
+from core.models import Project, PSRSnapshot, SubDepartment, TimesheetEntry
+from core.psr_engine import previous_month_end, regenerate_snapshot
+from core.psr_engine.locking import SnapshotLockLost, SnapshotLockTimeout
+from core.psr_engine.loaders import po_project_resolver
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return None
+
+
+def _merge(changes, project_id, changed_date):
+    # None means "undated": every snapshot of the project is affected
+    if project_id not in changes:
+        changes[project_id] = changed_date
+    elif changes[project_id] is not None:
+        changes[project_id] = None if changed_date is None else min(changes[project_id], changed_date)
+
+
+def merge_changes(changes, more):
+    """Fold ``more`` into ``changes`` (both {project_id: earliest date or None})."""
+    for project_id, changed_date in more.items():
+        _merge(changes, project_id, changed_date)
+    return changes
+
+
+def timesheet_changes(entries):
+    """{project_id: earliest date} for resolved ``TimesheetEntry`` objects."""
+    entries = [entry for entry in entries if entry.sub_department_id is not None]
+    sub_dept_project = dict(
+        SubDepartment.objects
+        .filter(id__in={entry.sub_department_id for entry in entries})
+        .values_list('id', 'department__project_id')
+    )
+    changes = {}
+    for entry in entries:
+        _merge(changes, sub_dept_project[entry.sub_department_id], _as_date(entry.date))
+    return changes
+
+
+def timesheet_changes_since(since):
+    """
+    {project_id: earliest date} for resolved timesheet rows written since
+    ``since``: one grouped query over ``updated_at``, so an insert with
+    ignore_conflicts is judged by the rows it actually inserted.
+    """
+    return dict(
+        TimesheetEntry.objects
+        .filter(updated_at__gte=since, sub_department__isnull=False)
+        .values('sub_department__department__project_id')
+        .annotate(first_date=Min('date'))
+        .values_list('sub_department__department__project_id', 'first_date')
+    )
+
+
+def po_changes(entries):
+    """
+    {project_id: earliest PO date} for ``POData`` objects. PO actuals are not
+    bounded by snapshot date, so lines without a usable date affect every
+    snapshot of their project (value None).
+    """
+    resolve_project = po_project_resolver(list(Project.objects.only('id', 'co_no')))
+    changes = {}
+    for entry in entries:
+        project_id = resolve_project(entry.co_no)
+        if project_id is not None:
+            _merge(changes, project_id, _as_date(entry.po_date))
+    return changes
+
+
+def mark_stale(changes, batch_size=200):
+    """
+    Flag the snapshots affected by ``changes`` ({project_id: earliest changed
+    date or None}) as stale. Returns the number of snapshots newly flagged.
+    """
+    now = timezone.now()
+    items = list(changes.items())
+    marked = 0
+    for i in range(0, len(items), batch_size):
+        condition = reduce(or_, [
+            Q(project_id=project_id) if changed_date is None
+            else Q(project_id=project_id, snapshot_date__gte=changed_date)
+            for project_id, changed_date in items[i:i + batch_size]
+        ])
+        marked += PSRSnapshot.objects.filter(condition, is_stale=False).update(is_stale=True, stale_since=now)
+    return marked
+
+
+def _stale_chain(snapshot):
+    """
+    Stale snapshot dates to rebuild, oldest first, so that ``snapshot`` is
+    computed from a fresh previous month-end (its last_month_actuals).
+    """
+    stale = set(
+        PSRSnapshot.objects
+        .filter(project_id=snapshot.project_id, snapshot_date__lt=snapshot.snapshot_date, is_stale=True)
+        .values_list('snapshot_date', flat=True)
+    )
+    chain = [snapshot.snapshot_date]
+    previous = previous_month_end(snapshot.snapshot_date)
+    while previous in stale:
+        chain.append(previous)
+        previous = previous_month_end(previous)
+    return chain[::-1]
+
+
+def ensure_fresh(snapshot, requested_by=None, source=""):
+    """
+    Repair ``snapshot`` if it is stale (see module docstring).
+
+    Returns the snapshot to serve (refreshed when rebuilt in the request) and
+    whether it is still stale.
+    """
+    if not snapshot.is_stale:
+        return snapshot, False
+
+    mode = getattr(settings, 'PSR_STALE_SNAPSHOT_REPAIR', 'queue')
+    chain = _stale_chain(snapshot)
+    if mode == 'sync':
+        try:
+            for snapshot_date in chain:
+                # Do not wait: a locked project is being rebuilt (or imported) right now
+                regenerate_snapshot(snapshot.project, snapshot_date, frequency=snapshot.frequency, lock_timeout=0)
+        except (SnapshotLockTimeout, SnapshotLockLost):
+            mode = 'queue'
+        snapshot.refresh_from_db()
+    if mode == 'queue':
+        for snapshot_date in chain:
+            enqueue_snapshot_regeneration(
+                snapshot.project, snapshot_date, requested_by=requested_by, source=source or "stale read"
+            )
+    return snapshot, snapshot.is_stale
+
+
+def queue_stale_snapshots(project, requested_by=None, source=""):
+    """
+    Queue rebuilds for all of ``project``'s stale snapshots (history views,
+    which read too many snapshots to rebuild in the request). Returns the count.
+    """
+    if getattr(settings, 'PSR_STALE_SNAPSHOT_REPAIR', 'queue') == 'off':
+        return 0
+    stale_dates = (
+        PSRSnapshot.objects
+        .filter(project=project, is_stale=True)
+        .order_by('snapshot_date')
+        .values_list('snapshot_date', flat=True)
+    )
+    count = 0
+    for snapshot_date in stale_dates:
+        enqueue_snapshot_regeneration(project, snapshot_date, requested_by=requested_by, source=source or "stale read")
+        count += 1
+    return count
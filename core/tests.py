@@ -1,3 +1,1138 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Q, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (Project, Department, SubDepartment, CostCategory,
+                     ProjectCostCategory, TimesheetEntry, POData, PSRSnapshot,
+                     PSRSnapshotLine, SnapshotJob, SnapshotLock, ImportRun)
+from .jobs import claim_next_job, enqueue_snapshot_regeneration, recover_abandoned_jobs
+from .psr_engine import SnapshotInputs, SnapshotResult, build_snapshot, compute_snapshots, load_projects
+from .psr_engine.fixedpoint import to_fixed, from_fixed
+from .importers import SheetReadError, clean_podata, evict_cache, podata_entries
+from .importers import timesheet as timesheet_importer
+from .importers.objects import row_hashes
+from .resolution import MaterialIndex, resolve_timesheet_entries, resolve_po_entries
+from .snapshot_codec import ENCODING_COLUMNAR, encode_data, decode_data
+
+
+def create_project(co_no="30778"):
+    project = Project.objects.create(
+        co_no=co_no,
+        project_name="Test Line",
+        project_manager="PM",
+        project_manager_email="pm@example.com",
+        sales_person="Sales",
+        sales_person_email="sales@example.com",
+        sales_value_foreign_curr=Decimal('1000000'),
+        ebit_percentage=Decimal('8'),
+        sgna_percentage=Decimal('5'),
+        eff_percentage=Decimal('1'),
+        ter_percentage=Decimal('1'),
+        exchange_rate=Decimal('1.0000'),
+    )
+    design = Department.objects.create(
+        project=project, name=Department.MECHANICAL_DESIGN, hourly_rate=Decimal('2000.00')
+    )
+    management = Department.objects.create(
+        project=project, name=Department.PROJECT_MANAGEMENT, hourly_rate=Decimal('2500.00')
+    )
+    SubDepartment.objects.create(
+        department=design, code="KMA/KHP",
+        role_descrptn="Engineering Mechanical & Pneumatic Design KMA_KHP",
+        budget_cost=Decimal('400000.00'), baseline_budget_cost=Decimal('400000.00'),
+    )
+    SubDepartment.objects.create(
+        department=management, code="PM", role_descrptn="Project Management PRO",
+        budget_cost=Decimal('250000.00'), baseline_budget_cost=Decimal('250000.00'),
+    )
+    category, _ = CostCategory.objects.get_or_create(code=CostCategory.KTMA, defaults={'mat_code': 'KTMA'})
+    ProjectCostCategory.objects.create(
+        project=project, cost_category=category,
+        budget_cost=Decimal('50000.00'), baseline_budget_cost=Decimal('50000.00'),
+    )
+    return project
+
+
+def add_timesheet_rows(project, count, start=datetime.date(2025, 1, 1)):
+    roles = [" engineering mechanical & pneumatic design kma_khp ", "Project Management PRO"]
+    TimesheetEntry.objects.bulk_create([
+        TimesheetEntry(
+            date=start + datetime.timedelta(days=i // 4),
+            emp_cd=f"E{i % 4}",
+            emp_name=f"Employee {i % 4}",
+            role_description=roles[i % 2],
+            co_no=project.co_no,
+            hours=Decimal('7.50'),
+        )
+        for i in range(count)
+    ])
+    resolve_timesheet_entries(TimesheetEntry.objects.filter(co_no=project.co_no))
+
+
+def add_po_rows(project, count):
+    POData.objects.bulk_create([
+        POData(
+            co_no=project.co_no,
+            po_no=f"PO{i}",
+            sr_no=i,
+            mat_code=" ktma " if i % 2 else "UNKNOWN",
+            po_value_inr=Decimal('100.25'),
+        )
+        for i in range(count)
+    ])
+    resolve_po_entries(POData.objects.filter(co_no=project.co_no))
+
+
+def generate(project, date="2025-12-31"):
+    call_command('generate_psr_snapshot', project.co_no, '--date', date, stdout=StringIO())
+    return PSRSnapshot.objects.get(project=project, snapshot_date=date)
+
+
+class GeneratePSRSnapshotQueryCountTests(TestCase):
+
+    def query_count_for(self, co_no, rows):
+        project = create_project(co_no)
+        add_timesheet_rows(project, rows)
+        add_po_rows(project, rows)
+        with CaptureQueriesContext(connection) as ctx:
+            generate(project)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_dump_rows(self):
+        few = self.query_count_for("30778", 4)
+        many = self.query_count_for("30779", 400)
+        self.assertEqual(few, many)
+
+    def test_labor_actuals_match_normalized_roles(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        snapshot = generate(project)
+
+        hours = snapshot.data["TIMESHEET"]["HOURS"]
+        cost = snapshot.data["TIMESHEET"]["COST"]
+        self.assertEqual(hours["MECHANICAL_DESIGN"]["KMA/KHP"]["actuals"], 30.0)
+        self.assertEqual(hours["PROJECT_MANAGEMENT"]["PM"]["actuals"], 30.0)
+        self.assertEqual(cost["MECHANICAL_DESIGN"]["KMA/KHP"]["actuals"], 60000.0)
+        self.assertEqual(cost["PROJECT_MANAGEMENT"]["PM"]["actuals"], 75000.0)
+        self.assertEqual(snapshot.labor_actual_hours, Decimal('60.00'))
+        self.assertEqual(snapshot.labor_actual_cost, Decimal('135000.00'))
+
+    def test_material_actuals_grouped_by_resolved_category(self):
+        project = create_project()
+        add_po_rows(project, 6)
+        snapshot = generate(project)
+
+        self.assertEqual(snapshot.data["COST TO GO"]["COST"]["KTMA"]["actuals"], 300.75)
+        self.assertEqual(snapshot.material_actual_cost, Decimal('300.75'))
+
+
+class SnapshotEngineTests(TestCase):
+
+    def test_build_snapshot_is_pure_and_typed(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        stored = generate(project)
+        loaded = load_projects(Project.objects.filter(pk=project.pk))[0]
+        sub_ids = {sub.code: sub.id for sub in SubDepartment.objects.filter(department__project=project)}
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = build_snapshot(SnapshotInputs(
+                project=loaded,
+                labor_hours={sub_ids["KMA/KHP"]: Decimal('30'), sub_ids["PM"]: Decimal('30')},
+                material_actuals={},
+            ))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertIsInstance(result, SnapshotResult)
+        self.assertEqual(result.data, stored.data)
+        self.assertEqual(result.margin, stored.margin)
+
+
+class VectorizedBackendTests(TestCase):
+
+    def assertCellsRoundEqual(self, exact, vectorized, path=""):
+        if isinstance(exact, dict):
+            self.assertEqual(set(exact), set(vectorized), path)
+            for key in exact:
+                self.assertCellsRoundEqual(exact[key], vectorized[key], f"{path}/{key}")
+        elif isinstance(exact, float):
+            self.assertEqual(round(exact, 2), round(vectorized, 2), path)
+        else:
+            self.assertEqual(exact, vectorized, path)
+
+    def test_numpy_backend_rounds_like_decimal_backend(self):
+        for n, co_no in enumerate(["40001", "40002", "40003"]):
+            project = create_project(co_no)
+            project.exchange_rate = Decimal('83.1234') if n else Decimal('1.0000')
+            project.save()
+            add_timesheet_rows(project, 37 * (n + 1))
+            add_po_rows(project, 5 + n)
+            if n == 1:
+                SubDepartment.objects.filter(department__project=project, code="PM").update(
+                    forecast_override=True, forecast_hours=Decimal('12.50'), forecast_cost=Decimal('2597606.25')
+                )
+                ProjectCostCategory.objects.filter(project=project).update(
+                    forecast_override=True, forecast_cost=Decimal('1234.56')
+                )
+        generate(Project.objects.get(co_no="40001"), "2025-01-31")
+
+        projects = load_projects(Project.objects.order_by('co_no'))
+        hours = {}
+        for sub in SubDepartment.objects.all():
+            hours.setdefault(sub.department.project_id, {})[sub.id] = Decimal('17.25') * sub.id
+        previous = dict(PSRSnapshot.objects.values_list('project_id', 'data'))
+        inputs = [
+            SnapshotInputs(
+                project=project,
+                labor_hours=hours[project.id],
+                material_actuals={"KTMA": Decimal('1002.55') * project.id},
+                previous_data=previous.get(project.id),
+            )
+            for project in projects
+        ]
+        exact, _ = compute_snapshots(inputs, backend='decimal')
+        vectorized, _ = compute_snapshots(inputs, backend='numpy')
+
+        cent = Decimal('0.01')
+        for project in projects:
+            a, b = exact[project.id], vectorized[project.id]
+            self.assertCellsRoundEqual(a.data, b.data)
+            for field in ('labor_actual_cost', 'labor_budget_hours', 'labor_forecast_cost', 'material_prognosis_cost',
+                          'total_actual_cost', 'total_budget_cost', 'total_forecast_cost', 'total_prognosis_cost',
+                          'sum_prognosis', 'margin'):
+                self.assertEqual(
+                    Decimal(getattr(a, field)).quantize(cent), getattr(b, field).quantize(cent), field
+                )
+            self.assertEqual(a.factor.quantize(Decimal('0.001')), b.factor.quantize(Decimal('0.001')))
+
+
+class FixedPointTests(TestCase):
+
+    def test_fixed_point_round_trip_matches_decimal_sums(self):
+        values = [Decimal('7.50'), 0.1, 0.2, "12.25", 3, Decimal('0.05')]
+        units = sum(to_fixed(value) for value in values)
+        self.assertEqual(units, 2310)
+        self.assertEqual(from_fixed(units), sum(Decimal(str(value)) for value in values))
+
+        out = StringIO()
+        call_command('benchmark_snapshot_math', '--rows', '2000', '--repeat', '1', stdout=out)
+        self.assertIn("Totals identical", out.getvalue())
+        self.assertIn("Micro-benchmark", out.getvalue())
+
+    def test_three_decimals_round_alike_for_decimal_and_float(self):
+        for text, units in (("1.005", 100), ("1.235", 124), ("-2.125", -212), ("0.004", 0)):
+            self.assertEqual((to_fixed(Decimal(text)), to_fixed(float(text)), to_fixed(text)), (units,) * 3, text)
+
+
+class TimesheetRoleResolutionTests(TestCase):
+
+    def test_rows_follow_role_description_changes(self):
+        project = create_project()
+        add_timesheet_rows(project, 4)
+        pm = SubDepartment.objects.get(department__project=project, code="PM")
+        self.assertEqual(TimesheetEntry.objects.filter(sub_department=pm).count(), 2)
+
+        pm.role_descrptn = "Project Management (renamed)"
+        pm.save()
+        call_command('resolve_mappings', stdout=StringIO())
+        self.assertEqual(TimesheetEntry.objects.filter(sub_department=pm).count(), 0)
+        self.assertEqual(TimesheetEntry.objects.filter(sub_department__isnull=True).count(), 2)
+
+    def test_rows_resolve_to_longest_matching_project(self):
+        create_project("30778")
+        other = create_project("307781")
+        add_timesheet_rows(other, 2)
+        self.assertFalse(
+            TimesheetEntry.objects.exclude(sub_department__department__project=other).exists()
+        )
+
+
+class PortfolioSnapshotTests(TestCase):
+
+    def test_all_mode_matches_single_project_runs(self):
+        projects = [create_project("30778"), create_project("30779")]
+        for project in projects:
+            add_timesheet_rows(project, 12)
+            add_po_rows(project, 6)
+
+        single = {project.id: generate(project).data for project in projects}
+        PSRSnapshot.objects.all().delete()
+
+        out = StringIO()
+        call_command('generate_psr_snapshot', '--all', '--date', '2025-12-31', stdout=out)
+        for project in projects:
+            snapshot = PSRSnapshot.objects.get(project=project, snapshot_date="2025-12-31")
+            self.assertEqual(snapshot.data, single[project.id])
+            self.assertIn(project.co_no, out.getvalue())
+
+    def test_worker_pool_matches_serial_run(self):
+        projects = [create_project(f"3077{i}") for i in range(3)]
+        for project in projects:
+            add_timesheet_rows(project, 12)
+            add_po_rows(project, 6)
+
+        call_command('generate_psr_snapshot', '--all', '--date', '2025-12-31', stdout=StringIO())
+        serial = {s.project_id: s.data for s in PSRSnapshot.objects.all()}
+        PSRSnapshot.objects.all().delete()
+
+        out = StringIO()
+        call_command('generate_psr_snapshot', '--all', '--date', '2025-12-31', '--workers', '2', stdout=out)
+        parallel = {s.project_id: s.data for s in PSRSnapshot.objects.all()}
+        self.assertEqual(parallel, serial)
+        self.assertIn("Estimated speedup (sum of task time / wall time)", out.getvalue())
+
+
+class IncrementalSnapshotTests(TestCase):
+
+    def generate_incremental(self, project, date):
+        out = StringIO()
+        call_command('generate_psr_snapshot', project.co_no, '--date', date, '--incremental', stdout=out)
+        return PSRSnapshot.objects.get(project=project, snapshot_date=date), out.getvalue()
+
+    def test_incremental_run_matches_full_recompute(self):
+        project = create_project()
+        add_timesheet_rows(project, 12, start=datetime.date(2025, 1, 1))
+        add_po_rows(project, 4)
+        generate(project, "2025-01-31")
+
+        add_timesheet_rows(project, 8, start=datetime.date(2025, 2, 3))
+        snapshot, out = self.generate_incremental(project, "2025-02-28")
+        self.assertIn("Incremental: 1 projects", out)
+
+        call_command('generate_psr_snapshot', project.co_no, '--date', "2025-02-28", '--force', stdout=StringIO())
+        full = PSRSnapshot.objects.get(project=project, snapshot_date="2025-02-28")
+        self.assertEqual(snapshot.data, full.data)
+        self.assertEqual(snapshot.labor_actual_hours, Decimal('150.00'))
+
+    def test_back_dated_rows_fall_back_to_full_recompute(self):
+        project = create_project()
+        add_timesheet_rows(project, 12, start=datetime.date(2025, 1, 1))
+        generate(project, "2025-01-31")
+
+        add_timesheet_rows(project, 4, start=datetime.date(2025, 1, 20))
+        snapshot, out = self.generate_incremental(project, "2025-02-28")
+        self.assertIn("back-dated or changed timesheet rows", out)
+        self.assertEqual(snapshot.labor_actual_hours, Decimal('120.00'))
+
+
+class BackfillTests(TestCase):
+
+    def test_backfill_matches_month_by_month_generation(self):
+        project = create_project()
+        add_timesheet_rows(project, 40, start=datetime.date(2025, 1, 20))   # 20 Jan .. 29 Jan
+        add_timesheet_rows(project, 40, start=datetime.date(2025, 2, 20))   # 20 Feb .. 1 Mar
+        add_po_rows(project, 4)
+
+        out = StringIO()
+        call_command(
+            'generate_psr_snapshot', project.co_no, '--from', '2025-01-01', '--to', '2025-03-31', stdout=out
+        )
+        self.assertIn("3 snapshots written (3 new)", out.getvalue())
+        backfilled = {s.snapshot_date.isoformat(): s for s in PSRSnapshot.objects.filter(project=project)}
+
+        PSRSnapshot.objects.filter(project=project).delete()
+        for date in ("2025-01-31", "2025-02-28", "2025-03-31"):
+            expected = generate(project, date)
+            self.assertEqual(backfilled[date].data, expected.data)
+            self.assertEqual(backfilled[date].total_actual_cost, expected.total_actual_cost)
+            self.assertEqual(backfilled[date].input_fingerprint, expected.input_fingerprint)
+
+        # March's last_month_actuals is February's cumulative PM hours (20 Jan + 18 Feb rows)
+        march = backfilled["2025-03-31"].data["TIMESHEET"]["HOURS"]["PROJECT_MANAGEMENT"]["PM"]
+        self.assertEqual(march["last_month_actuals"], 285.0)
+        self.assertEqual(march["actuals"], 300.0)
+
+    def test_rerun_skips_unchanged_periods(self):
+        project = create_project()
+        add_timesheet_rows(project, 8, start=datetime.date(2025, 1, 5))
+        args = ('generate_psr_snapshot', project.co_no, '--from', '2025-01-01', '--to', '2025-02-28')
+        call_command(*args, stdout=StringIO())
+
+        out = StringIO()
+        call_command(*args, stdout=out)
+        self.assertIn("0 snapshots written", out.getvalue())
+
+        out = StringIO()
+        call_command('generate_psr_snapshot', project.co_no, '--date', '2025-02-28', stdout=out)
+        self.assertIn("up to date", out.getvalue())
+
+
+class InputFingerprintTests(TestCase):
+
+    def run_generate(self, project, *args):
+        out = StringIO()
+        call_command('generate_psr_snapshot', project.co_no, '--date', "2025-12-31", *args, stdout=out)
+        return out.getvalue()
+
+    def test_unchanged_inputs_skip_the_rebuild(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        add_po_rows(project, 4)
+        self.run_generate(project)
+        fingerprint = PSRSnapshot.objects.get(project=project).input_fingerprint
+        self.assertTrue(fingerprint)
+
+        with CaptureQueriesContext(connection) as ctx:
+            out = self.run_generate(project)
+        self.assertIn("up to date", out)
+        writes = [q['sql'] for q in ctx.captured_queries if 'UPDATE' in q['sql'] or 'INSERT' in q['sql']]
+        self.assertFalse([sql for sql in writes if 'core_snapshotlock' not in sql])   # only the lock row
+
+        self.assertIn("updated successfully", self.run_generate(project, '--force'))
+
+    def test_changed_inputs_trigger_a_rebuild(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        self.run_generate(project)
+
+        add_timesheet_rows(project, 4, start=datetime.date(2025, 6, 1))
+        self.assertIn("updated successfully", self.run_generate(project))
+
+        SubDepartment.objects.filter(department__project=project, code="PM").update(budget_cost=Decimal('300000.00'))
+        self.assertIn("updated successfully", self.run_generate(project))
+
+        project.exchange_rate = Decimal('1.1000')
+        project.save()
+        self.assertIn("updated successfully", self.run_generate(project))
+        self.assertIn("up to date", self.run_generate(project))
+
+
+class SnapshotLineTests(TestCase):
+
+    def test_lines_mirror_snapshot_data(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        add_po_rows(project, 6)
+        snapshot = generate(project)
+
+        lines = PSRSnapshotLine.objects.filter(snapshot=snapshot)
+        self.assertEqual(lines.count(), 5)   # 2 sub-departments x (hours, cost) + 1 cost category
+        kma = lines.get(section=PSRSnapshotLine.TIMESHEET_HOURS, code="KMA/KHP")
+        self.assertEqual(kma.department, "MECHANICAL_DESIGN")
+        self.assertEqual(kma.actuals, Decimal('30.00'))
+        self.assertEqual(kma.budget, Decimal('200.00'))
+        ktma = lines.get(section=PSRSnapshotLine.COST_TO_GO)
+        self.assertEqual(ktma.actuals, Decimal('300.75'))
+
+        labor_cost = lines.filter(section=PSRSnapshotLine.TIMESHEET_COST).aggregate(total=Sum('actuals'))['total']
+        self.assertEqual(labor_cost, snapshot.labor_actual_cost)
+
+        # Regenerating replaces the lines instead of adding to them
+        add_timesheet_rows(project, 4, start=datetime.date(2025, 6, 1))
+        generate(project)
+        self.assertEqual(PSRSnapshotLine.objects.filter(project=project).count(), 5)
+        self.assertEqual(lines.get(section=PSRSnapshotLine.TIMESHEET_HOURS, code="KMA/KHP").actuals, Decimal('45.00'))
+
+    def test_line_history_endpoint(self):
+        project = create_project()
+        add_timesheet_rows(project, 8, start=datetime.date(2025, 1, 5))
+        call_command(
+            'generate_psr_snapshot', project.co_no, '--from', '2025-01-01', '--to', '2025-02-28', stdout=StringIO()
+        )
+
+        url = reverse('project-snapshot-line-history', args=[project.co_no, "KMA/KHP"])
+        response = APIClient().get(url, {'section': PSRSnapshotLine.TIMESHEET_HOURS})
+        self.assertEqual(response.status_code, 200)
+        history = response.data["history"][PSRSnapshotLine.TIMESHEET_HOURS]
+        self.assertEqual([row["month"] for row in history], ["January 2025", "February 2025"])
+        self.assertEqual([row["actuals"] for row in history], [30.0, 30.0])
+
+        self.assertEqual(APIClient().get(url, {'section': 'NOPE'}).status_code, 400)
+
+
+class SnapshotPublishTests(TestCase):
+
+    def test_publish_transaction_only_writes(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        generate(project)
+        add_timesheet_rows(project, 4, start=datetime.date(2025, 6, 1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot = generate(project)
+        sql = [q['sql'] for q in ctx.captured_queries]
+        begin = next(i for i, q in enumerate(sql) if q.startswith('SAVEPOINT'))
+        end = next(i for i, q in enumerate(sql) if q.startswith('RELEASE SAVEPOINT'))
+        # Loading, computing and staging happen before; the transaction is upsert + line swap
+        self.assertEqual([q.split()[0] for q in sql[begin + 1:end]], ['INSERT', 'DELETE', 'INSERT'])
+
+        self.assertEqual(snapshot.version, 2)
+        response = APIClient().get(reverse('project-snapshot-timesheet', args=[project.co_no]))
+        self.assertEqual(response.data["version"], 2)
+
+
+class GenerationStatsTests(TestCase):
+
+    def test_snapshot_records_phases_rows_and_queries(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        generate(project)
+
+        snapshot = PSRSnapshot.objects.get(project=project)
+        stats = snapshot.generation_stats
+        self.assertEqual(
+            set(stats["phases"]),
+            {"prepare", "labor_load", "labor_compute", "material_load", "material_compute", "persist"},
+        )
+        self.assertEqual(stats["rows_scanned"], {"timesheet": 8, "po": 0})
+        self.assertGreater(stats["run_queries"], 0)
+        self.assertAlmostEqual(snapshot.generation_seconds, sum(stats["phases"].values()), places=4)
+
+        response = APIClient().get(reverse('project-latest-kpi', args=[project.co_no]))
+        self.assertEqual(response.data["generation"]["stats"]["rows_scanned"]["timesheet"], 8)
+
+    def test_query_count_is_that_of_the_whole_run(self):
+        projects = [create_project(co_no) for co_no in ("30778", "30812")]
+        call_command('generate_psr_snapshot', '--all', '--date', '2025-12-31', stdout=StringIO())
+
+        stats = [PSRSnapshot.objects.get(project=project).generation_stats for project in projects]
+        self.assertEqual([s["run_projects"] for s in stats], [2, 2])
+        self.assertEqual(stats[0]["run_queries"], stats[1]["run_queries"])
+        self.assertNotIn("queries", stats[0])
+
+
+class RegenerationLockTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        add_timesheet_rows(self.project, 8)
+        generate(self.project)
+        # Another run holds the project's lock
+        SnapshotLock.objects.filter(project=self.project).update(
+            holder="other-run", expires_at=datetime.datetime(2099, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+
+    def release_lock(self, seconds):
+        SnapshotLock.objects.filter(project=self.project).update(holder="", expires_at=None)
+
+    def test_waiter_reuses_the_running_rebuild(self):
+        out = StringIO()
+        with mock.patch('core.psr_engine.locking.time.sleep', side_effect=self.release_lock):
+            call_command('generate_psr_snapshot', self.project.co_no, '--date', '2025-12-31', '--force', stdout=out)
+
+        self.assertIn("reused its result for 1 projects", out.getvalue())
+        self.assertIn("up to date", out.getvalue())
+        self.assertEqual(PSRSnapshot.objects.get(project=self.project).version, 1)
+        lock = SnapshotLock.objects.get(project=self.project)
+        self.assertEqual((lock.holder, lock.acquisitions, lock.contended, lock.reused_runs), ("", 2, 1, 1))
+        self.assertGreater(lock.max_wait_seconds, 0)
+
+    @override_settings(PSR_SNAPSHOT_LOCK_TIMEOUT_SECONDS=0)
+    def test_gives_up_after_the_lock_timeout(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_psr_snapshot', self.project.co_no, '--date', '2025-12-31', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "regeneration lock still held"):
+            call_command(
+                'generate_psr_snapshot', self.project.co_no, '--from', '2025-10-01', '--to', '2025-12-31',
+                stdout=StringIO(),
+            )
+        self.assertEqual(SnapshotLock.objects.get(project=self.project).holder, "other-run")
+
+
+@override_settings(PSR_SNAPSHOT_LOCK_TTL_SECONDS=1)
+class LockHeartbeatTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        add_timesheet_rows(self.project, 8)
+
+    def slow_compute(self, inputs, **kwargs):
+        # Each period takes most of the TTL; another run must still find the lock held
+        time.sleep(0.6)
+        taken = SnapshotLock.objects.filter(
+            Q(holder='') | Q(expires_at__lt=timezone.now()), project=self.project
+        ).update(holder="other-run")
+        self.assertEqual(taken, 0)
+        return compute_snapshots(inputs, **kwargs)
+
+    def test_long_backfill_keeps_its_locks(self):
+        with mock.patch('core.psr_engine.backfill.compute_snapshots', side_effect=self.slow_compute):
+            call_command(
+                'generate_psr_snapshot', self.project.co_no, '--from', '2025-01-01', '--to', '2025-03-31',
+                stdout=StringIO(),
+            )
+        self.assertEqual(PSRSnapshot.objects.filter(project=self.project).count(), 3)
+        self.assertEqual(SnapshotLock.objects.get(project=self.project).holder, "")
+
+    def test_run_stops_when_its_lock_was_taken(self):
+        def lose_lock(inputs, **kwargs):
+            SnapshotLock.objects.filter(project=self.project).update(holder="other-run")
+            time.sleep(0.6)
+            return compute_snapshots(inputs, **kwargs)
+
+        with mock.patch('core.psr_engine.backfill.compute_snapshots', side_effect=lose_lock):
+            with self.assertRaisesMessage(CommandError, "taken by another run"):
+                call_command(
+                    'generate_psr_snapshot', self.project.co_no, '--from', '2025-01-01', '--to', '2025-03-31',
+                    stdout=StringIO(),
+                )
+        self.assertFalse(PSRSnapshot.objects.exists())
+
+
+class CompactSnapshotEncodingTests(TestCase):
+
+    def test_codec_round_trip(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        add_po_rows(project, 4)
+        data = generate(project).data
+        self.assertEqual(decode_data(encode_data(data)), data)
+
+    def test_compact_snapshots_read_like_json_ones(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        add_po_rows(project, 4)
+        plain = generate(project, "2025-11-30")
+        url = reverse('project-snapshot-timesheet', args=[project.co_no])
+        expected = APIClient().get(url).data["timesheet"]
+
+        with override_settings(PSR_SNAPSHOT_ENCODING=ENCODING_COLUMNAR):
+            call_command('generate_psr_snapshot', project.co_no, '--date', "2025-11-30", '--force', stdout=StringIO())
+            december = generate(project, "2025-12-31")   # reads November as previous data
+        compact = PSRSnapshot.objects.get(project=project, snapshot_date="2025-11-30")
+        self.assertEqual(compact.data, {})
+        self.assertEqual(compact.data_encoding, ENCODING_COLUMNAR)
+        self.assertEqual(dict(compact.payload), plain.data)
+        self.assertEqual(
+            december.payload["TIMESHEET"]["HOURS"]["PROJECT_MANAGEMENT"]["PM"]["last_month_actuals"], 30.0
+        )
+
+        PSRSnapshot.objects.filter(snapshot_date="2025-12-31").delete()
+        self.assertEqual(APIClient().get(url).data["timesheet"], expected)
+
+    def test_reencode_command_reports_sizes(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        data = generate(project).data
+
+        out = StringIO()
+        call_command('encode_psr_snapshots', stdout=out)
+        self.assertIn("1 re-encoded", out.getvalue())
+        self.assertIn("Payload size after", out.getvalue())
+        snapshot = PSRSnapshot.objects.get(project=project)
+        self.assertEqual(snapshot.data_encoding, ENCODING_COLUMNAR)
+        self.assertLess(len(snapshot.data_blob), len(str(data)))
+
+        call_command('encode_psr_snapshots', '--encoding', 'json', stdout=StringIO())
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.data, snapshot.data_encoding), (data, ''))
+
+
+class StaleSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.enterContext(self.settings(PSR_IMPORT_CACHE_DIR=os.path.join(self.tmp.name, "cache")))
+        self.rows = self.dump_rows(8, datetime.date(2025, 1, 5))
+        self.import_timesheet("20250131 Timesheet Report.xlsx")
+        call_command(
+            'generate_psr_snapshot', self.project.co_no, '--from', '2025-01-01', '--to', '2025-03-31',
+            stdout=StringIO(),
+        )
+
+    def dump_rows(self, count, start):
+        roles = ["engineering mechanical & pneumatic design kma_khp", "Project Management PRO"]
+        return [
+            [datetime.datetime.combine(start + datetime.timedelta(days=i // 4), datetime.time()),
+             f"E{i % 4}", f"Employee {i % 4}", roles[i % 2], self.project.co_no, 7.5]
+            for i in range(count)
+        ]
+
+    def import_timesheet(self, name, *args):
+        path = os.path.join(self.tmp.name, name)
+        write_dump(path, ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours'], self.rows)
+        out = StringIO()
+        call_command('import_timesheet', path, *args, stdout=out)
+        return out.getvalue()
+
+    def import_back_dated_rows(self):
+        # The next monthly dump repeats January and adds back-dated February rows
+        self.rows += self.dump_rows(4, datetime.date(2025, 2, 10))
+        return self.import_timesheet("20250228 Timesheet Report.xlsx")
+
+    def stale_dates(self):
+        return dict(PSRSnapshot.objects.values_list('snapshot_date', 'is_stale'))
+
+    def test_import_flags_snapshots_from_the_changed_date(self):
+        out = self.import_back_dated_rows()
+        self.assertIn("Flagged 2 existing snapshots as stale", out)
+        self.assertEqual(
+            self.stale_dates(),
+            {datetime.date(2025, 1, 31): False, datetime.date(2025, 2, 28): True, datetime.date(2025, 3, 31): True},
+        )
+
+    def test_rows_already_imported_flag_nothing(self):
+        for mode in ((), ('--diff',)):
+            out = self.import_timesheet("20250131 Timesheet Report.xlsx", '--force', *mode)
+            self.assertNotIn("stale", out)
+        self.assertNotIn(True, self.stale_dates().values())
+
+        # Without --diff a changed row is not written (ignore_conflicts), so nothing changes either
+        self.rows[0][5] = 4
+        self.assertNotIn("stale", self.import_timesheet("20250131 Timesheet Report.xlsx"))
+        out = self.import_timesheet("20250131 Timesheet Report.xlsx", '--diff', '--force')
+        self.assertIn("Flagged 3 existing snapshots as stale", out)
+
+    def test_po_reimport_flags_only_changed_lines(self):
+        path = os.path.join(self.tmp.name, "po.xlsx")
+        header = ['PoNo', 'Po.Date', 'SrNo', 'CONo', 'ProjName', 'MatCode', 'POValue in Local Curr',
+                  'ItemCode', 'Description', 'SupplierName']
+        rows = [[f"PO{i}", datetime.datetime(2025, 1 + i, 10), 1, self.project.co_no, "Line", " ktma ",
+                 100.25, "IC", "Part", "Supplier"] for i in range(3)]
+
+        def import_podata():
+            write_dump(path, header, rows)
+            out = StringIO()
+            with mock.patch('core.management.commands.import_podata.RowDiff') as row_diff:
+                call_command('import_podata', path, '--stream', '--chunk-size', '2', '--force', stdout=out)
+            row_diff.assert_not_called()  # No state across chunks without --diff
+            PSRSnapshot.objects.update(is_stale=False)
+            return out.getvalue()
+
+        self.assertIn("Flagged 3 existing snapshots", import_podata())
+        self.assertNotIn("stale", import_podata())
+        rows[2][6] = 99  # March line changed
+        self.assertIn("Flagged 1 existing snapshots", import_podata())
+
+    @override_settings(PSR_STALE_SNAPSHOT_REPAIR='sync')
+    def test_read_repairs_the_snapshot_and_its_stale_predecessor(self):
+        self.import_back_dated_rows()
+        url = reverse('project-snapshot-timesheet-date', args=[self.project.co_no, "2025-03-31"])
+        response = APIClient().get(url)
+
+        self.assertFalse(response.data["stale"])
+        pm = response.data["timesheet"]["HOURS"]["PROJECT_MANAGEMENT"]["PM"]
+        self.assertEqual((pm["last_month_actuals"], pm["actuals"]), (45.0, 45.0))
+        self.assertFalse(PSRSnapshot.objects.filter(is_stale=True).exists())
+
+    @override_settings(PSR_STALE_SNAPSHOT_REPAIR='sync', PSR_SNAPSHOT_LOCK_TIMEOUT_SECONDS=120)
+    def test_sync_read_does_not_wait_for_a_running_rebuild(self):
+        self.import_back_dated_rows()
+        # An import or backfill holds the project's lock
+        SnapshotLock.objects.filter(project=self.project).update(
+            holder="other-run", expires_at=timezone.now() + datetime.timedelta(minutes=10)
+        )
+        url = reverse('project-latest-kpi', args=[self.project.co_no])
+        start = time.perf_counter()
+        response = APIClient().get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertTrue(response.data["stale"])
+        self.assertEqual(
+            sorted(SnapshotJob.objects.values_list('snapshot_date', flat=True)),
+            [datetime.date(2025, 2, 28), datetime.date(2025, 3, 31)],
+        )
+
+    @override_settings(PSR_STALE_SNAPSHOT_REPAIR='queue', PSR_SNAPSHOT_COALESCE_SECONDS=0)
+    def test_queue_mode_serves_stale_copy_and_queues_rebuilds(self):
+        self.import_back_dated_rows()
+        url = reverse('project-latest-kpi', args=[self.project.co_no])
+        self.assertTrue(APIClient().get(url).data["stale"])
+        self.assertEqual(
+            sorted(SnapshotJob.objects.values_list('snapshot_date', flat=True)),
+            [datetime.date(2025, 2, 28), datetime.date(2025, 3, 31)],
+        )
+
+        call_command('run_snapshot_jobs', '--once', stdout=StringIO())
+        self.assertFalse(APIClient().get(url).data["stale"])
+
+
+@override_settings(PSR_SNAPSHOT_COALESCE_SECONDS=0)
+class SnapshotJobQueueTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="planner", password="x"))
+
+    def test_budget_update_queues_job_and_worker_regenerates(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        generate(project, "2025-12-31")
+        sub_dept = SubDepartment.objects.get(department__project=project, code="PM")
+
+        response = self.client.patch(
+            reverse('subdepartment-budget-update', args=[sub_dept.pk]),
+            {"budget_hours": "200", "note": "Scope change"}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["snapshot_queued"], "2025-12-31")
+        job_id = response.data["snapshot_job"]["id"]
+        self.assertEqual(SnapshotJob.objects.get(pk=job_id).status, SnapshotJob.QUEUED)
+
+        call_command('run_snapshot_jobs', '--once', stdout=StringIO())
+
+        status_response = self.client.get(reverse('snapshot-job-status', args=[job_id]))
+        self.assertEqual(status_response.data["status"], SnapshotJob.DONE)
+        self.assertIsNotNone(status_response.data["run_seconds"])
+        snapshot = PSRSnapshot.objects.get(project=project, snapshot_date="2025-12-31")
+        self.assertEqual(snapshot.labor_budget_hours, Decimal('400.00'))
+
+    def test_burst_of_edits_is_merged_into_one_job(self):
+        project = create_project()
+        generate(project, "2025-12-31")
+        sub_dept = SubDepartment.objects.get(department__project=project, code="PM")
+        url = reverse('subdepartment-budget-update', args=[sub_dept.pk])
+
+        job_ids = {
+            self.client.patch(url, {"budget_hours": str(hours), "note": "Re-plan"}, format='json').data["snapshot_job"]["id"]
+            for hours in (110, 120, 130)
+        }
+        self.assertEqual(len(job_ids), 1)
+        job = SnapshotJob.objects.get(pk=job_ids.pop())
+        self.assertEqual(job.merged_count, 2)
+
+        out = StringIO()
+        call_command('run_snapshot_jobs', '--once', stdout=out)
+        self.assertIn("Processed 1 jobs (2 regeneration requests merged into them)", out.getvalue())
+
+        # A request after the rebuild started gets a new job
+        response = self.client.patch(url, {"budget_hours": "140", "note": "Re-plan"}, format='json')
+        self.assertNotEqual(response.data["snapshot_job"]["id"], job.id)
+
+    @override_settings(PSR_SNAPSHOT_COALESCE_SECONDS=30)
+    def test_worker_waits_for_coalesce_window(self):
+        project = create_project()
+        generate(project, "2025-12-31")
+        job = enqueue_snapshot_regeneration(project, datetime.date(2025, 12, 31))
+
+        call_command('run_snapshot_jobs', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, SnapshotJob.QUEUED)
+
+    @override_settings(PSR_SNAPSHOT_JOB_TIMEOUT_SECONDS=60, PSR_SNAPSHOT_JOB_MAX_ATTEMPTS=2)
+    def test_job_of_a_stopped_worker_is_queued_again(self):
+        project = create_project()
+        generate(project, "2025-12-31")
+        job = enqueue_snapshot_regeneration(project, datetime.date(2025, 12, 31))
+        # Claimed by a worker that died before finishing
+        self.assertEqual(claim_next_job().pk, job.pk)
+        SnapshotJob.objects.filter(pk=job.pk).update(started_at=F('started_at') - datetime.timedelta(minutes=5))
+
+        out = StringIO()
+        call_command('run_snapshot_jobs', '--once', stdout=out)
+        self.assertIn("1 queued again, 0 failed", out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (SnapshotJob.DONE, 2))
+
+        # Once it has used up its attempts it is failed instead
+        SnapshotJob.objects.filter(pk=job.pk).update(
+            status=SnapshotJob.RUNNING, started_at=F('started_at') - datetime.timedelta(minutes=5)
+        )
+        self.assertEqual(recover_abandoned_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, SnapshotJob.FAILED)
+        self.assertIn("gave up after 2 attempts", job.error)
+
+    def test_admin_search_by_project(self):
+        project = create_project()
+        enqueue_snapshot_regeneration(project, datetime.date(2025, 12, 31))
+        self.client.force_login(get_user_model().objects.create_superuser(username="admin", password="x"))
+
+        response = self.client.get(reverse('admin:core_snapshotjob_changelist'), {"q": "Test Line"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+class SnapshotPreviewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username="planner", password="x"))
+
+    def test_preview_applies_changes_without_writing(self):
+        project = create_project()
+        add_timesheet_rows(project, 8)
+        add_po_rows(project, 4)
+        snapshot = generate(project, "2025-12-31")
+        sub_dept = SubDepartment.objects.get(department__project=project, code="PM")
+        url = reverse('project-snapshot-preview', args=[project.co_no])
+        changes = {"sub_departments": [{"id": sub_dept.id, "forecast_hours": 500}]}
+
+        response = self.client.post(url, changes, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data["current"]["margin"]), snapshot.margin)
+        # 500 h more forecast at 2500 INR/h lowers the margin accordingly
+        expected = float(snapshot.margin) - (500 * 2500 - (100 * 2500 - 30 * 2500))
+        self.assertAlmostEqual(float(response.data["preview"]["margin"]), expected, places=2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, changes, format='json')
+        sql = [q['sql'] for q in ctx.captured_queries if 'core_' in q['sql']]
+        self.assertEqual(len(sql), 1)
+        sub_dept.refresh_from_db()
+        self.assertFalse(sub_dept.forecast_override)
+
+    def test_preview_rejects_foreign_ids(self):
+        project = create_project()
+        generate(project, "2025-12-31")
+        response = self.client.post(
+            reverse('project-snapshot-preview', args=[project.co_no]),
+            {"cost_categories": [{"id": 999, "budget_cost": 10}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+def write_dump(path, header, rows):
+    """Excel dump laid out like the ERP exports: two title rows, headers in row 3."""
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet.append(["Report"])
+    sheet.append([])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+class StreamingImportTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.enterContext(self.settings(PSR_IMPORT_CACHE_DIR=os.path.join(self.tmp.name, "cache")))
+
+    def import_timesheet(self, *args):
+        path = os.path.join(self.tmp.name, "timesheet.xlsx")
+        rows = [
+            [datetime.datetime(2025, 1, 1 + i % 20), f" E{i % 7} ", f"Employee {i % 7}",
+             "Project Management PRO" if i % 2 else "engineering mechanical & pneumatic design kma_khp",
+             int(self.project.co_no), 7.5 if i % 3 else 8]
+            for i in range(45)
+        ]
+        rows[10][5] = "n/a"   # dropped: invalid hours
+        rows[20][4] = None    # dropped: no CO number (and the column read as floats)
+        rows.insert(30, [None] * 6)
+        # Written once per test: openpyxl stamps the save time, so a rewrite can change the checksum
+        if not os.path.exists(path):
+            write_dump(path, ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours'], rows)
+        out = StringIO()
+        call_command('import_timesheet', path, *args, stdout=out)
+        return out.getvalue()
+
+    def stored_timesheet(self):
+        return sorted(TimesheetEntry.objects.values_list(
+            'date', 'emp_cd', 'emp_name', 'role_description', 'co_no', 'hours', 'sub_department_id'
+        ))
+
+    def test_streamed_timesheet_import_matches_full_read(self):
+        self.import_timesheet()
+        expected = self.stored_timesheet()
+        TimesheetEntry.objects.all().delete()
+
+        out = self.import_timesheet('--stream', '--chunk-size', '7', '--no-cache', '--force')
+        self.assertEqual(self.stored_timesheet(), expected)
+        self.assertEqual(len(expected), 43)
+        self.assertEqual({row[4] for row in expected}, {self.project.co_no})
+        self.assertIn("46 rows in file, 43 valid", out)
+        self.assertIn("Peak RSS:", out)
+
+    def test_streamed_po_import_upserts_each_chunk(self):
+        path = os.path.join(self.tmp.name, "po.xlsx")
+        header = ['PoNo', 'Po.Date', 'SrNo', 'CONo', 'ProjName', 'MatCode', 'POValue in Local Curr',
+                  'ItemCode', 'Description', 'SupplierName']
+        rows = [[f"PO{i}", datetime.datetime(2025, 2, 1), i + 1, self.project.co_no, "Line", " ktma ",
+                 100.25, "IC", "Part", "Supplier"] for i in range(9)]
+        write_dump(path, header, rows)
+
+        call_command('import_podata', path, '--stream', '--chunk-size', '4', stdout=StringIO())
+        self.assertEqual(POData.objects.count(), 9)
+        line = POData.objects.get(po_no="PO3")
+        self.assertEqual((line.po_date, line.sr_no, line.po_value_inr), (datetime.date(2025, 2, 1), 4, Decimal('100.25')))
+
+    def test_unchanged_file_is_loaded_from_the_parse_cache(self):
+        self.import_timesheet()
+        expected = self.stored_timesheet()
+        TimesheetEntry.objects.all().delete()
+
+        with mock.patch('core.importers.frames.read_sheet', side_effect=AssertionError("parsed again")):
+            out = self.import_timesheet('--force')
+        self.assertIn("from the parse cache", out)
+        self.assertIn("46 rows in file, 43 valid", out)
+        self.assertEqual(self.stored_timesheet(), expected)
+
+        # A changed file is a different cache entry, and --no-cache always parses
+        path = os.path.join(self.tmp.name, "timesheet.xlsx")
+        with mock.patch('core.importers.frames.read_sheet', side_effect=SheetReadError("parsed")) as read:
+            call_command('import_timesheet', path, '--no-cache', '--force', stdout=StringIO(), stderr=StringIO())
+            with open(path, 'ab') as f:
+                f.write(b"\0")
+            call_command('import_timesheet', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(read.call_count, 2)
+
+    def test_cache_eviction_by_age_then_size(self):
+        directory = os.path.join(self.tmp.name, "cache")
+        os.makedirs(directory)
+        now = time.time()
+        for name, age_days in (("old", 40), ("a", 3), ("b", 2), ("c", 1)):
+            path = os.path.join(directory, f"{name}.npz")
+            with open(path, 'wb') as f:
+                f.write(b"x" * 100)
+            os.utime(path, (now - age_days * 86400,) * 2)
+
+        self.assertEqual(evict_cache(max_age_days=30, max_bytes=250), 2)
+        self.assertEqual(sorted(os.listdir(directory)), ["b.npz", "c.npz"])
+
+
+class ImportConversionTests(TestCase):
+
+    def test_columnwise_conversion_matches_rowwise(self):
+        out = StringIO()
+        call_command('benchmark_import', '--rows', '2000', stdout=out)
+        self.assertIn("Resulting rows identical", out.getvalue())
+
+    def test_blank_cells_in_number_columns(self):
+        df = pd.DataFrame({
+            'PoNo': [4500001.0, None], 'Po.Date': [pd.Timestamp(2025, 2, 1), pd.NaT], 'SrNo': [3.0, None],
+            'CONo': [30778.0, 30778.0], 'ProjName': ["Line", None], 'MatCode': [" ktma ", None],
+            'POValue in Local Curr': [10.5, 20], 'ItemCode': [None, "IC"], 'Description': ["", "x"],
+            'SupplierName': ["S", None],
+        })
+        first, second = podata_entries(clean_podata(df), MaterialIndex())
+        self.assertEqual(
+            (first.po_no, first.po_date, first.sr_no, first.co_no, first.mat_code, first.item_code),
+            ("4500001", datetime.date(2025, 2, 1), 3, "30778", "ktma", ""),
+        )
+        self.assertEqual((second.po_no, second.po_date, second.sr_no, second.mat_code), ("", None, None, "UNKNOWN"))
+
+
+class DiffImportTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.enterContext(self.settings(PSR_IMPORT_CACHE_DIR=os.path.join(self.tmp.name, "cache")))
+        self.path = os.path.join(self.tmp.name, "timesheet.xlsx")
+        self.rows = [
+            [datetime.datetime(2025, 1, 1 + i // 4), f"E{i % 4}", f"Employee {i % 4}", "Project Management PRO",
+             self.project.co_no, 7.35]
+            for i in range(20)
+        ]
+
+    def import_timesheet(self, *args):
+        write_dump(self.path, ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours'], self.rows)
+        out = StringIO()
+        call_command('import_timesheet', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_stored_hash_matches_the_stored_values(self):
+        self.import_timesheet()
+        fields = timesheet_importer.HASHED_FIELDS
+        rows = list(TimesheetEntry.objects.order_by('pk').values_list('row_hash', *fields))
+        columns = dict(zip(fields, (list(values) for values in list(zip(*rows))[1:])))
+        self.assertEqual([row[0] for row in rows], row_hashes(TimesheetEntry, columns, fields))
+
+    def test_diff_writes_only_changed_rows(self):
+        self.import_timesheet()
+        self.rows[3][5] = 4          # changed hours
+        del self.rows[7]             # vanished
+        self.rows.append([datetime.datetime(2025, 1, 5), "E9", "New hire", "Project Management PRO",
+                          self.project.co_no, 8])
+
+        with CaptureQueriesContext(connection) as queries:
+            out = self.import_timesheet('--diff')
+        self.assertIn("Inserted: 1, updated: 1, unchanged: 18, vanished: 1", out)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len([sql for sql in writes if 'core_timesheetentry' in sql]), 2)
+        self.assertEqual(
+            TimesheetEntry.objects.get(emp_cd="E3", date=datetime.date(2025, 1, 1)).hours, Decimal('4.00')
+        )
+
+        out = self.import_timesheet('--diff', '--force')
+        self.assertIn("Inserted: 0, updated: 0, unchanged: 20, vanished: 1", out)
+
+
+class ImportLedgerTests(TestCase):
+
+    def setUp(self):
+        self.project = create_project()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.enterContext(self.settings(PSR_IMPORT_CACHE_DIR=os.path.join(self.tmp.name, "cache")))
+        self.path = os.path.join(self.tmp.name, "20251031 Timesheet Report.xlsx")
+        write_dump(self.path, ['Date', 'EmpCd', 'EmpName', 'RoleDescrptn', 'CoNo', 'Hours'], [
+            [datetime.datetime(2025, 10, 1 + i), "E1", "Employee 1", "Project Management PRO", self.project.co_no, 8]
+            for i in range(5)
+        ])
+
+    def import_timesheet(self, *args):
+        out = StringIO()
+        call_command('import_timesheet', self.path, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_already_imported_file_is_skipped_unless_forced(self):
+        self.import_timesheet()
+        run = ImportRun.objects.get()
+        self.assertEqual(
+            (run.kind, run.status, run.file_name, run.rows_read, run.rows_valid, run.rows_written),
+            (ImportRun.TIMESHEET, ImportRun.DONE, "20251031 Timesheet Report.xlsx", 5, 5, 5),
+        )
+        self.assertEqual(list(run.affected_projects.all()), [self.project])
+        self.assertIsNotNone(run.duration_seconds)
+
+        out = self.import_timesheet()
+        self.assertIn(f"Already imported by run #{run.pk}", out)
+        self.assertEqual(
+            list(ImportRun.objects.order_by('pk').values_list('status', flat=True)),
+            [ImportRun.DONE, ImportRun.SKIPPED],
+        )
+
+        self.import_timesheet('--force', '--diff')
+        forced = ImportRun.objects.latest('pk')
+        self.assertEqual((forced.status, forced.rows_written, forced.rows_unchanged), (ImportRun.DONE, 0, 5))
+
+    def test_each_chunk_commits_on_its_own(self):
+        save = timesheet_importer.save_timesheet_entries
+        calls = []
+
+        def fail_on_second_chunk(entries):
+            calls.append(len(entries))
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            return save(entries)
+
+        with mock.patch('core.management.commands.import_timesheet.save_timesheet_entries',
+                        side_effect=fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self.import_timesheet('--stream', '--chunk-size', '2')
+
+        # The first chunk stays written; the ledger shows the file failed partway
+        run = ImportRun.objects.get()
+        self.assertEqual((run.status, run.rows_written, run.error), (ImportRun.FAILED, 2, "disk full"))
+        self.assertEqual(TimesheetEntry.objects.count(), 2)
+
+        self.import_timesheet()
+        self.assertEqual(TimesheetEntry.objects.count(), 5)
+
+    def test_failed_import_is_recorded_and_retried(self):
+        write_dump(self.path, ['Date', 'EmpCd'], [[datetime.datetime(2025, 10, 1), "E1"]])
+        self.import_timesheet()
+        self.import_timesheet()
+        runs = ImportRun.objects.order_by('pk')
+        self.assertEqual([run.status for run in runs], [ImportRun.FAILED, ImportRun.FAILED])
+        self.assertIn("Missing required columns", runs[0].error)
@@ -3,15 +3,16 @@
 from django.urls import path
 from .views import (
                     ProjectPSRSnapshotTimesheetView, ProjectPSRSnapshotCostToGoView,
-                    ProjectSnapshotTimesheetHistoryView, ProjectSnapshotCostToGoHistoryView,
+                    ProjectSnapshotTimesheetHistoryView, ProjectSnapshotCostToGoHistoryView, ProjectSnapshotLineHistoryView,
                     SubDepartmentBudgetUpdateView, ProjectCostCategoryBudgetUpdateView,
                     SubDepartmentGetForecastOverrideView, ProjectCostCategoryGetForecastOverrideView,
                     SubDepartmentForecastOverrideView, ProjectCostCategoryForecastOverrideView, 
                     ProjectCreateView, ProjectDetailView, ProjectUpdateView,
                     ProjectKPIDetailsView, ProjectStatusUpdateView,
-                    ProjectLatestSnapshotKPIView, ProjectSnapshotHistoryKPIView,
+                    ProjectLatestSnapshotKPIView, ProjectSnapshotHistoryKPIView, ProjectSnapshotPreviewView,
                     LandingPageAPIView, AllProjectsLatestSnapshotView, MonthlyCumulativeKPIHistoryView,
-                    RKActualOverrideView, RKGetActualOverrideView)
+                    RKActualOverrideView, RKGetActualOverrideView,
+                    SnapshotJobStatusView)
 
 urlpatterns = [
     
@@ -28,6 +29,7 @@ urlpatterns = [
     
     path('projects/<str:co_no>/snapshot-history/timesheet/', ProjectSnapshotTimesheetHistoryView.as_view(), name='project-snapshot-timesheet-history'),
     path('projects/<str:co_no>/snapshot-history/cost-to-go/', ProjectSnapshotCostToGoHistoryView.as_view(), name='project-snapshot-cost-to-go-history'),
+    path('projects/<str:co_no>/snapshot-history/lines/<path:code>/', ProjectSnapshotLineHistoryView.as_view(), name='project-snapshot-line-history'),
     
     path('subdepartments/<int:pk>/budget-update/', SubDepartmentBudgetUpdateView.as_view(), name='subdepartment-budget-update'),
     path('projectcostcategories/<int:pk>/budget-update/', ProjectCostCategoryBudgetUpdateView.as_view(), name='projectcostcategory-budget-update'),
@@ -46,7 +48,10 @@ urlpatterns = [
     path('projects/<str:co_no>/update-status/', ProjectStatusUpdateView.as_view(), name='project-update'),
     path('projects/<str:co_no>/snapshot/latest-kpi/', ProjectLatestSnapshotKPIView.as_view(), name='project-latest-kpi'),
     path('projects/<str:co_no>/snapshot/history-kpi/', ProjectSnapshotHistoryKPIView.as_view(), name='project-history-kpi'),
+    path('projects/<str:co_no>/snapshot/preview/', ProjectSnapshotPreviewView.as_view(), name='project-snapshot-preview'),
 
     path('projectcostcategories/<int:pk>/rk-actual-override/', RKActualOverrideView.as_view(), name='rk-actual-override'),
     path('projectcostcategories/<int:pk>/get-rk-actual-override/', RKGetActualOverrideView.as_view(), name='rk-actual-override-detail'),
+
+    path('snapshot-jobs/<int:pk>/', SnapshotJobStatusView.as_view(), name='snapshot-job-status'),
 ]
\ No newline at end of file
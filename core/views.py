@@ -1,19 +1,20 @@
 # core/views.py
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.generics import CreateAPIView
-from django.core.management import call_command
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from collections import defaultdict
 from rest_framework import status
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Max
+from django.db.models import Max, Sum
 from django.db.models import Q
 from datetime import datetime
 from decimal import Decimal
 from io import StringIO
+import time
 
 
 from .serializers import (PSRSnapshotSerializer, 
@@ -25,7 +26,8 @@ from .serializers import (PSRSnapshotSerializer,
                           PSRSnapshotKPISerializer,
                           ProjectLatestSnapshotSerializer, 
                           MonthlyCumulativeKPISerializer,
-                          RKActualAdjustmentSerializer)
+                          RKActualAdjustmentSerializer,
+                          SnapshotJobSerializer)
 
 from .models import (Project, 
                      PSRSnapshot,
@@ -34,7 +36,41 @@ from .models import (Project,
                      SubDepartmentBudgetAdjustment, ProjectCostCategoryBudgetAdjustment,
                      ForecastAdjustment, ForecastAdjustmentLine, 
                      MaterialForecastAdjustment, MaterialForecastAdjustmentLine,
-                     RKActualAdjustment, RKActualAdjustmentLine,)
+                     RKActualAdjustment, RKActualAdjustmentLine,
+                     TimesheetEntry, SnapshotJob, PSRSnapshotLine,)
+from .resolution import resolve_timesheet_entries
+from .jobs import enqueue_snapshot_regeneration
+from .psr_engine import regenerate_snapshot
+from .preview import preview_snapshot, invalidate_preview_inputs, PreviewError
+from .staleness import ensure_fresh, queue_stale_snapshots
+
+
+def queue_snapshot_regeneration(project, request, source):
+    """
+    Queue regeneration of the project's latest snapshot; returns the job (None if no snapshot yet).
+
+    Edit endpoints answer 202 Accepted either way, with the queued snapshot
+    date in ``snapshot_queued`` and the job in ``snapshot_job`` (both null
+    for a project without snapshots).
+    """
+    invalidate_preview_inputs(project)
+    latest_snapshot = project.psr_snapshots.order_by('-snapshot_date').first()
+    if not latest_snapshot:
+        return None
+    return enqueue_snapshot_regeneration(
+        project, latest_snapshot.snapshot_date, requested_by=request.user, source=source
+    )
+
+
+def snapshot_job_payload(job, request):
+    if job is None:
+        return None
+    return {
+        "id": job.id,
+        "status": job.status,
+        "merged_count": job.merged_count,
+        "status_url": request.build_absolute_uri(reverse('snapshot-job-status', args=[job.id])),
+    }
 
 
 class ProjectPSRSnapshotTimesheetView(APIView):
@@ -49,8 +85,9 @@ class ProjectPSRSnapshotTimesheetView(APIView):
             snapshot = PSRSnapshot.objects.filter(project=project).order_by('-snapshot_date').first()
             if not snapshot:
                 return Response({"error": "No snapshots available for this project"}, status=status.HTTP_404_NOT_FOUND)
+        snapshot, stale = ensure_fresh(snapshot, request.user, source="snapshot read")
 
-        timesheet_data = snapshot.data.get("TIMESHEET", {"HOURS": {}, "COST": {}})
+        timesheet_data = snapshot.payload.get("TIMESHEET", {"HOURS": {}, "COST": {}})
 
         # List of keys that are percentages (keep 2 decimals)
         PERCENTAGE_KEYS = {
@@ -92,6 +129,8 @@ class ProjectPSRSnapshotTimesheetView(APIView):
         return Response({
             "project": project.co_no,
             "snapshot_date": snapshot.snapshot_date,
+            "version": snapshot.version,
+            "stale": stale,
             "timesheet": rounded_timesheet
         }, status=status.HTTP_200_OK)
 
@@ -109,13 +148,16 @@ class ProjectPSRSnapshotCostToGoView(APIView):
             snapshot = PSRSnapshot.objects.filter(project=project).order_by('-snapshot_date').first()
             if not snapshot:
                 return Response({"error": "No snapshots available for this project"}, status=status.HTTP_404_NOT_FOUND)
+        snapshot, stale = ensure_fresh(snapshot, request.user, source="snapshot read")
 
         # Return only COST TO GO data
-        cost_to_go_data = snapshot.data.get("COST TO GO", {"COST": {}})
+        cost_to_go_data = snapshot.payload.get("COST TO GO", {"COST": {}})
 
         return Response({
             "project": project.co_no,
             "snapshot_date": snapshot.snapshot_date,
+            "version": snapshot.version,
+            "stale": stale,
             "cost_to_go": cost_to_go_data
         }, status=status.HTTP_200_OK)
 
@@ -128,6 +170,8 @@ class ProjectSnapshotTimesheetHistoryView(APIView):
     def get(self, request, co_no):
         project = get_object_or_404(Project, co_no=co_no)
 
+        # Too many snapshots to rebuild in the request; stale ones are queued
+        queue_stale_snapshots(project, request.user, source="history read")
         snapshots = PSRSnapshot.objects.filter(project=project).order_by('snapshot_date')
 
         if not snapshots.exists():
@@ -174,6 +218,8 @@ class ProjectSnapshotCostToGoHistoryView(APIView):
     def get(self, request, co_no):
         project = get_object_or_404(Project, co_no=co_no)
 
+        # Too many snapshots to rebuild in the request; stale ones are queued
+        queue_stale_snapshots(project, request.user, source="history read")
         snapshots = PSRSnapshot.objects.filter(project=project).order_by('snapshot_date')
 
         if not snapshots.exists():
@@ -201,6 +247,59 @@ class ProjectSnapshotCostToGoHistoryView(APIView):
         })
 
 
+class ProjectSnapshotLineHistoryView(APIView):
+    """
+    Month-by-month trend of one sub-department / cost category code, e.g.
+    KMA/KHP actuals. Aggregated in SQL from PSRSnapshotLine; `?section=`
+    (TIMESHEET_HOURS, TIMESHEET_COST, COST_TO_GO) narrows the code.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, co_no, code):
+        project = get_object_or_404(Project, co_no=co_no)
+
+        lines = PSRSnapshotLine.objects.filter(project=project, code=code)
+        section = request.query_params.get('section')
+        if section:
+            if section not in dict(PSRSnapshotLine.SECTION_CHOICES):
+                return Response({"error": f"Unknown section '{section}'"}, status=status.HTTP_400_BAD_REQUEST)
+            lines = lines.filter(section=section)
+
+        rows = (
+            lines
+            .values('snapshot_date', 'section')
+            .annotate(
+                actuals=Sum('actuals'),
+                budget=Sum('budget'),
+                forecast=Sum('forecast'),
+                prognosis=Sum('prognosis'),
+                balance=Sum('balance'),
+            )
+            .order_by('snapshot_date', 'section')
+        )
+        if not rows:
+            return Response({"detail": f"No snapshot lines for code '{code}'."}, status=status.HTTP_404_NOT_FOUND)
+
+        history = defaultdict(list)
+        for row in rows:
+            history[row['section']].append({
+                "month": row['snapshot_date'].strftime('%B %Y'),
+                "snapshot_date": row['snapshot_date'],
+                "actuals": float(row['actuals']),
+                "budget": float(row['budget']),
+                "forecast": float(row['forecast']),
+                "prognosis": float(row['prognosis']),
+                "balance": float(row['balance']),
+            })
+
+        return Response({
+            "project": project.co_no,
+            "project_name": project.project_name,
+            "code": code,
+            "history": dict(history),
+        })
+
+
 
 
 
@@ -246,23 +345,16 @@ class SubDepartmentBudgetUpdateView(APIView):
                 new_budget_hours=new_hours
             )
 
-        # Regenerate snapshot
-        project = sub_dept.department.project
-        latest_snapshot = project.psr_snapshots.order_by('-snapshot_date').first()
-        if latest_snapshot:
-            call_command(
-                'generate_psr_snapshot',
-                str(project.co_no),
-                '--date',
-                latest_snapshot.snapshot_date.strftime('%Y-%m-%d')
-            )
+        # Queue snapshot regeneration
+        job = queue_snapshot_regeneration(sub_dept.department.project, request, source='subdepartment-budget-update')
 
         return Response({
             "detail": "Budget hours updated successfully with reason recorded.",
             "baseline_budget_hours": float(sub_dept.baseline_budget_hours),
             "current_budget_hours": float(new_hours),
-            "snapshot_regenerated": latest_snapshot.snapshot_date.strftime('%Y-%m-%d') if latest_snapshot else None
-        }, status=status.HTTP_200_OK)
+            "snapshot_queued": job.snapshot_date.strftime('%Y-%m-%d') if job else None,
+            "snapshot_job": snapshot_job_payload(job, request),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class ProjectCostCategoryBudgetUpdateView(APIView):
@@ -303,23 +395,16 @@ class ProjectCostCategoryBudgetUpdateView(APIView):
                 new_budget_cost=new_cost
             )
 
-        # Regenerate snapshot
-        project = pcc.project
-        latest_snapshot = project.psr_snapshots.order_by('-snapshot_date').first()
-        if latest_snapshot:
-            call_command(
-                'generate_psr_snapshot',
-                str(project.co_no),
-                '--date',
-                latest_snapshot.snapshot_date.strftime('%Y-%m-%d')
-            )
+        # Queue snapshot regeneration
+        job = queue_snapshot_regeneration(pcc.project, request, source='projectcostcategory-budget-update')
 
         return Response({
             "detail": "Budget cost updated successfully with reason recorded.",
             "baseline_budget_cost": float(pcc.baseline_budget_cost),
             "current_budget_cost": float(new_cost),
-            "snapshot_regenerated": latest_snapshot.snapshot_date.strftime('%Y-%m-%d') if latest_snapshot else None
-        }, status=status.HTTP_200_OK)
+            "snapshot_queued": job.snapshot_date.strftime('%Y-%m-%d') if job else None,
+            "snapshot_job": snapshot_job_payload(job, request),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 
@@ -386,25 +471,17 @@ class SubDepartmentForecastOverrideView(APIView):
                     hours=Decimal(str(line['hours']))
                 )
 
-        # Regenerate latest snapshot
-        project = sub_dept.department.project
-        latest_snapshot = project.psr_snapshots.order_by('-snapshot_date').first()
-        if latest_snapshot:
-            latest_date = latest_snapshot.snapshot_date
-            call_command(
-                'generate_psr_snapshot',
-                str(project.co_no),
-                '--date',
-                latest_date.strftime('%Y-%m-%d')
-            )
+        # Queue regeneration of the latest snapshot
+        job = queue_snapshot_regeneration(sub_dept.department.project, request, source='subdepartment-forecast-override')
 
         return Response({
             "detail": "Forecast override applied successfully with audit record.",
             "warning": "Manual forecast override is now active.",
             "total_forecast_hours": float(total_hours),
             "adjustment_id": adjustment.id,
-            "snapshot_regenerated": latest_snapshot.snapshot_date.strftime('%Y-%m-%d') if latest_snapshot else None
-        }, status=status.HTTP_200_OK)
+            "snapshot_queued": job.snapshot_date.strftime('%Y-%m-%d') if job else None,
+            "snapshot_job": snapshot_job_payload(job, request),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class SubDepartmentGetForecastOverrideView(APIView):
@@ -506,22 +583,16 @@ class ProjectCostCategoryForecastOverrideView(APIView):
                     amount=Decimal(str(line['amount']))
                 )
 
-        # Regenerate snapshot
-        project = pcc.project
-        latest_snapshot = project.psr_snapshots.order_by('-snapshot_date').first()
-        if latest_snapshot:
-            call_command(
-                'generate_psr_snapshot',
-                str(project.co_no),
-                '--date',
-                latest_snapshot.snapshot_date.strftime('%Y-%m-%d')
-            )
+        # Queue snapshot regeneration
+        job = queue_snapshot_regeneration(pcc.project, request, source='projectcostcategory-forecast-override')
 
         return Response({
             "detail": "Material forecast override applied successfully.",
             "total_forecast_cost": float(total_amount),
-            "adjustment_id": adjustment.id
-        }, status=status.HTTP_200_OK)
+            "adjustment_id": adjustment.id,
+            "snapshot_queued": job.snapshot_date.strftime('%Y-%m-%d') if job else None,
+            "snapshot_job": snapshot_job_payload(job, request),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 
@@ -713,20 +784,20 @@ class ProjectCreateView(CreateAPIView):
                 budget_cost=budget_cost,
             )
 
+        # Link timesheet rows imported before this project existed
+        resolve_timesheet_entries(TimesheetEntry.objects.filter(co_no__startswith=project.co_no))
+
         # === Generate First PSR Snapshot ===
+        # After commit, so the computation does not hold the write transaction open
         snapshot_date = project.created_at.date()
 
-        try:
-            call_command(
-                'generate_psr_snapshot',
-                str(project.co_no),
-                '--date',
-                snapshot_date.strftime('%Y-%m-%d'),
-                '--frequency',
-                'MONTHLY'
-            )
-        except Exception as e:
-            print(f"Warning: Could not generate initial snapshot: {e}")
+        def generate_initial_snapshot():
+            try:
+                regenerate_snapshot(project, snapshot_date, frequency='MONTHLY')
+            except Exception as e:
+                print(f"Warning: Could not generate initial snapshot: {e}")
+
+        transaction.on_commit(generate_initial_snapshot)
 
         return project
 
@@ -841,6 +912,8 @@ class ProjectUpdateView(APIView):
                 pcc.budget_cost = Decimal(str(cost))
                 pcc.save()
 
+        invalidate_preview_inputs(project)
+
         return Response({
             "detail": "Project updated successfully.",
             "co_no": project.co_no
@@ -884,19 +957,63 @@ class ProjectLatestSnapshotKPIView(APIView):
         snapshot = PSRSnapshot.objects.filter(project=project).order_by('-snapshot_date').first()
         if not snapshot:
             return Response({"detail": "No snapshot available"}, status=status.HTTP_404_NOT_FOUND)
+        snapshot, stale = ensure_fresh(snapshot, request.user, source="snapshot read")
         serializer = PSRSnapshotKPISerializer(snapshot)
         return Response({
             "project": project.co_no,
             "snapshot_date": snapshot.snapshot_date,
-            "kpi": serializer.data
+            "stale": stale,
+            "kpi": serializer.data,
+            "generation": {
+                "seconds": snapshot.generation_seconds,
+                "stats": snapshot.generation_stats,
+            },
         })
 
 
+class ProjectSnapshotPreviewView(APIView):
+    """
+    What-if KPIs for the latest snapshot with proposed changes applied.
+    Computed in memory from cached inputs; nothing is saved.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, co_no):
+        start = time.perf_counter()
+        try:
+            result = preview_snapshot(co_no, request.data)
+        except PreviewError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if result is None:
+            get_object_or_404(Project, co_no=co_no)
+            return Response({"detail": "No snapshot available"}, status=status.HTTP_404_NOT_FOUND)
+
+        project = result['project']
+        current = PSRSnapshotKPISerializer(PSRSnapshot(project=project, **result['current'])).data
+        preview = PSRSnapshotKPISerializer(PSRSnapshot(project=project, **result['preview'])).data
+        return Response({
+            "project": project.co_no,
+            "snapshot_date": result['snapshot_date'],
+            "current": current,
+            "preview": preview,
+            "delta": {
+                "margin": float(result['preview']['margin'] - result['current']['margin']),
+                "factor": float(result['preview']['factor'] - result['current']['factor']),
+                "total_prognosis_cost": float(
+                    result['preview']['total_prognosis_cost'] - result['current']['total_prognosis_cost']
+                ),
+            },
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }, status=status.HTTP_200_OK)
+
+
 class ProjectSnapshotHistoryKPIView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, co_no):
         project = get_object_or_404(Project, co_no=co_no)
+        # Too many snapshots to rebuild in the request; stale ones are queued
+        queue_stale_snapshots(project, request.user, source="history read")
         snapshots = PSRSnapshot.objects.filter(project=project).order_by('snapshot_date')
         if not snapshots.exists():
             return Response({"detail": "No snapshots available"}, status=status.HTTP_404_NOT_FOUND)
@@ -1213,17 +1330,17 @@ class RKActualOverrideView(APIView):
             pcc.actual_override = True
             pcc.save()
 
-        # Regenerate latest snapshot
-        latest_snapshot = pcc.project.psr_snapshots.order_by('-snapshot_date').first()
-        if latest_snapshot:
-            call_command('generate_psr_snapshot', str(pcc.project.co_no), '--date', latest_snapshot.snapshot_date.strftime('%Y-%m-%d'))
+        # Queue regeneration of the latest snapshot
+        job = queue_snapshot_regeneration(pcc.project, request, source='rk-actual-override')
 
         serializer = RKActualAdjustmentSerializer(adjustment)
         return Response({
             "detail": "RK actuals updated successfully",
             "current_total_actuals": float(total_amount),
-            "adjustment": serializer.data
-        }, status=status.HTTP_200_OK)
+            "adjustment": serializer.data,
+            "snapshot_queued": job.snapshot_date.strftime('%Y-%m-%d') if job else None,
+            "snapshot_job": snapshot_job_payload(job, request),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 # core/views.py
@@ -1280,4 +1397,12 @@ class RKGetActualOverrideView(APIView):
                 "adjusted_at": latest_adjustment.adjusted_at.isoformat(),
                 "lines": lines
             }
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+class SnapshotJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(SnapshotJob.objects.select_related('project'), pk=pk)
+        return Response(SnapshotJobSerializer(job).data, status=status.HTTP_200_OK)